@@ -0,0 +1,175 @@
+import re
+from utils import lazy_import
+
+pd = lazy_import('pandas')
+
+# USPS Publication 28, Appendix C1: standard suffix abbreviation -> common spellings
+USPS_SUFFIXES = {
+    'ALY': ['ALLEY', 'ALLEE', 'ALLY', 'ALY'],
+    'ANX': ['ANNEX', 'ANEX', 'ANNX', 'ANX'],
+    'ARC': ['ARCADE', 'ARC'],
+    'AVE': ['AVENUE', 'AV', 'AVE', 'AVEN', 'AVENU', 'AVN', 'AVNUE'],
+    'BCH': ['BEACH', 'BCH'],
+    'BLF': ['BLUFF', 'BLF', 'BLUF'],
+    'BLVD': ['BOULEVARD', 'BLVD', 'BOUL', 'BOULV'],
+    'BR': ['BRANCH', 'BR', 'BRNCH'],
+    'BRG': ['BRIDGE', 'BRDGE', 'BRG'],
+    'BYP': ['BYPASS', 'BYP', 'BYPA', 'BYPAS', 'BYPS'],
+    'CSWY': ['CAUSEWAY', 'CAUSWA', 'CSWY'],
+    'CTR': ['CENTER', 'CEN', 'CENT', 'CENTR', 'CENTRE', 'CNTER', 'CNTR', 'CTR'],
+    'CIR': ['CIRCLE', 'CIR', 'CIRC', 'CIRCL', 'CRCL', 'CRCLE'],
+    'CT': ['COURT', 'CT'],
+    'CTS': ['COURTS', 'CTS'],
+    'CV': ['COVE', 'CV'],
+    'CRK': ['CREEK', 'CRK'],
+    'CRES': ['CRESCENT', 'CRES', 'CRSENT', 'CRSNT'],
+    'XING': ['CROSSING', 'CRSSNG', 'XING'],
+    'DR': ['DRIVE', 'DR', 'DRIV', 'DRV'],
+    'EXPY': ['EXPRESSWAY', 'EXP', 'EXPR', 'EXPRESS', 'EXPW', 'EXPY'],
+    'EXT': ['EXTENSION', 'EXT', 'EXTN', 'EXTNSN'],
+    'FWY': ['FREEWAY', 'FREEWY', 'FRWAY', 'FRWY', 'FWY'],
+    'GDNS': ['GARDENS', 'GDNS', 'GRDNS'],
+    'GTWY': ['GATEWAY', 'GATEWY', 'GATWAY', 'GTWAY', 'GTWY'],
+    'GRN': ['GREEN', 'GRN'],
+    'HBR': ['HARBOR', 'HARB', 'HARBR', 'HBR', 'HRBOR'],
+    'HTS': ['HEIGHTS', 'HT', 'HTS'],
+    'HWY': ['HIGHWAY', 'HIGHWY', 'HIWAY', 'HIWY', 'HWAY', 'HWY'],
+    'HL': ['HILL', 'HL'],
+    'HOLW': ['HOLLOW', 'HLLW', 'HOLLOWS', 'HOLW', 'HOLWS'],
+    'IS': ['ISLAND', 'IS', 'ISLND'],
+    'JCT': ['JUNCTION', 'JCT', 'JCTION', 'JCTN', 'JUNCTN', 'JUNCTON'],
+    'LK': ['LAKE', 'LK'],
+    'LN': ['LANE', 'LN'],
+    'LOOP': ['LOOP', 'LOOPS'],
+    'MALL': ['MALL'],
+    'MNR': ['MANOR', 'MNR'],
+    'MDWS': ['MEADOWS', 'MDW', 'MDWS', 'MEDOWS'],
+    'MTWY': ['MOTORWAY', 'MTWY'],
+    'MT': ['MOUNT', 'MNT', 'MT'],
+    'OVAL': ['OVAL', 'OVL'],
+    'PARK': ['PARK', 'PRK'],
+    'PKWY': ['PARKWAY', 'PARKWY', 'PKWAY', 'PKWY', 'PKY'],
+    'PASS': ['PASS'],
+    'PATH': ['PATH', 'PATHS'],
+    'PIKE': ['PIKE', 'PIKES'],
+    'PL': ['PLACE', 'PL'],
+    'PLZ': ['PLAZA', 'PLZ', 'PLZA'],
+    'PT': ['POINT', 'PT'],
+    'RD': ['ROAD', 'RD'],
+    'RDS': ['ROADS', 'RDS'],
+    'ROW': ['ROW'],
+    'RTE': ['ROUTE', 'RTE'],
+    'SQ': ['SQUARE', 'SQ', 'SQR', 'SQRE', 'SQU'],
+    'ST': ['STREET', 'ST', 'STR', 'STRT'],
+    'STA': ['STATION', 'STA', 'STATN', 'STN'],
+    'TER': ['TERRACE', 'TER', 'TERR'],
+    'TPKE': ['TURNPIKE', 'TPKE', 'TRNPK', 'TURNPK'],
+    'TRL': ['TRAIL', 'TRAILS', 'TRL', 'TRLS'],
+    'VIA': ['VIADUCT', 'VDCT', 'VIA', 'VIADCT'],
+    'VW': ['VIEW', 'VW'],
+    'VLG': ['VILLAGE', 'VILL', 'VILLAG', 'VILLG', 'VLG'],
+    'WALK': ['WALK', 'WALKS'],
+    'WAY': ['WAY', 'WY'],
+}
+
+DIRECTIONALS = {
+    'N': ['NORTH', 'N'],
+    'S': ['SOUTH', 'S'],
+    'E': ['EAST', 'E'],
+    'W': ['WEST', 'W'],
+    'NE': ['NORTHEAST', 'NE'],
+    'NW': ['NORTHWEST', 'NW'],
+    'SE': ['SOUTHEAST', 'SE'],
+    'SW': ['SOUTHWEST', 'SW'],
+}
+
+UNIT_DESIGNATORS = {
+    'APT': ['APARTMENT', 'APT'],
+    'BLDG': ['BUILDING', 'BLDG'],
+    'DEPT': ['DEPARTMENT', 'DEPT'],
+    'FL': ['FLOOR', 'FL'],
+    'RM': ['ROOM', 'RM'],
+    'STE': ['SUITE', 'STE'],
+    'UNIT': ['UNIT'],
+}
+
+ADDRESS_COLUMNS = ['house_no', 'predir', 'area', 'area_type', 'postdir', 'unit']
+
+
+def _lookup(table):
+    return {variant: standard for standard, variants in table.items() for variant in variants}
+
+
+def _alternation(lookup):
+    # Longest variants first so "AVENUE" wins over "AVE" and "NE" over "N"
+    return '|'.join(re.escape(v) for v in sorted(lookup, key=len, reverse=True))
+
+
+SUFFIX_LOOKUP = _lookup(USPS_SUFFIXES)
+DIRECTIONAL_LOOKUP = _lookup(DIRECTIONALS)
+UNIT_LOOKUP = _lookup(UNIT_DESIGNATORS)
+
+_SUFFIX = _alternation(SUFFIX_LOOKUP)
+_DIRECTIONAL = _alternation(DIRECTIONAL_LOOKUP)
+_UNIT = _alternation(UNIT_LOOKUP)
+
+ADDRESS_PATTERN = re.compile(
+    r'^\s*'
+    r'(?P<house_no>\d+[A-Z]?(?:-\d+[A-Z]?)?)?\s*'
+    # A leading directional only counts when a street name and another token follow it
+    rf'(?:(?P<predir>{_DIRECTIONAL})\.?\s+(?=\S+\s+\S))?'
+    r'(?P<area>.+?)'
+    rf'(?:\s+(?P<area_type>{_SUFFIX})\.?)?'
+    rf'(?:\s+(?P<postdir>{_DIRECTIONAL})\.?)?'
+    rf'(?:\s*,?\s*(?P<unit>(?:(?:{_UNIT})\.?\s*#?|#)\s*[A-Z0-9-]+))?'
+    r'\s*,?\s*$',
+    re.IGNORECASE,
+)
+
+_UNIT_PARTS = re.compile(rf'^(?P<designator>{_UNIT}|#)\.?\s*#?\s*(?P<number>\S+)$', re.IGNORECASE)
+
+
+def _normalize_unit(unit):
+    if not isinstance(unit, str):
+        return unit
+    match = _UNIT_PARTS.match(unit)
+    if match is None:
+        return unit
+    designator = match.group('designator').upper()
+    return f"{UNIT_LOOKUP.get(designator, designator).title()} {match.group('number').upper()}"
+
+
+def parse_addresses(values):
+    """
+    Tokenize street address lines into house_no, predir, area, area_type, postdir and unit.
+    Each distinct address string is parsed once; the result is indexed by the raw string.
+    """
+    uniques = pd.Series(pd.unique(values.dropna().astype(str)), dtype=object)
+    cleaned = uniques.str.replace(r'\s+', ' ', regex=True).str.strip()
+    parsed = cleaned.str.extract(ADDRESS_PATTERN)
+
+    parsed['area'] = parsed['area'].str.strip(' ,')
+    parsed['area_type'] = parsed['area_type'].str.upper().map(SUFFIX_LOOKUP).str.title()
+    parsed['predir'] = parsed['predir'].str.upper().map(DIRECTIONAL_LOOKUP)
+    parsed['postdir'] = parsed['postdir'].str.upper().map(DIRECTIONAL_LOOKUP)
+    parsed['unit'] = parsed['unit'].map(_normalize_unit)
+    parsed.index = uniques
+    return parsed[ADDRESS_COLUMNS]
+
+
+def split_address_columns(df, columns):
+    """
+    Add parsed address components for each {source_column: column_suffix} in columns,
+    e.g. {'practice_address_line1': '_p'} adds house_no_p, area_p, area_type_p, ...
+    Practice and mailing lines usually repeat each other, so all columns share one parse.
+    """
+    present = {col: suffix for col, suffix in columns.items() if col in df.columns}
+    if not present:
+        return df
+    parsed = parse_addresses(pd.concat([df[col] for col in present], ignore_index=True))
+    for col, suffix in present.items():
+        keys = df[col].where(df[col].isna(), df[col].astype(str))
+        components = parsed.reindex(keys)
+        for name in ADDRESS_COLUMNS:
+            df[f"{name}{suffix}"] = components[name].to_numpy()
+    return df
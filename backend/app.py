@@ -1,24 +1,45 @@
 
 
+import time
+_import_started = time.perf_counter()
+
 from flask import Flask, request, jsonify, send_file
 from flask_cors import CORS
 import os
-import pandas as pd
-from utils import load_existing_files, generate_csv_file, allowed_file, dataframe_to_dict, generated_files
+from utils import load_existing_files, generate_csv_file, allowed_file, dataframe_to_dict, generated_files, lazy_import, output_catalog, output_store
+from file_catalog import ENCODINGS, write_sidecars
+from datasets import shared_dataset
 from handlers import (
     upload_initial_dataset_handler,
+    preview_upload_handler,
+    get_initial_dataset,
+    ensure_reference_data,
+    start_warm_up,
+    startup_state,
     stored_data
 )
 from routes.deduplication import deduplication_bp
 from routes.standardization import standardization_bp
 from routes.misspelling import misspelling_bp
 from routes.qualityScore import qualityScore_bp
+from routes.metrics import metrics_bp
+from routes.versions import versions_bp
+from routes.clusters import clusters_bp
+from routes.search import search_bp
+from routes.compliance import compliance_bp
+
+pd = lazy_import('pandas')
+
+# eager | background | lazy (see handlers.start_warm_up)
+STARTUP_MODE = os.environ.get('CLEARCRED_STARTUP_MODE', 'eager')
 
 app = Flask(__name__)
 CORS(app)
 app.config['UPLOAD_FOLDER'] = 'uploads'
 app.config['OUTPUT_FOLDER'] = 'outputs'
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024
+# Behind nginx/Apache, let the proxy stream downloads itself (X-Sendfile / X-Accel-Redirect)
+app.config['USE_X_SENDFILE'] = os.environ.get('CLEARCRED_X_SENDFILE') == '1'
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 os.makedirs(app.config['OUTPUT_FOLDER'], exist_ok=True)
 
@@ -27,6 +48,11 @@ app.register_blueprint(standardization_bp)
 app.register_blueprint(misspelling_bp)
 app.register_blueprint(deduplication_bp)
 app.register_blueprint(qualityScore_bp)
+app.register_blueprint(metrics_bp)
+app.register_blueprint(versions_bp)
+app.register_blueprint(clusters_bp)
+app.register_blueprint(search_bp)
+app.register_blueprint(compliance_bp)
 
 
 @app.route('/', methods=['GET'])
@@ -38,34 +64,58 @@ def health_check():
         'version': '1.0.0'
     })
 
+@app.route('/healthz', methods=['GET'])
+def liveness_check():
+    """Liveness probe: the worker process is up and serving requests"""
+    return jsonify({'status': 'alive', 'pid': os.getpid()})
+
+@app.route('/readyz', methods=['GET'])
+def readiness_check():
+    """Readiness probe: warm-up has finished (NY and CA license reference data loaded, unless lazy)"""
+    reference_data = {
+        'ny_data': stored_data['ny_data'] is not None,
+        'ca_data': stored_data['ca_data'] is not None
+    }
+    ready = startup_state['ready']
+    return jsonify({
+        'status': 'ready' if ready else 'loading',
+        'reference_data': reference_data,
+        'startup': startup_state,
+        'pid': os.getpid()
+    }), 200 if ready else 503
+
 @app.route('/upload/initial-dataset', methods=['POST'])
 def upload_initial_dataset():
     return upload_initial_dataset_handler()
 
+@app.route('/upload/preview', methods=['POST'])
+def preview_upload():
+    """Head, inferred schema and per-column profile of a roster, read within about a second"""
+    return preview_upload_handler()
+
 
 
 @app.route('/process/split-by-state', methods=['POST'])
 def split_by_state():
     """Split initial dataset by state (NY and CA)"""
     try:
-        if stored_data['initial_dataset'] is None:
+        initial_dataset = shared_dataset('initial_dataset', get_initial_dataset())
+        if initial_dataset is None:
             return jsonify({'error': 'No initial dataset found. Please upload first.'}), 400
         
-        initial_dataset = stored_data['initial_dataset']
-        
-        # Split data by state
-        init_data_ca = initial_dataset[initial_dataset["license_state"] == "CA"].copy()
-        init_data_ny = initial_dataset[initial_dataset["license_state"] == "NY"].copy()
+        # Split data by state (row positions, computed once per uploaded dataset)
+        init_data_ca = initial_dataset.where("license_state", "CA")
+        init_data_ny = initial_dataset.where("license_state", "NY")
         
         # Generate CSV files
-        ca_file = generate_csv_file(init_data_ca, "ca_split", "State Split - CA Data")
-        ny_file = generate_csv_file(init_data_ny, "ny_split", "State Split - NY Data")
+        ca_file = generate_csv_file(init_data_ca.frame(), "ca_split", "State Split - CA Data")
+        ny_file = generate_csv_file(init_data_ny.frame(), "ny_split", "State Split - NY Data")
         
         return jsonify({
             'status': 'success',
             'message': 'Data split by state successfully',
-            'ca_data': dataframe_to_dict(init_data_ca),
-            'ny_data': dataframe_to_dict(init_data_ny),
+            'ca_data': init_data_ca.to_dict(),
+            'ny_data': init_data_ny.to_dict(),
             'generated_files': {
                 'ca_file': ca_file,
                 'ny_file': ny_file
@@ -84,7 +134,8 @@ def split_by_state():
 def merge_datasets():
     """Merge initial dataset with license databases"""
     try:
-        initial_dataset = stored_data['initial_dataset']
+        initial_dataset = shared_dataset('initial_dataset', get_initial_dataset())
+        ensure_reference_data()
         ny_data = stored_data['ny_data']
         ca_data = stored_data['ca_data']
         
@@ -92,12 +143,12 @@ def merge_datasets():
             return jsonify({'error': 'Missing required datasets. Please upload all files first.'}), 400
         
         # Split data by state
-        init_data_ca = initial_dataset[initial_dataset["license_state"] == "CA"].copy()
-        init_data_ny = initial_dataset[initial_dataset["license_state"] == "NY"].copy()
+        init_data_ca = initial_dataset.where("license_state", "CA")
+        init_data_ny = initial_dataset.where("license_state", "NY")
         
         # Perform left joins based on license numbers
-        merged_ca = pd.merge(init_data_ca, ca_data, how="left", on="license_number")
-        merged_ny = pd.merge(init_data_ny, ny_data, how="left", on="license_number")
+        merged_ca = pd.merge(init_data_ca.frame(), ca_data, how="left", on="license_number")
+        merged_ny = pd.merge(init_data_ny.frame(), ny_data, how="left", on="license_number")
         
         # Store merged data
         stored_data['merged_ca'] = merged_ca
@@ -190,41 +241,45 @@ def list_generated_files():
 
 @app.route('/files/download/<filename>', methods=['GET'])
 def download_file(filename):
-    """Download a generated CSV file"""
+    """
+    Download a generated CSV file. Supports Range/If-Range (resumable downloads) and serves the
+    precompressed zstd/gzip copy when the client's Accept-Encoding allows it.
+    """
     try:
-        # Always check the disk for the file, not just the generated_files list
-        filepath = os.path.join(app.config['OUTPUT_FOLDER'], filename)
-        
-        # If exact file doesn't exist, try to find a similar file with the same prefix
-        if not os.path.exists(filepath) and os.path.exists(app.config['OUTPUT_FOLDER']):
-            # Extract the prefix (everything before the timestamp)
-            parts = filename.split('_')
-            if len(parts) >= 2:
-                # Find prefix by removing the timestamp part
-                prefix = '_'.join(parts[:-1])  # e.g., "ca_final_processed"
-                
-                # Look for any file with this prefix
-                for existing_file in os.listdir(app.config['OUTPUT_FOLDER']):
-                    if existing_file.startswith(prefix) and existing_file.endswith('.csv'):
-                        print(f"Found similar file: {existing_file} for requested: {filename}")
-                        filepath = os.path.join(app.config['OUTPUT_FOLDER'], existing_file)
-                        filename = existing_file  # Update filename for download
-                        break
-        
-        if not os.path.exists(filepath):
+        # Exact name, else the newest file with the same prefix (e.g. an older timestamp)
+        resolved = output_catalog.resolve(filename)
+        if resolved is None:
             return jsonify({
                 'error': 'File does not exist on disk',
                 'requested_file': filename,
-                'full_path': filepath,
-                'available_files': os.listdir(app.config['OUTPUT_FOLDER']) if os.path.exists(app.config['OUTPUT_FOLDER']) else []
+                'available_files': output_catalog.names()
             }), 404
-            
-        return send_file(
-            filepath,
+        if resolved != filename:
+            print(f"Found similar file: {resolved} for requested: {filename}")
+        filepath = output_catalog.path(resolved)
+
+        encoding = None
+        for candidate, extension in ENCODINGS.items():
+            if request.accept_encodings[candidate]:
+                encoding = candidate
+                # Outputs written before sidecars existed are compressed once, on first request
+                if not os.path.exists(filepath + extension):
+                    write_sidecars(filepath)
+                filepath += extension
+                break
+
+        response = send_file(
+            os.path.abspath(filepath),
             as_attachment=True,
-            download_name=filename,
-            mimetype='text/csv'
+            download_name=resolved,
+            mimetype='text/csv',
+            conditional=True
         )
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        response.headers['Vary'] = 'Accept-Encoding'
+        response.headers['Accept-Ranges'] = 'bytes'
+        return response
     except Exception as e:
         return jsonify({'error': f'Error downloading file: {str(e)}'}), 500
 
@@ -232,18 +287,11 @@ def download_file(filename):
 def clear_generated_files():
     """Clear all generated files (optional cleanup endpoint)"""
     try:
-        global generated_files
+        # Every published run (from any worker) is recorded in a manifest, so clear those
+        removed_count = output_store.clear()
         
-        # Remove files from disk
-        removed_count = 0
-        for file_info in generated_files:
-            filepath = file_info['filepath']
-            if os.path.exists(filepath):
-                os.remove(filepath)
-                removed_count += 1
-        
-        # Clear the tracking list
-        generated_files = []
+        # Clear the tracking list in place (rebinding a global here wouldn't reach utils.generated_files)
+        generated_files.clear()
         
         return jsonify({
             'status': 'success',
@@ -255,26 +303,9 @@ def clear_generated_files():
 
 
 
-# Load NY and CA license data from static files on startup
-def load_state_license_data():
-    ny_path = os.path.join('data', 'ny_medical_license_database_clean_standardized.csv')
-    ca_path = os.path.join('data', 'ca_medical_license_database_clean_standardized.csv')
-    try:
-        if os.path.exists(ny_path):
-            stored_data['ny_data'] = pd.read_csv(ny_path)
-            print(f"Loaded NY license data from {ny_path}")
-        else:
-            print(f"NY license data not found at {ny_path}")
-        if os.path.exists(ca_path):
-            stored_data['ca_data'] = pd.read_csv(ca_path)
-            print(f"Loaded CA license data from {ca_path}")
-        else:
-            print(f"CA license data not found at {ca_path}")
-    except Exception as e:
-        print(f"Error loading state license data: {e}")
-
-load_state_license_data()
-load_existing_files()
+start_warm_up(STARTUP_MODE)
+startup_state['import_seconds'] = round(time.perf_counter() - _import_started, 3)
+print(f"App imported in {startup_state['import_seconds']}s (startup mode: {STARTUP_MODE})")
 
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Command-line entry point for batch runs of the ClearCred pipeline, without the API server
+
+    python clearcred.py run roster.csv -o results/
+    python clearcred.py run "rosters/*.csv" other_dir/ -o results/ --workers 4
+    python clearcred.py dedupe national_roster.csv -o results/ --memory-mb 1024
+"""
+
+import sys
+import time
+import argparse
+
+def run_command(args):
+    from pipeline import run_batch, expand_inputs
+
+    inputs = expand_inputs(args.inputs)
+    if not inputs:
+        print("❌ No CSV files matched the given inputs")
+        return 1
+    print(f"🔄 Running pipeline on {len(inputs)} file(s) -> {args.output_dir}")
+    start = time.perf_counter()
+    results = run_batch(inputs, args.output_dir, workers=args.workers, versions_folder=args.versions_dir)
+
+    failures = 0
+    for result in results:
+        if 'error' in result:
+            failures += 1
+            print(f"❌ {result['input_file']}: {result['error']}")
+            continue
+        stats = result['pipeline_stats']
+        print(f"✅ {result['input_file']}: {stats['deduplication']['initial_rows']} rows, "
+              f"{stats['deduplication']['duplicates_removed']} duplicates, "
+              f"CA {stats['final']['ca_count']} / NY {stats['final']['ny_count']} final, "
+              f"quality score {stats['quality_metrics']['quality_score']}")
+    print(f"⏱️  Finished in {time.perf_counter() - start:.2f}s ({failures} failed)")
+    return 1 if failures else 0
+
+def diff_command(args):
+    from run_versions import build_delta, latest_versions
+
+    latest = latest_versions(2, folder=args.versions_dir)
+    from_version = args.from_version or (latest[0] if len(latest) == 2 else None)
+    to_version = args.to_version or (latest[-1] if latest else None)
+    if not from_version or not to_version:
+        print("❌ Need two recorded runs (or --from/--to) to compute a diff")
+        return 1
+    path, changes = build_delta(from_version, to_version, args.dataset, folder=args.versions_dir)
+    print(f"🔍 {args.dataset}: {from_version} -> {to_version}")
+    for name, keys in changes.items():
+        print(f"   {name}: {len(keys)}")
+    print(f"📦 Delta written to {path}")
+    return 0
+
+def dedupe_command(args):
+    import os
+    from pipeline import load_npi_registry, NPI_REGISTRY_PATH
+    from external_dedup import dedupe_external, DEFAULT_MEMORY_MB
+
+    name = os.path.splitext(os.path.basename(args.input))[0]
+    os.makedirs(args.output_dir, exist_ok=True)
+    canonical_path = os.path.join(args.output_dir, f"{name}_deduplicated.csv")
+    duplicates_path = os.path.join(args.output_dir, f"{name}_duplicates_removed.csv")
+    npi_registry = load_npi_registry() if os.path.exists(NPI_REGISTRY_PATH) else None
+    memory_mb = args.memory_mb or DEFAULT_MEMORY_MB
+    print(f"🔄 Deduplicating {args.input} within {memory_mb} MB")
+    start = time.perf_counter()
+    counts = dedupe_external(args.input, canonical_path, duplicates_path, npi_registry=npi_registry,
+                             memory_mb=memory_mb, spill_dir=args.spill_dir)
+    print(f"✅ {counts['initial_rows']} rows -> {counts['canonical_rows']} providers, "
+          f"{counts['duplicates_removed']} duplicates ({canonical_path}, {duplicates_path})")
+    print(f"⏱️  Finished in {time.perf_counter() - start:.2f}s")
+    return 0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='clearcred', description='ClearCred provider data pipeline')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser(
+        'run', help='standardize, correct misspellings, deduplicate, merge licenses and score local rosters')
+    run_parser.add_argument('inputs', nargs='+', help='CSV files, directories or glob patterns')
+    run_parser.add_argument('-o', '--output-dir', required=True,
+                            help='directory for results; each roster gets its own subdirectory')
+    run_parser.add_argument('-w', '--workers', type=int, default=None,
+                            help='parallel worker processes (default: one per CPU)')
+    run_parser.add_argument('--versions-dir', default=None,
+                            help='also record each run here so successive runs can be diffed')
+    run_parser.set_defaults(func=run_command)
+
+    diff_parser = subparsers.add_parser('diff', help='inserted/updated/deleted providers between two recorded runs')
+    diff_parser.add_argument('dataset', help='e.g. ca_final_processed, ny_final_processed, duplicates_removed')
+    diff_parser.add_argument('--versions-dir', required=True)
+    diff_parser.add_argument('--from', dest='from_version', default=None, help='older version id (default: second newest)')
+    diff_parser.add_argument('--to', dest='to_version', default=None, help='newer version id (default: newest)')
+    diff_parser.set_defaults(func=diff_command)
+
+    dedupe_parser = subparsers.add_parser(
+        'dedupe', help='deduplicate a standardized roster too large for memory, streaming it from disk')
+    dedupe_parser.add_argument('input', help='standardized (misspelling-corrected) roster CSV')
+    dedupe_parser.add_argument('-o', '--output-dir', required=True)
+    dedupe_parser.add_argument('--memory-mb', type=int, default=None,
+                               help='memory budget for chunks and sorting (default: CLEARCRED_DEDUP_MEMORY_MB or 512)')
+    dedupe_parser.add_argument('--spill-dir', default=None, help='directory for temporary spill files (default: system temp)')
+    dedupe_parser.set_defaults(func=dedupe_command)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,103 @@
+import os
+import re
+import json
+import threading
+from datetime import datetime
+from utils import normalize_npi
+
+CLUSTERS_PATH = os.path.join('cache', 'dedup_clusters.json')
+# Member fields that lead to a cluster (phone and NPI are matched on digits only, NPIs zero-padded to 10)
+INDEXED_FIELDS = ['provider_id', 'npi', 'license_number', 'practice_phone']
+
+
+def index_key(field, value):
+    if value is None:
+        return None
+    if field == 'npi':
+        return normalize_npi(value)
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    text = str(value).strip()
+    if field in ('npi', 'practice_phone'):
+        text = re.sub(r'\D', '', text)
+    return text or None
+
+
+def save_clusters(cluster_records, path=CLUSTERS_PATH, version_id=None):
+    """
+    Persist a run's multi-row clusters (from pipeline.deduplicate), largest first, with
+    cluster ids by position. Written to a temp file and renamed, so readers never see half a file.
+    """
+    records = sorted(cluster_records, key=lambda c: -c['size'])
+    for cluster_id, record in enumerate(records):
+        record['cluster_id'] = cluster_id
+    payload = {'created_at': datetime.now().isoformat(), 'version_id': version_id, 'clusters': records}
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(payload, f, default=str)
+    os.replace(tmp_path, path)
+    return len(records)
+
+
+class ClusterIndex:
+    """
+    The clusters of the latest run, loaded once (and again when the file is replaced), with
+    dict indexes from provider_id, npi, license_number and phone to cluster ids.
+    """
+
+    def __init__(self, path=CLUSTERS_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._mtime = None
+        self.created_at = None
+        self.version_id = None
+        self.clusters = []
+        self.indexes = {field: {} for field in INDEXED_FIELDS}
+
+    def _refresh(self):
+        mtime = os.path.getmtime(self.path) if os.path.exists(self.path) else None
+        if mtime == self._mtime:
+            return
+        with self._lock:
+            if mtime == self._mtime:
+                return
+            payload = {'clusters': []}
+            if mtime is not None:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    payload = json.load(f)
+            indexes = {field: {} for field in INDEXED_FIELDS}
+            for cluster in payload['clusters']:
+                for member in cluster['members']:
+                    for field in INDEXED_FIELDS:
+                        key = index_key(field, member.get(field))
+                        if key is not None:
+                            ids = indexes[field].setdefault(key, [])
+                            if not ids or ids[-1] != cluster['cluster_id']:
+                                ids.append(cluster['cluster_id'])
+            self.clusters = payload['clusters']
+            self.indexes = indexes
+            self.created_at = payload.get('created_at')
+            self.version_id = payload.get('version_id')
+            self._mtime = mtime
+
+    def lookup(self, field, value):
+        """Clusters containing a member whose `field` matches value."""
+        self._refresh()
+        ids = self.indexes[field].get(index_key(field, value), [])
+        return [self.clusters[i] for i in ids]
+
+    def get(self, cluster_id):
+        self._refresh()
+        if 0 <= cluster_id < len(self.clusters):
+            return self.clusters[cluster_id]
+        return None
+
+    def page(self, page, page_size):
+        """(clusters on this page, total clusters); clusters are sorted by size, largest first."""
+        self._refresh()
+        start = (page - 1) * page_size
+        return self.clusters[start:start + page_size], len(self.clusters)
+
+
+cluster_index = ClusterIndex()
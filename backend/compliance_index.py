@@ -0,0 +1,178 @@
+"""
+License-expiration timeline of the latest pipeline run, for compliance queries.
+
+Dates are parsed once, when a run finishes, into datetime64[D]. Per state (and for all providers)
+the licenses are kept sorted by expiration and by issue date, so "expiring between A and B" and
+"expired / unexpired as of D" are binary searches. Month histograms of expirations are precomputed.
+"""
+import os
+import pickle
+import threading
+from datetime import datetime
+from utils import lazy_import
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+COMPLIANCE_INDEX_PATH = os.path.join('cache', 'compliance_index.pkl')
+ALL_STATES = 'ALL'
+# The license database's dates win; the roster's own expiration covers providers without a match
+EXPIRATION_COLUMNS = ['expiration_date_gt', 'license_expiration']
+RENEWAL_COLUMNS = ['renewal_date_gt', 'last_renewal_date_gt']
+ISSUE_COLUMNS = ['issue_date_gt']
+DETAIL_COLUMNS = ['provider_id', 'npi', 'full_name', 'license_number', 'license_state', 'status_gt']
+
+
+def _parse_dates(df, columns):
+    """First non-missing date of `columns` per row, as datetime64[D] (NaT when none parses)."""
+    dates = pd.Series(pd.NaT, index=df.index, dtype='datetime64[ns]')
+    for column in columns:
+        if column in df.columns:
+            dates = dates.fillna(pd.to_datetime(df[column], errors='coerce'))
+    return dates.to_numpy().astype('datetime64[D]')
+
+
+def _timeline(expiration, issue, rows):
+    has_expiration = rows[~np.isnat(expiration[rows])]
+    has_issue = rows[~np.isnat(issue[rows])]
+    by_expiration = has_expiration[np.argsort(expiration[has_expiration], kind='stable')]
+    months, counts = np.unique(expiration[by_expiration].astype('datetime64[M]'), return_counts=True)
+    return {
+        'rows': by_expiration,
+        'expiration': expiration[by_expiration],
+        'issue': np.sort(issue[has_issue]),
+        'total': len(rows),
+        'histogram': {str(month): int(count) for month, count in zip(months, counts)}
+    }
+
+
+def build_compliance_index(rows, path=COMPLIANCE_INDEX_PATH, version_id=None):
+    """
+    Parse and index the license dates of `rows` (the final providers of a run) and save the index,
+    atomically replacing the previous one. Returns the number of licenses with an expiration date.
+    """
+    rows = rows.reset_index(drop=True)
+    expiration = _parse_dates(rows, EXPIRATION_COLUMNS)
+    issue = _parse_dates(rows, ISSUE_COLUMNS)
+    renewal = _parse_dates(rows, RENEWAL_COLUMNS)
+    states = rows['license_state'].astype('string').fillna('') if 'license_state' in rows.columns \
+        else pd.Series('', index=rows.index, dtype='string')
+
+    all_rows = np.arange(len(rows))
+    timelines = {ALL_STATES: _timeline(expiration, issue, all_rows)}
+    for state in sorted(s for s in states.unique() if s):
+        timelines[state] = _timeline(expiration, issue, np.flatnonzero((states == state).to_numpy()))
+
+    details = {c: rows[c].astype(object).where(rows[c].notna(), None).to_numpy()
+               for c in DETAIL_COLUMNS if c in rows.columns}
+    index = {
+        'created_at': datetime.now().isoformat(),
+        'version_id': version_id,
+        'timelines': timelines,
+        'expiration': expiration,
+        'issue': issue,
+        'renewal': renewal,
+        'details': details
+    }
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(index, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+    return len(timelines[ALL_STATES]['rows'])
+
+
+def _date_text(value):
+    return None if np.isnat(value) else str(value)
+
+
+class ComplianceIndex:
+    """The latest saved timeline, loaded once and again whenever a run replaces it."""
+
+    def __init__(self, path=COMPLIANCE_INDEX_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._mtime = None
+        self.index = None
+
+    def _refresh(self):
+        mtime = os.path.getmtime(self.path) if os.path.exists(self.path) else None
+        if mtime == self._mtime:
+            return self.index
+        with self._lock:
+            if mtime != self._mtime:
+                index = None
+                if mtime is not None:
+                    with open(self.path, 'rb') as f:
+                        index = pickle.load(f)
+                self.index, self._mtime = index, mtime
+        return self.index
+
+    def _timeline(self, state):
+        """(index, timeline) for a state, or (None, None) if there is no index / no such state."""
+        index = self._refresh()
+        if index is None:
+            return None, None
+        return index, index['timelines'].get((state or ALL_STATES).upper())
+
+    def states(self):
+        index = self._refresh()
+        return sorted(index['timelines']) if index else []
+
+    def expiring(self, start, end, state=None, page=1, page_size=50, as_of=None):
+        """
+        Licenses expiring in [start, end] (datetime64[D] / 'YYYY-MM-DD'), soonest first.
+        Returns None without an index, or {} for an unknown state.
+        """
+        index, timeline = self._timeline(state)
+        if index is None:
+            return None
+        if timeline is None:
+            return {}
+        start, end = np.datetime64(start, 'D'), np.datetime64(end, 'D')
+        as_of = np.datetime64(as_of, 'D') if as_of is not None else start
+        lo = np.searchsorted(timeline['expiration'], start, side='left')
+        hi = np.searchsorted(timeline['expiration'], end, side='right')
+        first = lo + (page - 1) * page_size
+        page_rows = timeline['rows'][first:min(first + page_size, hi)]
+        details = index['details']
+        licenses = []
+        for row in page_rows.tolist():
+            record = {column: values[row] for column, values in details.items()}
+            record['expiration_date'] = _date_text(index['expiration'][row])
+            record['last_renewal_date'] = _date_text(index['renewal'][row])
+            record['days_until_expiration'] = int((index['expiration'][row] - as_of).astype(int))
+            licenses.append(record)
+        return {'total_results': int(hi - lo), 'licenses': licenses,
+                'version_id': index['version_id'], 'indexed_at': index['created_at']}
+
+    def as_of(self, date, state=None):
+        """Counts of licenses expired / not yet expired, and issued / not yet issued, on `date`."""
+        index, timeline = self._timeline(state)
+        if index is None:
+            return None
+        if timeline is None:
+            return {}
+        date = np.datetime64(date, 'D')
+        expired = int(np.searchsorted(timeline['expiration'], date, side='left'))
+        issued = int(np.searchsorted(timeline['issue'], date, side='right'))
+        with_expiration = len(timeline['expiration'])
+        return {
+            'date': str(date),
+            'total': timeline['total'],
+            'expired': expired,
+            'unexpired': with_expiration - expired,
+            'issued': issued,
+            'not_yet_issued': len(timeline['issue']) - issued,
+            'no_expiration_date': timeline['total'] - with_expiration
+        }
+
+    def histogram(self, state=None):
+        """Expirations per month ('YYYY-MM' -> count)."""
+        index, timeline = self._timeline(state)
+        if index is None:
+            return None
+        return {} if timeline is None else timeline['histogram']
+
+
+compliance_index = ComplianceIndex()
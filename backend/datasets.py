@@ -0,0 +1,94 @@
+"""
+Read-only datasets shared across requests, with index-based views.
+
+A SharedDataset wraps a DataFrame that nobody mutates after it is stored (uploads replace the
+whole dataset). Partitions by a column's values are computed once, as row positions, and cached;
+a DatasetView is positions plus an optional column projection. Nothing is copied until a view
+is materialized (one take of exactly the rows and columns needed) or serialized, which reads
+the base columns directly.
+"""
+import threading
+from utils import lazy_import, dataframe_to_dict
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+
+class DatasetView:
+    """Rows (positions into the base frame) and columns of a SharedDataset."""
+
+    def __init__(self, dataset, positions, columns=None):
+        self.dataset = dataset
+        self.positions = positions
+        self.columns = list(columns) if columns is not None else list(dataset.frame.columns)
+
+    def __len__(self):
+        return len(self.positions)
+
+    @property
+    def shape(self):
+        return (len(self.positions), len(self.columns))
+
+    def project(self, columns):
+        return DatasetView(self.dataset, self.positions, columns)
+
+    def frame(self):
+        """The view as its own DataFrame (one copy of the selected rows and columns)."""
+        base = self.dataset.frame
+        if len(self.columns) != len(base.columns) or list(base.columns) != self.columns:
+            base = base[self.columns]
+        return base.take(self.positions).reset_index(drop=True)
+
+    def to_dict(self):
+        """Same payload as utils.dataframe_to_dict(self.frame()), built without the frame."""
+        return dataframe_to_dict(self.dataset.frame, positions=self.positions, columns=self.columns)
+
+
+class SharedDataset:
+    """An immutable DataFrame with cached partitions by column value."""
+
+    def __init__(self, frame, name=None):
+        self.frame = frame
+        self.name = name
+        self._partitions = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.frame)
+
+    def partitions(self, column):
+        """{value: row positions} for every non-null value of column, computed once."""
+        with self._lock:
+            if column not in self._partitions:
+                self._partitions[column] = {
+                    key: positions.astype(np.int64)
+                    for key, positions in self.frame.groupby(column, sort=False).indices.items()
+                }
+            return self._partitions[column]
+
+    def where(self, column, value, columns=None):
+        """View of the rows whose column equals value."""
+        positions = self.partitions(column).get(value, np.zeros(0, dtype=np.int64))
+        return DatasetView(self, positions, columns)
+
+    def all(self, columns=None):
+        return DatasetView(self, np.arange(len(self.frame)), columns)
+
+
+_shared = {}
+_shared_lock = threading.Lock()
+
+
+def shared_dataset(name, frame):
+    """
+    The SharedDataset for `frame` stored under `name`, created on first use and reused (with its
+    cached partitions) for as long as the same frame stays stored.
+    """
+    if frame is None:
+        return None
+    with _shared_lock:
+        dataset = _shared.get(name)
+        if dataset is None or dataset.frame is not frame:
+            dataset = SharedDataset(frame, name)
+            _shared[name] = dataset
+        return dataset
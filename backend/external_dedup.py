@@ -0,0 +1,266 @@
+"""
+Out-of-core deduplication for rosters larger than memory, with the same rules as
+pipeline.dedupe_simple: rows sharing name+phone, license(+state) or name+education are one
+provider; each cluster keeps its Active, most complete row (earliest on ties).
+
+The roster is streamed in chunks sized from a memory budget. Blocking keys are hashed into
+(key hash, row id) records and spilled into hash-partitioned files; each partition is sorted in
+memory (re-partitioned first if it exceeds the budget) and runs of equal keys become union edges.
+Connected components use a union-find over memory-mapped arrays in the spill directory.
+"""
+import os
+import shutil
+import tempfile
+from datetime import datetime
+from utils import lazy_import
+from profiling import span
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+DEFAULT_MEMORY_MB = int(os.environ.get('CLEARCRED_DEDUP_MEMORY_MB', 512))
+
+# (label, columns); license also uses license_state when the roster has it, as in dedupe_simple
+BLOCKING_KEYS = [
+    ('name_phone', ['first_name', 'last_name', 'practice_phone']),
+    ('license', ['license_number', 'license_state']),
+    ('name_edu', ['first_name', 'last_name', 'medical_school', 'residency_program']),
+]
+PK_COL = 'provider_id'
+STATUS_COL = 'status'
+
+RECORD_DTYPE = [('h1', '<u8'), ('h2', '<u8'), ('row', '<i8')]
+# Partitions per level: records go to a file by 6 bits of the key hash, the next 6 bits on re-partitioning
+PARTITION_BITS = 6
+MAX_PARTITION_DEPTH = 4
+# Rough bytes per record while sorting (records, sort order and run boundaries)
+SORT_BYTES_PER_RECORD = 64
+SAMPLE_ROWS = 1000
+
+
+def _key_columns(columns):
+    keys = []
+    for label, cols in BLOCKING_KEYS:
+        if label == 'license' and cols[1] not in columns:
+            cols = cols[:1]
+        if all(c in columns for c in cols):
+            keys.append((label, cols))
+    return keys
+
+
+def _key_hashes(chunk, cols):
+    # Two independent 64-bit hashes, so distinct keys in the same run are practically impossible
+    keys = chunk[cols]
+    valid = keys.notna().all(axis=1).to_numpy()
+    keys = keys[valid]
+    h1 = pd.util.hash_pandas_object(keys, index=False).to_numpy()
+    h2 = pd.util.hash_pandas_object(keys, index=False, hash_key='clearcred-dedup2').to_numpy()
+    return valid, h1, h2
+
+
+def _partition(records, depth):
+    shift = 64 - PARTITION_BITS * (depth + 1)
+    return ((records['h1'] >> np.uint64(shift)) & np.uint64((1 << PARTITION_BITS) - 1)).astype(np.int64)
+
+
+def _spill(records, folder, depth):
+    """Append records to folder/p<bucket>.bin by hash bits of this depth."""
+    buckets = _partition(records, depth)
+    order = np.argsort(buckets, kind='stable')
+    records, buckets = records[order], buckets[order]
+    bounds = np.flatnonzero(np.diff(buckets)) + 1
+    for part in np.split(np.arange(len(records)), bounds):
+        if len(part):
+            with open(os.path.join(folder, f"p{buckets[part[0]]:02d}.bin"), 'ab') as f:
+                records[part].tofile(f)
+
+
+class DiskUnionFind:
+    """
+    Union-find over a memory-mapped parent array. Unions attach to the smaller root, so a
+    cluster's root is its first row.
+    """
+
+    def __init__(self, n, path):
+        self.parent = np.lib.format.open_memmap(path, mode='w+', dtype=np.int64, shape=(max(n, 1),))
+        for start in range(0, n, 1 << 20):
+            stop = min(start + (1 << 20), n)
+            self.parent[start:stop] = np.arange(start, stop)
+
+    def find(self, x):
+        parent = self.parent
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = int(parent[x])
+        return x
+
+    def union(self, a, b):
+        ra, rb = self.find(a), self.find(b)
+        if ra != rb:
+            self.parent[max(ra, rb)] = min(ra, rb)
+
+    def union_runs(self, first, others):
+        # Every row of a run joins the run's first row
+        for a, b in zip(first.tolist(), others.tolist()):
+            self.union(a, b)
+
+    def resolve(self, n, block_rows):
+        """Point every row straight at its root, in place; roots precede their members."""
+        parent = self.parent
+        for start in range(0, n, block_rows):
+            roots = np.array(parent[start:start + block_rows])
+            while True:
+                nxt = parent[roots]
+                if np.array_equal(nxt, roots):
+                    break
+                roots = nxt
+            parent[start:start + block_rows] = roots
+        return parent
+
+
+def _blocks(path, budget_bytes):
+    block_records = max(budget_bytes // SORT_BYTES_PER_RECORD, 1)
+    data = np.memmap(path, dtype=RECORD_DTYPE, mode='r')
+    for start in range(0, len(data), block_records):
+        yield np.array(data[start:start + block_records])
+
+
+def _sorted_runs(path, folder, depth, budget_bytes):
+    """Yield (first_rows, other_rows, grouped_rows) of equal-key runs in one partition file."""
+    size = os.path.getsize(path)
+    if size * SORT_BYTES_PER_RECORD // np.dtype(RECORD_DTYPE).itemsize > budget_bytes and depth < MAX_PARTITION_DEPTH:
+        sub = os.path.join(folder, f"{os.path.basename(path)[:-4]}_d{depth + 1}")
+        os.makedirs(sub)
+        for block in _blocks(path, budget_bytes):
+            _spill(block, sub, depth + 1)
+        os.remove(path)
+        for name in sorted(os.listdir(sub)):
+            yield from _sorted_runs(os.path.join(sub, name), sub, depth + 1, budget_bytes)
+        return
+    records = np.fromfile(path, dtype=RECORD_DTYPE)
+    os.remove(path)
+    if len(records) < 2:
+        return
+    records.sort(order=['h1', 'h2', 'row'])
+    new_key = np.ones(len(records), dtype=bool)
+    new_key[1:] = (records['h1'][1:] != records['h1'][:-1]) | (records['h2'][1:] != records['h2'][:-1])
+    run_ids = np.cumsum(new_key) - 1
+    run_sizes = np.bincount(run_ids)
+    grouped = run_sizes[run_ids] > 1
+    firsts = records['row'][new_key][run_ids]
+    others = grouped & ~new_key
+    yield firsts[others], records['row'][others], records['row'][grouped]
+
+
+def _chunk_rows(input_path, budget_bytes):
+    """Rows per chunk so a chunk (as strings) plus its records stays well inside the budget."""
+    sample = pd.read_csv(input_path, dtype=str, nrows=SAMPLE_ROWS)
+    row_bytes = max(int(sample.memory_usage(deep=True).sum() / max(len(sample), 1)), 1)
+    return max(budget_bytes // 4 // (row_bytes + 3 * np.dtype(RECORD_DTYPE).itemsize), SAMPLE_ROWS)
+
+
+def dedupe_external(input_path, canonical_path, duplicates_path, npi_registry=None,
+                    memory_mb=DEFAULT_MEMORY_MB, spill_dir=None):
+    """
+    Deduplicate the roster CSV at input_path without loading it, writing canonical rows and
+    duplicates (with duplicate_of, duplicate_reason, moved_at) as CSVs in input order.
+    Values are kept as the text in the input file. With npi_registry, a valid_npi column is
+    added as in pipeline.deduplicate. Returns {'initial_rows', 'canonical_rows', 'duplicates_removed'}.
+    """
+    budget_bytes = memory_mb * 1024 * 1024
+    chunk_rows = _chunk_rows(input_path, budget_bytes)
+    work = tempfile.mkdtemp(prefix='clearcred-dedup-', dir=spill_dir)
+    try:
+        with span('dedupe_external.spill'):
+            columns = list(pd.read_csv(input_path, dtype=str, nrows=0).columns)
+            keys = _key_columns(columns)
+            key_folders = [os.path.join(work, label) for label, _ in keys]
+            for folder in key_folders:
+                os.makedirs(folder)
+            # Per row: Active/completeness score, and one bit per blocking key whose run it shares
+            scores_path = os.path.join(work, 'scores.bin')
+            n = 0
+            with open(scores_path, 'wb') as scores_file:
+                for chunk in pd.read_csv(input_path, dtype=str, chunksize=chunk_rows):
+                    rows = np.arange(n, n + len(chunk), dtype=np.int64)
+                    for (label, cols), folder in zip(keys, key_folders):
+                        valid, h1, h2 = _key_hashes(chunk, cols)
+                        records = np.empty(len(h1), dtype=RECORD_DTYPE)
+                        records['h1'], records['h2'], records['row'] = h1, h2, rows[valid]
+                        _spill(records, folder, 0)
+                    active = (chunk[STATUS_COL] == 'Active').to_numpy() if STATUS_COL in chunk.columns else 0
+                    score = active * (len(columns) + 2) + chunk.count(axis=1).to_numpy()
+                    score.astype(np.int64).tofile(scores_file)
+                    n += len(chunk)
+            print(f"Spilled blocking keys for {n} rows ({chunk_rows} rows per chunk)")
+
+        with span('dedupe_external.union', n):
+            dsu = DiskUnionFind(n, os.path.join(work, 'parent.npy'))
+            reasons = np.lib.format.open_memmap(os.path.join(work, 'reasons.npy'), mode='w+',
+                                                dtype=np.uint8, shape=(max(n, 1),))
+            for bit, ((label, _), folder) in enumerate(zip(keys, key_folders)):
+                for name in sorted(os.listdir(folder)):
+                    for firsts, others, grouped in _sorted_runs(os.path.join(folder, name), folder, 0, budget_bytes):
+                        dsu.union_runs(firsts, others)
+                        reasons[grouped] |= np.uint8(1 << bit)
+            roots = dsu.resolve(n, chunk_rows)
+
+        with span('dedupe_external.choose', n):
+            # Best row per cluster: highest score, then earliest row
+            best = np.lib.format.open_memmap(os.path.join(work, 'best.npy'), mode='w+',
+                                             dtype=np.int64, shape=(max(n, 1),))
+            best[:] = -1
+            sizes = np.lib.format.open_memmap(os.path.join(work, 'sizes.npy'), mode='w+',
+                                              dtype=np.int64, shape=(max(n, 1),))
+            scores = np.memmap(scores_path, dtype=np.int64, mode='r') if n else np.zeros(0, dtype=np.int64)
+            for start in range(0, n, chunk_rows):
+                block_roots = np.array(roots[start:start + chunk_rows])
+                rank = scores[start:start + len(block_roots)] * (n + 1) + (n - np.arange(start, start + len(block_roots)))
+                np.maximum.at(best, block_roots, rank)
+                np.add.at(sizes, block_roots, 1)
+
+        with span('dedupe_external.write', n):
+            # duplicate_of needs the chosen row's provider_id; only clusters with duplicates are kept
+            chosen_pk = {}
+            start = 0
+            for chunk in pd.read_csv(input_path, dtype=str, chunksize=chunk_rows, usecols=[PK_COL] if PK_COL in columns else None):
+                block = np.arange(start, start + len(chunk))
+                block_roots = np.array(roots[start:start + len(chunk)])
+                chosen = n - (best[block_roots] % (n + 1))
+                mask = (chosen == block) & (sizes[block_roots] > 1)
+                pks = chunk[PK_COL].to_numpy() if PK_COL in chunk.columns else block
+                chosen_pk.update(zip(block_roots[mask].tolist(), pks[mask].tolist()))
+                start += len(chunk)
+
+            labels = [label for label, _ in keys]
+            counts = {'initial_rows': n, 'canonical_rows': 0, 'duplicates_removed': 0}
+            start = 0
+            first = True
+            for chunk in pd.read_csv(input_path, dtype=str, chunksize=chunk_rows):
+                block = np.arange(start, start + len(chunk))
+                block_roots = np.array(roots[start:start + len(chunk)])
+                if npi_registry is not None:
+                    chunk['valid_npi'] = pd.to_numeric(chunk['npi'], errors='coerce').isin(npi_registry).astype(int)
+                is_canonical = (n - (best[block_roots] % (n + 1))) == block
+                canonical = chunk[is_canonical]
+                duplicates = chunk[~is_canonical].copy()
+                dup_roots = block_roots[~is_canonical]
+                dup_bits = np.array(reasons[start:start + len(chunk)])[~is_canonical]
+                duplicates['duplicate_of'] = [chosen_pk[r] for r in dup_roots.tolist()]
+                duplicates['duplicate_reason'] = [
+                    '|'.join(sorted(l for i, l in enumerate(labels) if bits & (1 << i))) or 'unknown'
+                    for bits in dup_bits.tolist()
+                ]
+                duplicates['moved_at'] = datetime.utcnow().isoformat()
+                canonical.to_csv(canonical_path, mode='w' if first else 'a', header=first, index=False)
+                duplicates.to_csv(duplicates_path, mode='w' if first else 'a', header=first, index=False)
+                counts['canonical_rows'] += len(canonical)
+                counts['duplicates_removed'] += len(duplicates)
+                first = False
+                start += len(chunk)
+            if first:
+                pd.DataFrame(columns=columns).to_csv(canonical_path, index=False)
+                pd.DataFrame(columns=columns + ['duplicate_of', 'duplicate_reason', 'moved_at']).to_csv(duplicates_path, index=False)
+        return counts
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
@@ -0,0 +1,119 @@
+import os
+import re
+import gzip
+import shutil
+import threading
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Generated outputs are named <prefix>_<YYYYmmdd>_<HHMMSS>.csv, with a run suffix when two runs share a second
+_TIMESTAMP_SUFFIX = re.compile(r'_\d{8}_\d{6}(?:_[0-9a-f]{6})?$')
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 10
+# Content-Encoding -> sidecar extension, in server preference order
+ENCODINGS = {'zstd': '.zst', 'gzip': '.gz'} if zstandard is not None else {'gzip': '.gz'}
+SIDECAR_EXTENSIONS = ('.gz', '.zst')
+
+
+def file_prefix(filename):
+    """'ca_final_processed_20240101_120000.csv' -> 'ca_final_processed'"""
+    stem = filename[:-4] if filename.endswith('.csv') else filename
+    return _TIMESTAMP_SUFFIX.sub('', stem)
+
+
+def write_sidecars(filepath):
+    """Precompress an output next to it (file.csv.gz, and file.csv.zst when zstandard is installed)."""
+    with open(filepath, 'rb') as src, gzip.open(filepath + '.gz.tmp', 'wb', compresslevel=GZIP_LEVEL) as dst:
+        shutil.copyfileobj(src, dst, 1024 * 1024)
+    os.replace(filepath + '.gz.tmp', filepath + '.gz')
+    if zstandard is not None:
+        with open(filepath, 'rb') as src, open(filepath + '.zst.tmp', 'wb') as dst:
+            zstandard.ZstdCompressor(level=ZSTD_LEVEL).copy_stream(src, dst)
+        os.replace(filepath + '.zst.tmp', filepath + '.zst')
+
+
+def remove_with_sidecars(filepath):
+    """Delete an output and its compressed sidecars. Returns True if the output itself existed."""
+    for path in [filepath + ext for ext in SIDECAR_EXTENSIONS]:
+        if os.path.isfile(path):
+            os.remove(path)
+    if os.path.isfile(filepath):
+        os.remove(filepath)
+        return True
+    return False
+
+
+class FileCatalog:
+    """
+    In-memory index of the CSVs in the outputs folder: filename -> path and prefix -> newest
+    filename, so downloads resolve without scanning the directory on every request.
+    Files written by other worker processes are picked up by a rescan on a miss.
+    """
+
+    def __init__(self, folder):
+        self.folder = folder
+        self._lock = threading.Lock()
+        self._files = {}
+        self._latest = {}
+        self.rescan()
+
+    def rescan(self):
+        files = {}
+        if os.path.exists(self.folder):
+            for filename in os.listdir(self.folder):
+                if filename.endswith('.csv') and os.path.isfile(os.path.join(self.folder, filename)):
+                    files[filename] = os.path.join(self.folder, filename)
+        latest = {}
+        # Timestamps sort lexicographically, so the largest name per prefix is the newest
+        for filename in sorted(files):
+            latest[file_prefix(filename)] = filename
+        with self._lock:
+            self._files, self._latest = files, latest
+
+    def add(self, filename):
+        with self._lock:
+            self._files[filename] = os.path.join(self.folder, filename)
+            prefix = file_prefix(filename)
+            if filename >= self._latest.get(prefix, ''):
+                self._latest[prefix] = filename
+
+    def discard(self, filename):
+        with self._lock:
+            self._files.pop(filename, None)
+            prefix = file_prefix(filename)
+            if self._latest.get(prefix) == filename:
+                remaining = [f for f in self._files if file_prefix(f) == prefix]
+                if remaining:
+                    self._latest[prefix] = max(remaining)
+                else:
+                    del self._latest[prefix]
+
+    def names(self):
+        with self._lock:
+            return sorted(self._files)
+
+    def _lookup(self, filename):
+        with self._lock:
+            if filename in self._files:
+                return filename
+            return self._latest.get(file_prefix(filename))
+
+    def resolve(self, filename):
+        """
+        Filename to serve for a request: the exact file, else the newest file with the same
+        prefix (an older timestamp, or just the prefix). None if nothing matches.
+        """
+        found = self._lookup(filename)
+        if found is None or not os.path.isfile(os.path.join(self.folder, found)):
+            self.rescan()
+            found = self._lookup(filename)
+        return found
+
+    def latest(self, prefix):
+        return self.resolve(prefix)
+
+    def path(self, filename):
+        return os.path.join(self.folder, filename)
@@ -1,10 +1,17 @@
 
 import os
+import time
+import threading
 from flask import jsonify, request
-import pandas as pd
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.wsgi import get_input_stream
 import io
-from utils import dataframe_to_dict, generate_csv_file, allowed_file
+from utils import dataframe_to_dict, generate_csv_file, allowed_file, load_existing_files, lazy_import
 from typing import Dict
+from pipeline import load_license_databases
+from upload_preview import preview_csv
+
+pd = lazy_import('pandas')
 
 stored_data = {
     'initial_dataset': None,
@@ -14,6 +21,97 @@ stored_data = {
     'merged_ca': None
 }
 
+# Startup/warm-up progress reported by /readyz
+startup_state = {
+    'mode': None,
+    'ready': False,
+    'import_seconds': None,
+    'warmup_seconds': None,
+    'warmup_error': None
+}
+_reference_lock = threading.Lock()
+
+# Load NY and CA license data from static files
+def load_state_license_data():
+    try:
+        stored_data.update(load_license_databases())
+    except Exception as e:
+        print(f"Error loading state license data: {e}")
+
+def ensure_reference_data():
+    """Load the license reference data on first use if warm-up hasn't done it yet."""
+    if stored_data['ny_data'] is None or stored_data['ca_data'] is None:
+        with _reference_lock:
+            if stored_data['ny_data'] is None or stored_data['ca_data'] is None:
+                load_state_license_data()
+
+def warm_up():
+    """Import the heavy libraries and load reference data, then mark the server ready."""
+    start = time.perf_counter()
+    try:
+        for name in ('pandas', 'rapidfuzz', 'nameparser', 'unidecode'):
+            # Touching an attribute forces a lazily imported module to execute
+            getattr(lazy_import(name), '__version__', None)
+        ensure_reference_data()
+        load_existing_files()
+    except Exception as e:
+        startup_state['warmup_error'] = str(e)
+        print(f"Error during warm-up: {e}")
+    startup_state['warmup_seconds'] = round(time.perf_counter() - start, 3)
+    startup_state['ready'] = True
+    print(f"Warm-up finished in {startup_state['warmup_seconds']}s")
+
+def start_warm_up(mode):
+    """
+    eager: warm up before returning (the default, and what --prod preloads before fork)
+    background: warm up in a daemon thread; /readyz reports 503 until it finishes
+    lazy: skip warm-up; libraries and reference data load on first use
+    """
+    startup_state['mode'] = mode
+    if mode == 'lazy':
+        startup_state['ready'] = True
+    elif mode == 'background':
+        threading.Thread(target=warm_up, name='clearcred-warmup', daemon=True).start()
+    else:
+        warm_up()
+
+# Marker in uploads/ naming the user's uploaded roster, so every worker loads the same file
+INITIAL_DATASET_MARKER = '.initial_dataset'
+_initial_dataset_lock = threading.Lock()
+# (path, mtime_ns) of the file stored_data['initial_dataset'] was read from
+_initial_dataset_key = {'key': None}
+
+def _uploaded_dataset_key(upload_folder='uploads'):
+    """(path, mtime_ns) of the roster named by the upload marker, or None if there is none."""
+    try:
+        with open(os.path.join(upload_folder, INITIAL_DATASET_MARKER), encoding='utf-8') as f:
+            path = os.path.join(upload_folder, os.path.basename(f.read().strip()))
+        return path, os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+def _record_upload(file_path, upload_folder='uploads'):
+    """Point the upload marker at file_path (written atomically so readers never see it half-written)."""
+    marker = os.path.join(upload_folder, INITIAL_DATASET_MARKER)
+    with open(marker + '.tmp', 'w', encoding='utf-8') as f:
+        f.write(os.path.basename(file_path))
+    os.replace(marker + '.tmp', marker)
+
+def get_initial_dataset():
+    """
+    Return the uploaded roster. Under a multi-worker server the upload may have been
+    handled by another process, so the frame is keyed on the uploaded file's path and
+    mtime and reloaded from uploads/ whenever another worker replaced it.
+    """
+    key = _uploaded_dataset_key()
+    if key is None or key == _initial_dataset_key['key']:
+        return stored_data['initial_dataset']
+    with _initial_dataset_lock:
+        if key != _initial_dataset_key['key']:
+            stored_data['initial_dataset'] = pd.read_csv(key[0])
+            _initial_dataset_key['key'] = key
+    return stored_data['initial_dataset']
+
 def upload_initial_dataset_handler():
     try:
         if 'file' not in request.files:
@@ -34,7 +132,9 @@ def upload_initial_dataset_handler():
             file.save(file_path)
             # Read file into DataFrame
             df = pd.read_csv(file_path)
+            _record_upload(file_path, upload_folder)
             stored_data['initial_dataset'] = df
+            _initial_dataset_key['key'] = _uploaded_dataset_key(upload_folder)
             return jsonify({
                 'status': 'success',
                 'message': 'Initial dataset uploaded successfully',
@@ -49,6 +149,45 @@ def upload_initial_dataset_handler():
     except Exception as e:
         return jsonify({'error': f'Error processing file: {str(e)}'}), 500
 
+def preview_upload_handler():
+    """
+    Profile a roster before uploading it for processing: the file as multipart 'file', or the raw
+    CSV bytes as the request body (a client can send just a slice of a very large file). Nothing is
+    saved or stored.
+    """
+    try:
+        # Only multipart bodies are parsed as a form; a raw body is never read past the preview
+        if request.mimetype == 'multipart/form-data':
+            if 'file' not in request.files:
+                return jsonify({'error': 'No file provided'}), 400
+            file = request.files['file']
+            if file.filename == '':
+                return jsonify({'error': 'No file selected'}), 400
+            if not allowed_file(file.filename):
+                return jsonify({'error': 'Invalid file type. Only CSV files are allowed'}), 400
+            stream, filename = file.stream, file.filename
+            try:
+                stream.seek(0, os.SEEK_END)
+                total_bytes = stream.tell()
+                stream.seek(0)
+            except (AttributeError, OSError):
+                total_bytes = None
+        elif request.content_length:
+            # The preview stops reading after its time budget, so the upload size limit does not apply
+            stream = get_input_stream(request.environ, max_content_length=None)
+            filename, total_bytes = None, request.content_length
+        else:
+            return jsonify({'error': 'No file provided'}), 400
+        preview = preview_csv(stream, total_bytes=total_bytes)
+        preview['file']['filename'] = filename
+        return jsonify(dict({'status': 'success'}, **preview))
+    except RequestEntityTooLarge:
+        return jsonify({'error': 'File is larger than the upload limit; send the raw CSV bytes as the request body to preview it'}), 413
+    except (ValueError, UnicodeDecodeError, pd.errors.ParserError) as e:
+        return jsonify({'error': f'Could not read file as CSV: {str(e)}'}), 400
+    except Exception as e:
+        return jsonify({'error': f'Error previewing file: {str(e)}'}), 500
+
 def upload_ny_license_data_handler():
     try:
         if 'file' not in request.files:
@@ -0,0 +1,173 @@
+import re
+import weakref
+from collections import defaultdict
+from utils import lazy_import
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+rapidfuzz = lazy_import('rapidfuzz')
+
+NGRAM_SIZE = 3
+MAX_CANDIDATES = 10
+# Confidence weights when both sides have a license number, and when only names can be compared
+LICENSE_WEIGHTS = (0.6, 0.3, 0.1)
+NAME_ONLY_WEIGHTS = (0.0, 0.75, 0.25)
+
+_NON_ALNUM = re.compile(r'[^0-9A-Z]')
+_index_cache = {}
+
+
+def normalize_license(value):
+    if not isinstance(value, str):
+        return ''
+    return _NON_ALNUM.sub('', value.upper())
+
+
+def normalize_text(value):
+    if not isinstance(value, str):
+        return ''
+    return ' '.join(value.lower().split())
+
+
+def full_names(df, first_col='first_name', last_col='last_name'):
+    """Normalized "first last" per row; a missing part is left out."""
+    parts = [df[col].where(df[col].notna(), '').astype(str) for col in (first_col, last_col) if col in df.columns]
+    if not parts:
+        return [''] * len(df)
+    combined = parts[0] if len(parts) == 1 else parts[0] + ' ' + parts[1]
+    return [normalize_text(v) for v in combined]
+
+
+def license_ngrams(key, n=NGRAM_SIZE):
+    # Padded so that short numbers and the first/last characters still produce grams
+    padded = f"^{key}$"
+    return {padded[i:i + n] for i in range(max(len(padded) - n + 1, 1))}
+
+
+def _pair_scores(left, right, scorer):
+    """scorer over aligned (left, right) arrays of strings; each distinct pair is scored once, in one cpdist batch."""
+    codes, uniques = pd.factorize(pd.MultiIndex.from_arrays([left, right]))
+    if not len(uniques):
+        return np.zeros(len(left))
+    scores = rapidfuzz.process.cpdist(uniques.get_level_values(0).tolist(), uniques.get_level_values(1).tolist(),
+                                      scorer=scorer, dtype=np.float64, workers=-1)
+    return scores[codes]
+
+
+class LicenseIndex:
+    """
+    Approximate-match index over one license database: an n-gram inverted index on
+    normalized license numbers and a token inverted index on "first last" names.
+    Candidates are gathered from the postings and only those are scored with rapidfuzz.
+    """
+
+    def __init__(self, license_df, license_col='license_number', first_col='first_name',
+                 last_col='last_name', school_col='medical_school'):
+        self.size = len(license_df)
+        self.licenses = [normalize_license(v) for v in license_df[license_col]]
+        self.names = full_names(license_df, first_col, last_col)
+        schools = license_df[school_col] if school_col in license_df.columns else [''] * self.size
+        self.schools = [normalize_text(v) for v in schools]
+
+        gram_postings = defaultdict(list)
+        for position, key in enumerate(self.licenses):
+            if key:
+                for gram in license_ngrams(key):
+                    gram_postings[gram].append(position)
+        token_postings = defaultdict(list)
+        for position, name in enumerate(self.names):
+            for token in set(name.split()):
+                token_postings[token].append(position)
+        self.gram_postings = {gram: np.asarray(p, dtype=np.int32) for gram, p in gram_postings.items()}
+        self.token_postings = {token: np.asarray(p, dtype=np.int32) for token, p in token_postings.items()}
+
+    def _top_candidates(self, postings, keys, limit):
+        lists = [postings[k] for k in keys if k in postings]
+        if not lists:
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.int64)
+        positions, counts = np.unique(np.concatenate(lists), return_counts=True)
+        if len(positions) > limit:
+            top = np.argpartition(-counts, limit - 1)[:limit]
+            positions, counts = positions[top], counts[top]
+        return positions, counts
+
+    def candidates(self, license_key, name):
+        by_license = np.empty(0, dtype=np.int32)
+        if license_key:
+            by_license, _ = self._top_candidates(self.gram_postings, license_ngrams(license_key), MAX_CANDIDATES)
+        tokens = name.split()
+        by_name, counts = self._top_candidates(self.token_postings, tokens, MAX_CANDIDATES)
+        # A shared name token only counts as a candidate when the name has a single token
+        # or at least two tokens agree (otherwise every "Smith" would be scored)
+        if len(tokens) > 1:
+            by_name = by_name[counts >= 2]
+        return np.union1d(by_license, by_name)
+
+    def best_matches(self, licenses, names, schools=None):
+        """
+        Best candidate per query row. Returns a DataFrame aligned with the inputs holding
+        position (row position in the license database, -1 if none), confidence (0-100)
+        and the license/name/school similarities it was built from.
+        """
+        licenses = [normalize_license(v) for v in licenses]
+        names = [normalize_text(v) for v in names]
+        schools = [normalize_text(v) for v in schools] if schools is not None else [''] * len(names)
+
+        pair_query, pair_candidate = [], []
+        for i, (license_key, name) in enumerate(zip(licenses, names)):
+            found = self.candidates(license_key, name)
+            pair_query.extend([i] * len(found))
+            pair_candidate.extend(found.tolist())
+
+        result = pd.DataFrame({
+            'position': np.full(len(names), -1, dtype=np.int64),
+            'confidence': np.zeros(len(names)),
+            'license_similarity': np.zeros(len(names)),
+            'name_similarity': np.zeros(len(names)),
+            'school_similarity': np.zeros(len(names)),
+        })
+        if not pair_query:
+            return result
+
+        pair_query = np.asarray(pair_query, dtype=np.int64)
+        pair_candidate = np.asarray(pair_candidate, dtype=np.int64)
+        query_licenses = np.asarray(licenses, dtype=object)[pair_query]
+        candidate_licenses = np.asarray(self.licenses, dtype=object)[pair_candidate]
+        query_schools = np.asarray(schools, dtype=object)[pair_query]
+        candidate_schools = np.asarray(self.schools, dtype=object)[pair_candidate]
+        has_license = (query_licenses != '') & (candidate_licenses != '')
+        has_school = (query_schools != '') & (candidate_schools != '')
+
+        fuzz = rapidfuzz.fuzz
+        lic_sim = np.where(has_license, _pair_scores(query_licenses, candidate_licenses, fuzz.ratio), 0.0)
+        name_sim = _pair_scores(np.asarray(names, dtype=object)[pair_query],
+                                np.asarray(self.names, dtype=object)[pair_candidate], fuzz.token_sort_ratio)
+        school_sim = np.where(has_school, _pair_scores(query_schools, candidate_schools, fuzz.token_set_ratio), 0.0)
+        weights = np.where(has_license[:, None], LICENSE_WEIGHTS, NAME_ONLY_WEIGHTS)
+        confidence = weights[:, 0] * lic_sim + weights[:, 1] * name_sim + weights[:, 2] * school_sim
+
+        pairs = pd.DataFrame({
+            'query': pair_query,
+            'position': pair_candidate,
+            'confidence': confidence,
+            'license_similarity': lic_sim,
+            'name_similarity': name_sim,
+            'school_similarity': school_sim,
+        })
+        best = pairs.sort_values('confidence', ascending=False, kind='stable').drop_duplicates('query')
+        best = best.set_index('query')
+        result.loc[best.index, best.columns] = best
+        result['position'] = result['position'].astype(np.int64)
+        return result.round({'confidence': 2, 'license_similarity': 2, 'name_similarity': 2, 'school_similarity': 2})
+
+
+def get_license_index(license_df):
+    """Build the index for a license database once and reuse it for as long as the frame lives."""
+    key = id(license_df)
+    entry = _index_cache.get(key)
+    if entry is not None and entry[0]() is license_df:
+        return entry[1]
+    index = LicenseIndex(license_df)
+    _index_cache[key] = (weakref.ref(license_df), index)
+    weakref.finalize(license_df, _index_cache.pop, key, None)
+    return index
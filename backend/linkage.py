@@ -0,0 +1,267 @@
+"""
+Probabilistic (Fellegi-Sunter) record linkage for deduplication.
+
+Candidate pairs come from blocking on a few keys. Each pair gets a comparison vector, one level
+per field (missing / disagree / similar / exact), computed as whole-array operations: exact
+agreement compares factorized codes, and similarity is scored once per distinct pair of values
+with rapidfuzz cpdist (rapidfuzz >= 3.8). The m- and u-probabilities of every level are estimated
+by EM over the distinct comparison vectors (weighted by their counts), and a pair's match weight
+is the sum of log2(m/u) over its fields. Pairs at or above the match weight are linked.
+"""
+import os
+from utils import lazy_import
+from profiling import span
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+rapidfuzz = lazy_import('rapidfuzz')
+
+# Comparison levels; MISSING contributes no evidence either way
+MISSING, DISAGREE, SIMILAR, EXACT = -1, 0, 1, 2
+LEVELS = 3
+
+# field -> (comparison, similarity threshold); 'exact' fields never reach SIMILAR
+LINKAGE_FIELDS = {
+    'first_name': ('name', 0.92),
+    'last_name': ('name', 0.92),
+    'practice_phone': ('exact', None),
+    'npi': ('exact', None),
+    'license_number': ('exact', None),
+    'practice_address_line1': ('text', 90),
+    'practice_zip': ('exact', None),
+    'medical_school': ('text', 90),
+    'residency_program': ('text', 90),
+    'primary_specialty': ('exact', None),
+}
+# Pairs are only compared within a block of one of these keys
+BLOCKING_KEYS = [
+    ['practice_phone'],
+    ['license_number'],
+    ['npi'],
+    ['last_name', 'first_name'],
+    ['last_name', 'practice_zip'],
+]
+# Larger blocks (a group practice's shared phone, a very common name) are not paired on that key
+MAX_BLOCK_SIZE = 100
+
+DEFAULT_MATCH_WEIGHT = 10.0
+# None keeps the rule-based unions of dedupe_simple
+LINKAGE_MATCH_WEIGHT = (float(os.environ['CLEARCRED_LINKAGE_MATCH_WEIGHT'])
+                        if os.environ.get('CLEARCRED_LINKAGE_MATCH_WEIGHT') else None)
+
+EM_MAX_ITERATIONS = 200
+EM_TOLERANCE = 1e-7
+EM_INITIAL_MATCH_RATE = 0.1
+# Keeps unseen levels from giving infinite weights
+PROBABILITY_FLOOR = 1e-6
+
+
+def _field_codes(series):
+    """(codes, distinct values) of a column compared as trimmed, casefolded text; code -1 is missing."""
+    if pd.api.types.is_float_dtype(series) and (series.dropna() % 1 == 0).all():
+        series = series.astype('Int64')
+    # Normalize each distinct raw value once, then merge the ones that normalize alike
+    raw_codes, raw_uniques = pd.factorize(series)
+    text = pd.Series(raw_uniques.astype(str), dtype=object).str.strip().str.casefold()
+    unique_codes, uniques = pd.factorize(text.where(text != ''))
+    codes = np.append(unique_codes, -1)[raw_codes]
+    return codes.astype(np.int64), np.asarray(uniques, dtype=object)
+
+
+def _column_codes(df, column, cache):
+    if column not in cache:
+        cache[column] = _field_codes(df[column])
+    return cache[column]
+
+
+def _block_pairs(keys, max_block_size=MAX_BLOCK_SIZE):
+    """(left, right) row positions of every pair sharing a block code (-1 = not blocked), left < right."""
+    rows = np.flatnonzero(keys >= 0)
+    order = rows[np.argsort(keys[rows], kind='stable')]
+    sorted_keys = keys[order]
+    if len(order) < 2:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+    sizes = np.diff(np.r_[starts, len(order)])
+    block_size = np.repeat(sizes, sizes)
+    eligible = block_size <= max_block_size
+    # Row k pairs with row k + d of the sorted order while both are in the same block
+    lefts, rights = [], []
+    for d in range(1, int(sizes[sizes <= max_block_size].max(initial=1))):
+        same = (sorted_keys[:-d] == sorted_keys[d:]) & eligible[:-d]
+        if not same.any():
+            break
+        lefts.append(order[:-d][same])
+        rights.append(order[d:][same])
+    if not lefts:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    left, right = np.concatenate(lefts), np.concatenate(rights)
+    return np.minimum(left, right), np.maximum(left, right)
+
+
+def candidate_pairs(df, blocking_keys=BLOCKING_KEYS, max_block_size=MAX_BLOCK_SIZE, codes_cache=None):
+    """Distinct (left, right) row positions of df that share at least one blocking key."""
+    n = len(df)
+    codes_cache = {} if codes_cache is None else codes_cache
+    pair_ids = []
+    for columns in blocking_keys:
+        if not all(c in df.columns for c in columns):
+            continue
+        keys = np.zeros(n, dtype=np.int64)
+        missing = np.zeros(n, dtype=bool)
+        for column in columns:
+            codes, uniques = _column_codes(df, column, codes_cache)
+            # Mixed-radix key over the columns' codes (codes are dense, so this is collision-free)
+            keys = keys * (len(uniques) + 1) + codes + 1
+            missing |= codes < 0
+        keys[missing] = -1
+        left, right = _block_pairs(keys, max_block_size)
+        pair_ids.append(left * n + right)
+    if not pair_ids:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    pair_ids = np.unique(np.concatenate(pair_ids))
+    return pair_ids // n, pair_ids % n
+
+
+def _similar(uniques, left_codes, right_codes, comparison, threshold):
+    """Whether each (left, right) pair of distinct values is similar; each distinct pair is scored once."""
+    pair_keys, inverse = np.unique(left_codes * len(uniques) + right_codes, return_inverse=True)
+    pairs = np.stack([pair_keys // len(uniques), pair_keys % len(uniques)], axis=1)
+    if comparison == 'name':
+        scorer = rapidfuzz.distance.JaroWinkler.normalized_similarity
+    else:
+        scorer = rapidfuzz.fuzz.token_sort_ratio
+    scores = rapidfuzz.process.cpdist(uniques[pairs[:, 0]].tolist(), uniques[pairs[:, 1]].tolist(),
+                                      scorer=scorer, workers=-1)
+    return (scores >= threshold)[inverse.reshape(-1)]
+
+
+def comparison_vectors(df, left, right, fields=LINKAGE_FIELDS, codes_cache=None):
+    """(fields, levels): an int8 matrix with one row per candidate pair and one column per compared field."""
+    codes_cache = {} if codes_cache is None else codes_cache
+    fields = [f for f in fields if f in df.columns]
+    levels = np.full((len(left), len(fields)), MISSING, dtype=np.int8)
+    for column, field in enumerate(fields):
+        comparison, threshold = LINKAGE_FIELDS[field]
+        codes, uniques = _column_codes(df, field, codes_cache)
+        left_codes, right_codes = codes[left], codes[right]
+        present = (left_codes >= 0) & (right_codes >= 0)
+        exact = present & (left_codes == right_codes)
+        field_levels = np.where(exact, EXACT, np.where(present, DISAGREE, MISSING)).astype(np.int8)
+        if comparison != 'exact':
+            differ = np.flatnonzero(present & ~exact)
+            if len(differ):
+                similar = _similar(uniques, left_codes[differ], right_codes[differ], comparison, threshold)
+                field_levels[differ[similar]] = SIMILAR
+        levels[:, column] = field_levels
+    return fields, levels
+
+
+def _pattern_codes(levels):
+    """Distinct comparison vectors (patterns x fields), the pattern of each pair, and pattern counts."""
+    # Each vector as one base-(LEVELS + 1) integer, so distinct vectors are a 1-d unique
+    radix = (LEVELS + 1) ** np.arange(levels.shape[1], dtype=np.int64)
+    codes, inverse, counts = np.unique((levels.astype(np.int64) + 1) @ radix, return_inverse=True, return_counts=True)
+    patterns = (codes[:, None] // radix[None, :]) % (LEVELS + 1) - 1
+    return patterns.astype(np.int8), inverse.reshape(-1), counts
+
+
+def _log_likelihoods(patterns, probabilities):
+    """Per pattern: sum over fields of log2 probability of the field's level (missing fields skipped)."""
+    present = patterns >= 0
+    logs = np.log2(probabilities)[np.arange(patterns.shape[1]), np.where(present, patterns, 0)]
+    return np.where(present, logs, 0.0).sum(axis=1)
+
+
+def estimate_parameters(levels, max_iterations=EM_MAX_ITERATIONS, tolerance=EM_TOLERANCE):
+    """
+    EM for the two-class (match / non-match) mixture over comparison vectors, assuming fields are
+    conditionally independent. Runs on the distinct vectors weighted by their counts, so the cost
+    does not grow with the number of pairs. Returns {'m', 'u' (fields x levels), 'match_rate', 'iterations'}.
+    """
+    patterns, _, counts = _pattern_codes(levels)
+    n_fields = levels.shape[1]
+    # One-hot of each (pattern, field) level; missing levels are all-zero rows
+    onehot = (patterns[:, :, None] == np.arange(LEVELS)[None, None, :]).astype(np.float64)
+    totals = counts[:, None, None] * onehot
+
+    # Start with agreement likely for matches; u from the observed level frequencies (mostly non-matches)
+    m = np.tile(np.array([0.05, 0.15, 0.80]), (n_fields, 1))
+    u = totals.sum(axis=0) + PROBABILITY_FLOOR
+    u /= u.sum(axis=1, keepdims=True)
+    match_rate = EM_INITIAL_MATCH_RATE
+    iteration = 0
+    for iteration in range(1, max_iterations + 1):
+        # E-step: posterior probability that each pattern is a match
+        log_odds = (np.log2(match_rate) + _log_likelihoods(patterns, m)
+                    - np.log2(1 - match_rate) - _log_likelihoods(patterns, u))
+        posterior = 1.0 / (1.0 + np.exp2(-np.clip(log_odds, -500, 500)))
+        # M-step: level frequencies among (expected) matches and non-matches
+        weighted = counts * posterior
+        new_match_rate = float(np.clip(weighted.sum() / counts.sum(), PROBABILITY_FLOOR, 1 - PROBABILITY_FLOOR))
+        new_m = np.einsum('p,pfl->fl', posterior, totals) + PROBABILITY_FLOOR
+        new_u = np.einsum('p,pfl->fl', 1 - posterior, totals) + PROBABILITY_FLOOR
+        new_m /= new_m.sum(axis=1, keepdims=True)
+        new_u /= new_u.sum(axis=1, keepdims=True)
+        change = max(abs(new_match_rate - match_rate), np.abs(new_m - m).max(), np.abs(new_u - u).max())
+        m, u, match_rate = new_m, new_u, new_match_rate
+        if change < tolerance:
+            break
+    # The classes are interchangeable to EM; the match class is the one that agrees more often
+    if m[:, EXACT].sum() < u[:, EXACT].sum():
+        m, u, match_rate = u, m, 1 - match_rate
+    return {'m': m, 'u': u, 'match_rate': match_rate, 'iterations': iteration}
+
+
+def match_weights(levels, parameters):
+    """Match weight (log2 likelihood ratio) of every pair; distinct vectors are scored once."""
+    patterns, inverse, _ = _pattern_codes(levels)
+    weights = _log_likelihoods(patterns, parameters['m']) - _log_likelihoods(patterns, parameters['u'])
+    return weights[inverse.reshape(-1)]
+
+
+def score_pairs(df, blocking_keys=BLOCKING_KEYS, max_block_size=MAX_BLOCK_SIZE):
+    """
+    Candidate pairs of df (row positions) with their comparison levels and match weights.
+    Returns (left, right, weights, model) where model holds the fields and the fitted parameters.
+    """
+    # Columns used for blocking and comparison are factorized once
+    codes_cache = {}
+    with span('linkage.blocking', len(df)):
+        left, right = candidate_pairs(df, blocking_keys, max_block_size, codes_cache)
+    with span('linkage.compare', len(left)):
+        fields, levels = comparison_vectors(df, left, right, codes_cache=codes_cache)
+    if not len(left):
+        return left, right, np.zeros(0), {'fields': fields, 'pairs': 0}
+    with span('linkage.em', len(left)):
+        parameters = estimate_parameters(levels)
+        weights = match_weights(levels, parameters)
+    model = dict(parameters, fields=fields, pairs=len(left))
+    return left, right, weights, model
+
+
+def linked_pairs(df, match_weight=DEFAULT_MATCH_WEIGHT):
+    """(left, right, weights) of the candidate pairs at or above match_weight."""
+    left, right, weights, model = score_pairs(df)
+    linked = weights >= match_weight
+    if model['pairs']:
+        print(f"Linkage: {model['pairs']} candidate pairs, EM converged in {model['iterations']} iterations "
+              f"(match rate {model['match_rate']:.4f}), {int(linked.sum())} pairs linked at weight >= {match_weight}")
+    return left[linked], right[linked], weights[linked]
+
+
+def describe_model(model):
+    """JSON-ready m/u probabilities and agreement weights per field and level."""
+    names = {DISAGREE: 'disagree', SIMILAR: 'similar', EXACT: 'exact'}
+    levels = lambda field: [l for l in names if l != SIMILAR or LINKAGE_FIELDS[field][0] != 'exact']
+    return {
+        'pairs': model['pairs'],
+        'match_rate': round(float(model.get('match_rate', 0.0)), 6),
+        'fields': {
+            field: {names[level]: {'m': round(float(model['m'][i, level]), 6),
+                                   'u': round(float(model['u'][i, level]), 6),
+                                   'weight': round(float(np.log2(model['m'][i, level] / model['u'][i, level])), 3)}
+                    for level in levels(field)}
+            for i, field in enumerate(model['fields'])
+        } if 'm' in model else {}
+    }
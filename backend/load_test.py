@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Concurrent load test for the API: many clients polling the dashboard endpoints (and optionally
+downloading a file) while pipeline runs go on in the background. Reports p50/p90/p99 latency.
+
+    python load_test.py --concurrency 50 --duration 30
+    python load_test.py --pipeline --download ca_final_processed
+"""
+
+import sys
+import time
+import argparse
+import threading
+import urllib.request
+import urllib.error
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_ENDPOINTS = '/data/status,/files/list,/quality-score'
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(int(round(pct / 100 * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def timed_request(url, method='GET', headers=None, timeout=600):
+    """(status, seconds); the body is read fully so downloads are timed end to end."""
+    request = urllib.request.Request(url, method=method, headers=headers or {})
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            while response.read(64 * 1024):
+                pass
+            status = response.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    except Exception:
+        status = None
+    return status, time.perf_counter() - start
+
+
+class Results:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def add(self, name, status, seconds):
+        with self._lock:
+            if status is not None and status < 400:
+                self.latencies[name].append(seconds)
+            else:
+                self.errors[name] += 1
+
+
+def client_loop(base_url, paths, results, deadline, offset):
+    i = offset
+    while time.perf_counter() < deadline:
+        name, path, headers = paths[i % len(paths)]
+        status, seconds = timed_request(base_url + path, headers=headers)
+        results.add(name, status, seconds)
+        i += 1
+
+
+def pipeline_loop(base_url, results, deadline):
+    # Heavy requests back to back for the whole test
+    while time.perf_counter() < deadline:
+        status, seconds = timed_request(base_url + '/process/complete-pipeline', method='POST')
+        results.add('POST /process/complete-pipeline', status, seconds)
+
+
+def report(results, elapsed):
+    print(f"\n{'endpoint':<48}{'ok':>7}{'err':>6}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    total = 0
+    for name in sorted(set(results.latencies) | set(results.errors)):
+        values = sorted(results.latencies[name])
+        total += len(values)
+        cells = [percentile(values, p) for p in (50, 90, 99)] + [values[-1] if values else None]
+        formatted = ''.join(f"{v * 1000:>10.1f}" if v is not None else f"{'-':>10}" for v in cells)
+        print(f"{name:<48}{len(values):>7}{results.errors[name]:>6}{formatted}")
+    print(f"\n📈 {total} successful requests in {elapsed:.1f}s ({total / elapsed:.1f} req/s)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Concurrent latency test for the ClearCred API')
+    parser.add_argument('--url', default='http://localhost:5000', help='API base URL')
+    parser.add_argument('-c', '--concurrency', type=int, default=20, help='concurrent polling clients')
+    parser.add_argument('-d', '--duration', type=float, default=20, help='seconds to run')
+    parser.add_argument('--endpoints', default=DEFAULT_ENDPOINTS, help='comma-separated GET paths to poll')
+    parser.add_argument('--download', default=None,
+                        help='also download this output file (or prefix), gzip-encoded, in the mix')
+    parser.add_argument('--pipeline', action='store_true',
+                        help='run /process/complete-pipeline continuously in the background')
+    args = parser.parse_args(argv)
+
+    base_url = args.url.rstrip('/')
+    paths = [(f"GET {p}", p, {}) for p in args.endpoints.split(',') if p]
+    if args.download:
+        paths.append(("GET /files/download (gzip)", f"/files/download/{args.download}", {'Accept-Encoding': 'gzip'}))
+
+    status, _ = timed_request(base_url + '/healthz', timeout=5)
+    if status != 200:
+        print(f"❌ {base_url} is not answering /healthz")
+        return 1
+
+    print(f"🔄 {args.concurrency} clients for {args.duration:.0f}s against {base_url}"
+          f"{' with the pipeline running' if args.pipeline else ''}")
+    results = Results()
+    start = time.perf_counter()
+    deadline = start + args.duration
+    with ThreadPoolExecutor(max_workers=args.concurrency + 1) as executor:
+        if args.pipeline:
+            executor.submit(pipeline_loop, base_url, results, deadline)
+        for i in range(args.concurrency):
+            executor.submit(client_loop, base_url, paths, results, deadline, i)
+    report(results, time.perf_counter() - start)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,105 @@
+import os
+import json
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from utils import lazy_import
+
+pd = lazy_import('pandas')
+nameparser = lazy_import('nameparser')
+unidecode = lazy_import('unidecode')
+
+NAME_CACHE_PATH = os.path.join('cache', 'parsed_names.json')
+NAME_CACHE_VERSION = 1
+NAME_COLUMNS = ['name_prefix', 'first_name', 'middle_name', 'last_name', 'name_suffix']
+
+# Below this many uncached names the pool start-up costs more than it saves
+PARALLEL_MIN_NAMES = 5000
+PARALLEL_CHUNK_SIZE = 2000
+
+_name_cache = None
+_cache_lock = threading.Lock()
+
+
+def parse_name(raw):
+    """Fold to ASCII and split a raw name into [prefix, first, middle, last, suffix]."""
+    name = nameparser.HumanName(unidecode.unidecode(raw))
+    return [name.title, name.first, name.middle, name.last, name.suffix]
+
+
+def _parse_chunk(names):
+    return [parse_name(raw) for raw in names]
+
+
+def _load_cache():
+    global _name_cache
+    if _name_cache is None:
+        _name_cache = {}
+        if os.path.exists(NAME_CACHE_PATH):
+            try:
+                with open(NAME_CACHE_PATH, 'r', encoding='utf-8') as f:
+                    payload = json.load(f)
+                if payload.get('version') == NAME_CACHE_VERSION:
+                    _name_cache = payload.get('names', {})
+            except Exception as e:
+                print(f"Warning: Could not read name cache {NAME_CACHE_PATH}: {e}")
+    return _name_cache
+
+
+def _save_cache(cache):
+    os.makedirs(os.path.dirname(NAME_CACHE_PATH), exist_ok=True)
+    tmp_path = f"{NAME_CACHE_PATH}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'version': NAME_CACHE_VERSION, 'names': cache}, f)
+    os.replace(tmp_path, NAME_CACHE_PATH)
+
+
+def parse_names(values):
+    """
+    Parse every distinct raw name once, reusing the on-disk cache from earlier runs.
+    Uncached names are split across a process pool when there are enough of them.
+    Returns a DataFrame of NAME_COLUMNS indexed by the raw name string.
+    """
+    uniques = pd.unique(values.dropna().astype(str))
+    with _cache_lock:
+        cache = _load_cache()
+        missing = [raw for raw in uniques if raw not in cache]
+        if missing:
+            if len(missing) >= PARALLEL_MIN_NAMES:
+                chunks = [missing[i:i + PARALLEL_CHUNK_SIZE] for i in range(0, len(missing), PARALLEL_CHUNK_SIZE)]
+                with ProcessPoolExecutor() as executor:
+                    parsed = [row for rows in executor.map(_parse_chunk, chunks) for row in rows]
+            else:
+                parsed = _parse_chunk(missing)
+            cache.update(zip(missing, parsed))
+            try:
+                _save_cache(cache)
+            except Exception as e:
+                print(f"Warning: Could not write name cache {NAME_CACHE_PATH}: {e}")
+        rows = [cache[raw] for raw in uniques]
+    parsed = pd.DataFrame(rows, columns=NAME_COLUMNS, index=uniques, dtype=object)
+    return parsed.mask(parsed == '')
+
+
+def normalize_names(df, first_col='first_name', last_col='last_name'):
+    """
+    Re-split first/last names into prefix, first, middle, last and suffix columns.
+    Middle initials that were typed into first_name ("Rajesh G") move to middle_name.
+    """
+    if first_col not in df.columns:
+        return df
+    first = df[first_col].where(df[first_col].notna(), '').astype(str).str.strip()
+    has_first = first != ''
+    if last_col in df.columns:
+        last = df[last_col].where(df[last_col].notna(), '').astype(str).str.strip()
+        raw = (first + ' ' + last).str.strip()
+    else:
+        raw = first
+    raw = raw.where(has_first)
+
+    components = parse_names(raw).reindex(raw).set_axis(df.index)
+    df[first_col] = components['first_name'].where(has_first, df[first_col])
+    if last_col in df.columns:
+        df[last_col] = components['last_name'].where(has_first, df[last_col])
+    for name in ['middle_name', 'name_prefix', 'name_suffix']:
+        df[name] = components[name]
+    return df
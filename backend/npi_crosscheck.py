@@ -0,0 +1,163 @@
+"""
+Cross-validation of roster fields against the NPI registry.
+
+The registry is normalized once into a typed table indexed by NPI (cached in memory and on
+disk next to the other caches, keyed on the source file's size and mtime). A roster is joined
+to it in one reindex; each field then gets a vectorized agreement flag, and free-text fields a
+similarity score from rapidfuzz cpdist over the aligned (roster, registry) pairs.
+"""
+import os
+import pickle
+import threading
+from utils import lazy_import
+from profiling import span
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+rapidfuzz = lazy_import('rapidfuzz')
+
+REGISTRY_CACHE_PATH = os.path.join('cache', 'npi_registry_index.pkl')
+
+# field -> (roster column, registry column, normalization)
+FIELDS = {
+    'first_name': ('first_name', 'provider_first_name', 'text'),
+    'last_name': ('last_name', 'provider_last_name', 'text'),
+    'credential': ('credential', 'provider_credential_text', 'code'),
+    'taxonomy_code': ('taxonomy_code', 'healthcare_provider_taxonomy_code_1', 'code'),
+    'license_number': ('license_number', 'provider_license_number_1', 'code'),
+    'license_state': ('license_state', 'provider_license_number_state_code_1', 'code'),
+    'address': ('practice_address_line1', 'provider_business_practice_location_address_line1', 'text'),
+    'city': ('practice_city', 'provider_business_practice_location_address_city', 'text'),
+    'state': ('practice_state', 'provider_business_practice_location_address_state', 'code'),
+    'zip': ('practice_zip', 'provider_business_practice_location_address_zip', 'zip'),
+    'phone': ('practice_phone', 'provider_business_practice_location_address_phone', 'phone'),
+}
+# Fields scored for similarity as well as exact agreement
+SCORED_FIELDS = ['first_name', 'last_name', 'address', 'city']
+
+
+def _normalize(series, kind):
+    """
+    Comparable text for a column as an object array (None when missing): casefolded words, bare
+    codes, 5-digit zips or 10-digit phones. Each distinct value is normalized once.
+    """
+    if pd.api.types.is_float_dtype(series) and (series.dropna() % 1 == 0).all():
+        series = series.astype('Int64')
+    codes, uniques = pd.factorize(series)
+    text = pd.Series(uniques.astype(str), dtype=object).str.strip()
+    if kind == 'text':
+        text = text.str.casefold().str.replace(r'\s+', ' ', regex=True)
+    elif kind == 'code':
+        text = text.str.upper().str.replace(r'[^A-Z0-9 ]', '', regex=True).str.replace(r'\s+', ' ', regex=True)
+    elif kind == 'zip':
+        text = text.str.extract(r'^(\d{1,5})', expand=False).str.zfill(5)
+    elif kind == 'phone':
+        # Registry formats vary ("818  865.9928", "(424) 396-2139"); compare the last 10 digits
+        text = text.str.replace(r'\D', '', regex=True).str[-10:]
+    normalized = np.append(text.where(text.notna() & (text != ''), None).to_numpy(dtype=object), None)
+    # code -1 (missing) picks the trailing None
+    return normalized[codes]
+
+
+def build_registry_index(path):
+    """The registry's compared columns, normalized, indexed by NPI (int64; later duplicates dropped)."""
+    columns = ['npi'] + [registry_col for _, registry_col, _ in FIELDS.values()]
+    header = pd.read_csv(path, nrows=0).columns
+    raw = pd.read_csv(path, dtype=str, usecols=[c for c in columns if c in header])
+    npi = pd.to_numeric(raw['npi'], errors='coerce')
+    index = pd.DataFrame(index=pd.Index(npi, name='npi'))
+    for field, (_, registry_col, kind) in FIELDS.items():
+        if registry_col in raw.columns:
+            index[field] = _normalize(raw[registry_col], kind)
+    index = index[index.index.notna()]
+    index.index = index.index.astype('int64')
+    return index[~index.index.duplicated(keep='first')]
+
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def get_registry_index(path, cache_path=REGISTRY_CACHE_PATH):
+    """
+    The normalized registry for `path`, built once per process and reused from cache_path
+    across processes until the registry file changes.
+    """
+    stat = os.stat(path)
+    signature = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    with _cache_lock:
+        if signature in _cache:
+            return _cache[signature]
+        index = None
+        if os.path.exists(cache_path):
+            try:
+                with open(cache_path, 'rb') as f:
+                    cached = pickle.load(f)
+                if cached['signature'] == signature:
+                    index = cached['index']
+            except Exception as e:
+                print(f"Ignoring unreadable NPI registry cache {cache_path}: {e}")
+        if index is None:
+            with span('npi_registry.build_index'):
+                index = build_registry_index(path)
+            os.makedirs(os.path.dirname(cache_path) or '.', exist_ok=True)
+            tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                pickle.dump({'signature': signature, 'index': index}, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, cache_path)
+        _cache.clear()
+        _cache[signature] = index
+        return index
+
+
+def cross_validate(df, registry_index):
+    """
+    Compare roster rows with their NPI's registry entry. Returns a frame aligned with df:
+    npi_found, <field>_agrees per compared field (NA when either side is missing), <field>_score
+    (0-100) for names, address and city, and npi_agreement, the share of compared fields that agree.
+    """
+    npi = pd.to_numeric(df['npi'], errors='coerce').astype('Int64') if 'npi' in df.columns \
+        else pd.Series(pd.NA, index=df.index, dtype='Int64')
+    # One hash join: registry rows in roster order (all-NA where the NPI is unknown)
+    with span('npi_crosscheck.join', len(df)):
+        matched = registry_index.reindex(npi.to_numpy(dtype='int64', na_value=-1))
+    result = pd.DataFrame({'provider_id': df['provider_id'].to_numpy() if 'provider_id' in df.columns else df.index,
+                           'npi': npi.to_numpy(),
+                           'npi_found': npi.isin(registry_index.index).to_numpy()}, index=df.index)
+
+    agreements = []
+    with span('npi_crosscheck.compare', len(df)):
+        for field, (roster_col, _, kind) in FIELDS.items():
+            if roster_col not in df.columns or field not in matched.columns:
+                continue
+            roster_values = _normalize(df[roster_col], kind)
+            registry_values = matched[field].to_numpy(dtype=object)
+            both = ~(pd.isna(roster_values) | pd.isna(registry_values))
+            agrees = pd.array(np.full(len(df), pd.NA), dtype='boolean')
+            agrees[both] = roster_values[both] == registry_values[both]
+            result[f'{field}_agrees'] = agrees
+            agreements.append(result[f'{field}_agrees'])
+            if field in SCORED_FIELDS:
+                scores = np.full(len(df), np.nan)
+                if both.any():
+                    scores[both] = rapidfuzz.process.cpdist(roster_values[both].tolist(), registry_values[both].tolist(),
+                                                            scorer=rapidfuzz.fuzz.token_sort_ratio, dtype=np.float32,
+                                                            workers=-1)
+                result[f'{field}_score'] = np.round(scores, 1)
+    if agreements:
+        flags = pd.concat(agreements, axis=1)
+        result['npi_agreement'] = (flags.sum(axis=1) / flags.notna().sum(axis=1)).round(3)
+    return result
+
+
+def summarize(result):
+    """Agreement rate per field over the rows where both sides have a value."""
+    summary = {'rows': len(result), 'npi_found': int(result['npi_found'].sum()), 'fields': {}}
+    for column in result.columns:
+        if column.endswith('_agrees'):
+            compared = result[column].notna()
+            summary['fields'][column[:-len('_agrees')]] = {
+                'compared': int(compared.sum()),
+                'agree_rate': round(float(result.loc[compared, column].mean()), 4) if compared.any() else None
+            }
+    return summary
@@ -0,0 +1,246 @@
+import os
+import json
+import time
+import shutil
+import secrets
+import threading
+from datetime import datetime
+from file_catalog import FileCatalog, file_prefix, write_sidecars, remove_with_sidecars, SIDECAR_EXTENSIONS
+
+STAGING_DIR = '.staging'
+MANIFEST_DIR = '.runs'
+# Retention: newest runs kept per kind, and a cap on the total size of retained outputs (0 = none)
+KEEP_RUNS = int(os.environ.get('CLEARCRED_KEEP_RUNS', 5))
+MAX_OUTPUT_GB = float(os.environ.get('CLEARCRED_OUTPUT_MAX_GB', 0))
+# Unreferenced files and staging directories younger than this may belong to a run that is committing
+GRACE_SECONDS = 600
+
+
+def _write_json_atomic(path, payload):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(payload, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _size_with_sidecars(filepath):
+    # Retention caps real disk use, so the precompressed copies count too
+    return sum(os.path.getsize(path) for path in [filepath] + [filepath + ext for ext in SIDECAR_EXTENSIONS]
+               if os.path.exists(path))
+
+
+class OutputRun:
+    """
+    One set of outputs written together. Files are written into a private staging directory
+    and only published (linked into the outputs folder, then recorded in a manifest) on commit,
+    so readers never see a partial file and concurrent runs never touch each other's files.
+    """
+
+    def __init__(self, store, kind):
+        self.store = store
+        self.kind = kind
+        self.started = datetime.now()
+        self.run_id = f"{self.started.strftime('%Y%m%d_%H%M%S_%f')}_{secrets.token_hex(3)}"
+        self.staging = os.path.join(store.folder, STAGING_DIR, self.run_id)
+        self.files = []
+        self.committed = False
+
+    def write_csv(self, df, filename_prefix, step_description=""):
+        if df is None or df.empty:
+            return None
+        timestamp = self.started.strftime("%Y%m%d_%H%M%S")
+        filename = f"{filename_prefix}_{timestamp}.csv"
+        staged_path = os.path.join(self.staging, filename)
+        # Created on first write, so the staging directory's age tracks the run's last activity
+        os.makedirs(self.staging, exist_ok=True)
+        df.to_csv(staged_path, index=False)
+        write_sidecars(staged_path)
+        file_info = {
+            'filename': filename,
+            'filepath': os.path.join(self.store.folder, filename),
+            'step': step_description,
+            'timestamp': timestamp,
+            'records': len(df),
+            'columns': len(df.columns),
+            'size_mb': round(os.path.getsize(staged_path) / (1024 * 1024), 2)
+        }
+        self.files.append(file_info)
+        return file_info
+
+    def _publish(self, file_info):
+        staged_path = os.path.join(self.staging, file_info['filename'])
+        filename = file_info['filename']
+        target = os.path.join(self.store.folder, filename)
+        try:
+            # link() refuses to overwrite, so two runs in the same second can't clobber each other
+            os.link(staged_path, target)
+        except FileExistsError:
+            filename = f"{filename[:-4]}_{self.run_id[-6:]}.csv"
+            target = os.path.join(self.store.folder, filename)
+            os.link(staged_path, target)
+        except OSError:
+            # Filesystems without hard links: a rename is still atomic, just not clobber-safe
+            os.replace(staged_path, target)
+        for extension in SIDECAR_EXTENSIONS:
+            if os.path.exists(staged_path + extension):
+                os.replace(staged_path + extension, target + extension)
+        file_info['filename'] = filename
+        file_info['filepath'] = target
+        self.store.catalog.add(filename)
+
+    def commit(self):
+        """Publish the staged files and the run manifest, then schedule compaction."""
+        for file_info in self.files:
+            self._publish(file_info)
+        manifest = {
+            'run_id': self.run_id,
+            'kind': self.kind,
+            'created_at': datetime.now().isoformat(),
+            'files': self.files,
+            'size_bytes': sum(_size_with_sidecars(f['filepath']) for f in self.files)
+        }
+        os.makedirs(self.store.manifest_folder, exist_ok=True)
+        _write_json_atomic(os.path.join(self.store.manifest_folder, f"{self.run_id}.json"), manifest)
+        shutil.rmtree(self.staging, ignore_errors=True)
+        self.committed = True
+        self.store.schedule_compaction()
+        return manifest
+
+    def abort(self):
+        shutil.rmtree(self.staging, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.abort()
+        return False
+
+
+class OutputStore:
+    """Transactional output folder: runs, per-run manifests and retention."""
+
+    def __init__(self, folder, keep_runs=KEEP_RUNS, max_gb=MAX_OUTPUT_GB):
+        self.folder = folder
+        self.manifest_folder = os.path.join(folder, MANIFEST_DIR)
+        self.keep_runs = keep_runs
+        self.max_bytes = int(max_gb * 1024 ** 3)
+        # Folders are created by the first run that commits, not on import (the CLI never uses them)
+        self.catalog = FileCatalog(folder)
+        self._compaction_lock = threading.Lock()
+        self._compaction_pending = False
+        self._compaction_running = False
+
+    def run(self, kind):
+        return OutputRun(self, kind)
+
+    def runs(self):
+        """Committed run manifests, oldest first."""
+        manifests = []
+        if not os.path.exists(self.manifest_folder):
+            return manifests
+        for name in sorted(os.listdir(self.manifest_folder)):
+            if not name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.manifest_folder, name), 'r', encoding='utf-8') as f:
+                    manifests.append(json.load(f))
+            except (OSError, ValueError):
+                # Removed by a concurrent compaction
+                continue
+        return manifests
+
+    def latest_file(self, filename_prefix):
+        """file_info of the newest committed output with this prefix, or None."""
+        for manifest in reversed(self.runs()):
+            for file_info in manifest['files']:
+                if file_prefix(file_info['filename']) == filename_prefix and os.path.exists(file_info['filepath']):
+                    return file_info
+        return None
+
+    def _drop_run(self, manifest):
+        # Manifest first: once it is gone the run is no longer visible, then its files go
+        try:
+            os.remove(os.path.join(self.manifest_folder, f"{manifest['run_id']}.json"))
+        except FileNotFoundError:
+            pass
+        removed = 0
+        for file_info in manifest['files']:
+            if remove_with_sidecars(file_info['filepath']):
+                removed += 1
+            self.catalog.discard(file_info['filename'])
+        return removed
+
+    def compact(self):
+        """
+        Apply retention: keep the newest keep_runs runs per kind, then drop the oldest runs while
+        the total exceeds max_bytes (the newest run of each kind is always kept). Also removes
+        abandoned staging directories and outputs from before manifests that newer runs replace.
+        """
+        runs = self.runs()
+        by_kind = {}
+        for manifest in runs:
+            by_kind.setdefault(manifest['kind'], []).append(manifest)
+        dropped = []
+        for manifests in by_kind.values():
+            dropped.extend(manifests[:max(len(manifests) - self.keep_runs, 0)])
+        dropped_ids = {m['run_id'] for m in dropped}
+        kept = [m for m in runs if m['run_id'] not in dropped_ids]
+        if self.max_bytes:
+            newest = {m['kind']: m['run_id'] for m in kept}
+            total = sum(m.get('size_bytes', 0) for m in kept)
+            for manifest in kept:
+                if total <= self.max_bytes:
+                    break
+                if newest[manifest['kind']] != manifest['run_id']:
+                    dropped.append(manifest)
+                    total -= manifest.get('size_bytes', 0)
+        for manifest in dropped:
+            self._drop_run(manifest)
+
+        now = time.time()
+        staging_root = os.path.join(self.folder, STAGING_DIR)
+        if os.path.exists(staging_root):
+            for run_id in os.listdir(staging_root):
+                path = os.path.join(staging_root, run_id)
+                if now - os.path.getmtime(path) > GRACE_SECONDS:
+                    shutil.rmtree(path, ignore_errors=True)
+
+        referenced = {f['filename'] for m in runs for f in m['files']}
+        managed_prefixes = {file_prefix(name) for name in referenced}
+        for filename in os.listdir(self.folder):
+            path = os.path.join(self.folder, filename)
+            if (filename.endswith('.csv') and filename not in referenced
+                    and file_prefix(filename) in managed_prefixes
+                    and now - os.path.getmtime(path) > GRACE_SECONDS):
+                remove_with_sidecars(path)
+                self.catalog.discard(filename)
+        return len(dropped)
+
+    def _compact_in_background(self):
+        while True:
+            with self._compaction_lock:
+                if not self._compaction_pending:
+                    self._compaction_running = False
+                    return
+                self._compaction_pending = False
+            try:
+                self.compact()
+            except Exception as e:
+                print(f"Warning: output compaction failed: {e}")
+
+    def schedule_compaction(self):
+        """Run compaction in a background thread; requests arriving meanwhile coalesce into one rerun."""
+        with self._compaction_lock:
+            self._compaction_pending = True
+            if self._compaction_running:
+                return
+            self._compaction_running = True
+        threading.Thread(target=self._compact_in_background, daemon=True).start()
+
+    def clear(self):
+        """Remove every committed run and its files. Returns the number of files removed."""
+        return sum(self._drop_run(manifest) for manifest in self.runs())
@@ -0,0 +1,851 @@
+"""
+Provider roster processing pipeline, independent of Flask:
+standardize -> correct misspellings -> deduplicate -> merge with license databases -> score.
+
+The /process/* routes wrap these stages; clearcred.py runs them in batch on local files.
+"""
+from __future__ import annotations
+import os
+import re
+import glob
+import json
+import copy
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Tuple
+from datetime import datetime
+from utils import lazy_import
+from address_parser import split_address_columns
+from name_parser import normalize_names
+from profiling import span
+from license_index import get_license_index, full_names
+from run_versions import record_version
+from shared_frame import share_frame, attach, pack_frame, unpack_frame
+from cluster_index import save_clusters
+from npi_crosscheck import get_registry_index, cross_validate, summarize as summarize_crosscheck
+from representatives import RepresentativeSet, snap_values, representatives_service, REPRESENTATIVES_PATH
+from linkage import linked_pairs, LINKAGE_MATCH_WEIGHT
+
+pd = lazy_import('pandas')
+np = lazy_import('numpy')
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_FOLDER = os.path.join(BACKEND_DIR, 'data')
+NY_LICENSE_PATH = os.path.join(DATA_FOLDER, 'ny_medical_license_database_clean_standardized.csv')
+CA_LICENSE_PATH = os.path.join(DATA_FOLDER, 'ca_medical_license_database_clean_standardized.csv')
+NPI_REGISTRY_PATH = os.path.join(DATA_FOLDER, 'mock_npi_registry.csv')
+
+# Minimum confidence (0-100) for an approximate license-database match
+LICENSE_MATCH_THRESHOLD = 90
+
+# column -> [max edit distance, min token_set_ratio score, representatives key]
+MISSPELLING_METADATA = {
+    "credential" : [1,80,"credential"],
+    "primary_specialty" : [2,65,"speciality"],
+    "practice_city" : [2,65,"address_city"],
+    "mailing_city" : [2,65,"address_city"],
+    "medical_school" : [4,65,"medical_school"],
+    "residency_program" : [4,65,"residency_program"],
+    "area_p" : [2,65,"area"],
+    "area_type_p" : [2,65,"area_type"],
+    "area_type_m" : [2,65,"area_type"],
+    "area_m" : [2,65,"area"]
+}
+
+
+# Standardization
+
+# Row-wise standardization goes partition-parallel above this many rows
+PARALLEL_MIN_ROWS = 50000
+PARALLEL_MIN_PARTITION_ROWS = 10000
+PARTITIONS_PER_WORKER = 2
+
+def unmask_number(real, masked):
+    if pd.isna(real) or pd.isna(masked):
+        return masked
+    real_str, masked_str = str(real), str(masked)
+    if "*" not in masked_str:
+        return masked
+    if len(real_str) != len(masked_str):
+        return masked
+    for r, m in zip(real_str, masked_str):
+        if m != "*" and r != m:
+            return masked
+    return real
+
+
+def standardize(df, workers=None):
+    """
+    Standardize names, addresses, cities, phones and masked zips of a raw provider roster.
+    Large rosters run the row-wise steps partition-parallel (see standardize_parallel);
+    workers=1 keeps everything in this process.
+    """
+    rows = len(df)
+    # Names are split with HumanName once per distinct raw name (cached on disk across runs)
+    with span('standardize.names', rows):
+        df = normalize_names(df)
+    workers = workers or os.cpu_count() or 1
+    if workers > 1 and rows >= PARALLEL_MIN_ROWS:
+        with span('standardize.parallel', rows):
+            return standardize_parallel(df, workers)
+    return standardize_rows(df)
+
+
+def standardize_rows(df):
+    """The per-row standardization steps; every output row depends only on its input row."""
+    rows = len(df)
+    # Street lines are tokenized with the USPS suffix/directional/unit tables in one
+    # vectorized pass over the distinct practice and mailing addresses
+    with span('standardize.addresses', rows):
+        df = split_address_columns(df, {
+            'practice_address_line1': '_p',
+            'mailing_address_line1': '_m'
+        })
+    with span('standardize.cities', rows):
+        if 'practice_city' in df.columns:
+            df["practice_city"] = df["practice_city"].apply(lambda x : x.capitalize() if isinstance(x, str) else x)
+        if 'mailing_city' in df.columns:
+            df["mailing_city"] = df["mailing_city"].apply(lambda x : x.capitalize() if isinstance(x, str) else x)
+    with span('standardize.phones', rows):
+        if 'practice_phone' in df.columns:
+            df["practice_phone"] = df["practice_phone"].apply(lambda x: re.sub(r"[^0-9]", "", x) if isinstance(x, str) else x)
+    with span('standardize.zip_unmask', rows):
+        if set(['practice_zip','mailing_zip','house_no_p','house_no_m','area_p','area_m','area_type_p','area_type_m']).issubset(df.columns):
+            df["practice_zip"] = df.apply(lambda x: unmask_number(x["mailing_zip"],x["practice_zip"]) if ((x["house_no_p"]==x["house_no_m"]) & (x["area_p"]==x["area_m"]) & (x["area_type_p"]==x["area_type_m"])) else x["practice_zip"],axis=1)
+            df["mailing_zip"] = df.apply(lambda x: unmask_number(x["mailing_zip"],x["practice_zip"]) if ((x["house_no_p"]==x["house_no_m"]) & (x["area_p"]==x["area_m"]) & (x["area_type_p"]==x["area_type_m"])) else x["practice_zip"],axis=1)
+    return df
+
+
+def _standardize_partition(args):
+    block_name, layout, start, stop = args
+    block = attach(block_name)
+    try:
+        partition = unpack_frame(block.buf, layout, start, stop)
+    finally:
+        block.close()
+    # Sent back as one packed buffer, which pickles as a single memcpy
+    return pack_frame(standardize_rows(partition))
+
+
+def standardize_parallel(df, workers):
+    """
+    Run standardize_rows over row partitions in a process pool. The frame is packed once into
+    shared memory; each worker decodes only its own row range, and the results are
+    reassembled in partition order with the original index.
+    """
+    partitions = min(workers * PARTITIONS_PER_WORKER, max(len(df) // PARALLEL_MIN_PARTITION_ROWS, 1))
+    bounds = [len(df) * i // partitions for i in range(partitions + 1)]
+    block, layout = share_frame(df)
+    try:
+        jobs = [(block.name, layout, bounds[i], bounds[i + 1]) for i in range(partitions)]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            parts = [unpack_frame(payload, part_layout) for part_layout, payload in executor.map(_standardize_partition, jobs)]
+    finally:
+        block.close()
+        block.unlink()
+    result = pd.concat(parts, ignore_index=True)
+    result.index = df.index
+    return result
+
+
+# Misspelling correction
+
+# Helper: fuzzy matching logic (rapidfuzz itself loads on first use)
+try:
+    rapidfuzz = lazy_import('rapidfuzz')
+    _HAS_RAPIDFUZZ = True
+except ImportError:
+    import difflib
+    _HAS_RAPIDFUZZ = False
+
+def standardize_with_meta(value, col, reps_json, metadata_json):
+    if pd.isna(value) or str(value).strip() == "":
+        return value
+    val_str = str(value)
+    meta = metadata_json.get(col, [])
+    max_changes_allowed = int(meta[0]) if len(meta) > 0 else 9999
+    threshold = float(meta[1]) if len(meta) > 1 else 90.0
+    rep_key = meta[2] if len(meta) > 2 else col
+    reps_list = reps_json.get(rep_key)
+    if reps_list is None:
+        reps_list = []
+        reps_json[rep_key] = reps_list
+    if val_str in reps_list:
+        return val_str
+    if not reps_list:
+        reps_list.append(val_str)
+        return val_str
+    if _HAS_RAPIDFUZZ:
+        match = rapidfuzz.process.extractOne(val_str, reps_list, scorer=rapidfuzz.fuzz.token_set_ratio)
+        if not match:
+            reps_list.append(val_str)
+            return val_str
+        best_choice, score, _ = match
+        ed = rapidfuzz.distance.Levenshtein.distance(val_str, best_choice)
+    else:
+        best_choice = None
+        best_score = -1.0
+        for c in reps_list:
+            sc = difflib.SequenceMatcher(None, val_str, c).ratio() * 100
+            if sc > best_score:
+                best_score = sc
+                best_choice = c
+        score = float(best_score)
+        a, b = val_str, best_choice or ""
+        ed = sum(1 for A, B in zip(a, b) if A != B) + abs(len(a) - len(b))
+    if score >= threshold and ed <= max_changes_allowed:
+        return best_choice
+    else:
+        if val_str not in reps_list:
+            reps_list.append(val_str)
+        return val_str
+
+
+def load_representatives(path=REPRESENTATIVES_PATH):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def correct_misspellings(df, reps_json, metadata_json=MISSPELLING_METADATA):
+    """
+    Snap values to their closest representative per column.
+    reps_json (a RepresentativeSet, or a plain dict) is extended in place with values that had no
+    close representative. Each distinct value is matched once per column.
+    Returns (df, corrections_count) where corrections_count maps column -> changed values.
+    """
+    corrections_count = {col: 0 for col in metadata_json.keys()}
+    reps = reps_json if isinstance(reps_json, RepresentativeSet) else RepresentativeSet(reps_json)
+
+    for col in metadata_json.keys():
+        if col not in df.columns:
+            continue
+        # apply standardization column by column
+        before = df[col].astype(str)  # original values (as string to compare safely)
+        with span(f'misspelling.match.{col}', len(df)):
+            if _HAS_RAPIDFUZZ:
+                max_changes, threshold, rep_key = metadata_json[col]
+                valid = df[col].notna() & (before.str.strip() != "")
+                values = before[valid]
+                mapping = snap_values(list(dict.fromkeys(values)), rep_key, reps, int(max_changes), float(threshold))
+                df[col] = df[col].where(~valid, values.map(mapping))
+            else:
+                reps_dict = reps.as_dict()
+                df[col] = df[col].apply(lambda v: standardize_with_meta(v, col, reps_dict, metadata_json))
+        after = df[col].astype(str)
+
+        # count how many values actually changed
+        corrections_count[col] = int((before != after).sum())
+
+    if reps is not reps_json:
+        for key, values in reps.choices.items():
+            existing = reps_json.setdefault(key, [])
+            existing.extend(values[len(existing):])
+    return df, corrections_count
+
+
+# Deduplication
+
+class DSU:
+    def __init__(self, n):
+        self.parent = list(range(n))
+        self.rank = [0]*n
+
+    def find(self, x):
+        while self.parent[x] != x:
+            self.parent[x] = self.parent[self.parent[x]]
+            x = self.parent[x]
+        return x
+
+    def union(self, a, b):
+        ra, rb = self.find(a), self.find(b)
+        if ra == rb:
+            return
+        if self.rank[ra] < self.rank[rb]:
+            self.parent[ra] = rb
+        elif self.rank[rb] < self.rank[ra]:
+            self.parent[rb] = ra
+        else:
+            self.parent[rb] = ra
+            self.rank[ra] += 1
+
+def dedupe_simple(
+    df: pd.DataFrame,
+    pk_col: str = "provider_id",
+    first_col: str = "first_name",
+    last_col: str = "last_name",
+    phone_col: str = "practice_phone",
+    license_col: str = "license_number",
+    license_state_col: str = "license_state",    # optional; if not present, match on license only
+    med_col: str = "medical_school",
+    res_col: str = "residency_program",
+    status_col: str = "status",                   # optional
+    cluster_records: List[dict] = None,
+    match_weight: float = None                    # optional; link by Fellegi-Sunter match weight instead of the rules
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Returns (canonical_df, duplicates_df).
+    canonical_df: one canonical row per cluster (kept)
+    duplicates_df: all other rows that are duplicates and should be moved; includes duplicate_of and duplicate_reason
+    cluster_records: if given, one record per multi-row cluster is appended (members, edge reasons and
+    why the canonical row was chosen), for cluster_index
+    match_weight: if given, rows are linked by probabilistic scoring (linkage.py) instead of exact-match
+    rules: candidate pairs at or above this match weight are unioned, with reason "linkage"
+    """
+
+    # Rows are handled by position; df is only read, and outputs are taken from it once at the end
+    n = len(df)
+
+    dsu = DSU(n)
+
+    # helper to add unions for groups found by grouping keys
+    def union_groupby(cols: List[str], reason_label: str):
+        # only group if all columns exist
+        if not all(c in df.columns for c in cols):
+            return []
+        edges = []
+        for idxs in df.groupby(cols, dropna=True).indices.values():
+            if len(idxs) > 1:
+                base = int(idxs[0])
+                for other in idxs[1:].tolist():
+                    dsu.union(base, other)
+                    edges.append((base, other, reason_label))
+        return edges
+
+    with span('dedupe.blocking', n):
+        if match_weight is not None:
+            # Probabilistic linkage: pairs scored over all compared fields, linked above the match weight
+            left, right, _ = linked_pairs(df, match_weight)
+            edges = [(u, v, "linkage") for u, v in zip(left.tolist(), right.tolist())]
+            for u, v, _ in edges:
+                dsu.union(u, v)
+        else:
+            # 1) name + phone
+            edges_np = union_groupby([first_col, last_col, phone_col], "name_phone")
+            # 2) license (+ state if present)
+            lic_cols = [license_col] + ([license_state_col] if license_state_col in df.columns else [])
+            edges_lic = union_groupby(lic_cols, "license")
+            edges = edges_np + edges_lic
+            # 3) name + education
+            edges_ne = union_groupby([first_col, last_col, med_col, res_col], "name_edu")
+            edges += edges_ne
+
+    # Build clusters: root -> member idx list
+    with span('dedupe.dsu_clusters', n):
+        clusters: Dict[int, List[int]] = {}
+        for i in range(n):
+            root = dsu.find(i)
+            clusters.setdefault(root, []).append(i)
+
+    # For quick lookup of reasons per pair, build a map (optional)
+    pair_reasons = {}
+    for u, v, r in edges:
+        key = tuple(sorted((u, v)))
+        pair_reasons.setdefault(key, set()).add(r)
+    # A duplicate's reasons are those of the edges it is part of
+    row_reasons: Dict[int, set] = {}
+    for (u, v), reasons in pair_reasons.items():
+        row_reasons.setdefault(u, set()).update(reasons)
+        row_reasons.setdefault(v, set()).update(reasons)
+    edges_by_root = {}
+    if cluster_records is not None:
+        for (u, v), reasons in pair_reasons.items():
+            edges_by_root.setdefault(dsu.find(u), []).append((u, v, reasons))
+
+    canonical_positions = []
+    duplicate_positions = []
+    duplicate_of = []
+    duplicate_reasons = []
+
+    with span('dedupe.canonical', n):
+        # completeness (non-null fields) and Active status for every row at once
+        completeness = df.count(axis=1).to_numpy()
+        active = (df[status_col] == "Active").to_numpy() if status_col in df.columns else None
+        pks = df[pk_col].to_numpy() if pk_col in df.columns else None
+
+        # choose canonical per cluster
+        for root, members in clusters.items():
+            if len(members) == 1:
+                # singleton: treat as canonical
+                canonical_positions.append(members[0])
+                continue
+
+            # 1) prefer status == "Active" if status_col exists
+            candidates = members
+            if active is not None:
+                active_members = [m for m in members if active[m]]
+                if active_members:
+                    # pick most complete among active
+                    candidates = active_members
+
+            # 2) pick row with most non-null fields (completeness), earliest on ties
+            chosen_idx = candidates[int(np.argmax(completeness[candidates]))]
+
+            if cluster_records is not None:
+                cluster_records.append(_cluster_record(df, members, chosen_idx, candidates, completeness,
+                                                       edges_by_root.get(root, []), pk_col, status_col))
+
+            canonical_positions.append(chosen_idx)
+
+            # mark others as duplicates with reasons
+            for m in members:
+                if m == chosen_idx:
+                    continue
+                duplicate_positions.append(m)
+                duplicate_of.append(pks[chosen_idx] if pks is not None else chosen_idx)
+                duplicate_reasons.append("|".join(sorted(row_reasons.get(m) or {"unknown"})))
+
+    canonical_df = df.take(canonical_positions).reset_index(drop=True)
+    duplicates_df = df.take(duplicate_positions).reset_index(drop=True)
+    duplicates_df["duplicate_of"] = duplicate_of
+    duplicates_df["duplicate_reason"] = duplicate_reasons
+    duplicates_df["moved_at"] = datetime.utcnow().isoformat()
+
+    return canonical_df, duplicates_df
+
+
+# Member fields kept in cluster records (and indexed by cluster_index)
+CLUSTER_MEMBER_FIELDS = ["provider_id", "npi", "license_number", "license_state", "practice_phone",
+                         "first_name", "last_name", "status"]
+
+
+def _plain(value):
+    if pd.isna(value):
+        return None
+    return value.item() if hasattr(value, 'item') else value
+
+
+def _cluster_record(df, members, chosen_idx, candidates, completeness, edges, pk_col, status_col):
+    """Members, pairwise edge reasons and canonical-choice rationale of one cluster."""
+    pk = lambda i: _plain(df[pk_col].iat[i]) if pk_col in df.columns else i
+    edges = [{'a': pk(u), 'b': pk(v), 'reasons': sorted(reasons)} for u, v, reasons in edges]
+    top = int(completeness[candidates].max())
+    return {
+        'canonical': pk(chosen_idx),
+        'size': len(members),
+        'members': [
+            dict({f: _plain(df[f].iat[m]) for f in CLUSTER_MEMBER_FIELDS if f in df.columns},
+                 provider_id=pk(m), completeness=int(completeness[m]), canonical=m == chosen_idx)
+            for m in members
+        ],
+        'edges': edges,
+        'rationale': {
+            'active_only': status_col in df.columns and len(candidates) < len(members),
+            'candidates': len(candidates),
+            'completeness': top,
+            'tied_on_completeness': int((completeness[candidates] == top).sum()),
+            'rule': 'Active rows first, then most non-null fields, then earliest row'
+        }
+    }
+
+
+def load_npi_registry(path=NPI_REGISTRY_PATH):
+    return set(get_registry_index(path).index)
+
+
+def crosscheck_npi(df, path=NPI_REGISTRY_PATH):
+    """Per-field agreement of roster rows with their NPI registry entry (see npi_crosscheck)."""
+    with span('pipeline.npi_crosscheck', len(df)):
+        return cross_validate(df, get_registry_index(path))
+
+
+def deduplicate(df, npi_registry, cluster_records=None, match_weight=LINKAGE_MATCH_WEIGHT):
+    """
+    Flag NPIs found in the registry, then split the roster into (canonical, duplicates).
+    Multi-row clusters are appended to `cluster_records` when a list is given. With a match_weight
+    (default: CLEARCRED_LINKAGE_MATCH_WEIGHT), duplicates are found by probabilistic linkage.
+    """
+    df["valid_npi"] = df["npi"].isin(npi_registry).astype(int)
+    with span('pipeline.dedupe', len(df)):
+        return dedupe_simple(df, cluster_records=cluster_records, match_weight=match_weight)
+
+
+# License database merge
+
+def load_license_databases(ny_path=NY_LICENSE_PATH, ca_path=CA_LICENSE_PATH):
+    """Read the NY and CA license databases; a missing file is reported and returned as None."""
+    reference = {'ny_data': None, 'ca_data': None}
+    for key, label, path in (('ny_data', 'NY', ny_path), ('ca_data', 'CA', ca_path)):
+        if os.path.exists(path):
+            reference[key] = pd.read_csv(path)
+            print(f"Loaded {label} license data from {path}")
+        else:
+            print(f"{label} license data not found at {path}")
+    return reference
+
+
+def _ground_truth_columns(license_df):
+    return license_df.rename(columns=lambda c: c if c.endswith("_gt") else f"{c}_gt")
+
+
+def _house_number_key(values):
+    # House numbers arrive as str from the address parser but as int/float after a CSV round trip
+    return values.where(values.isna(), values.astype(str).str.replace(r'\.0$', '', regex=True))
+
+
+def fuzzy_license_matches(providers, license_df, license_gt, threshold=LICENSE_MATCH_THRESHOLD):
+    """
+    Best approximate license record for providers that found no exact match, via the
+    n-gram/name index on license_df. Rows scoring below threshold are dropped.
+    """
+    if providers.empty or license_df.empty:
+        return providers.iloc[0:0]
+    matches = get_license_index(license_df).best_matches(
+        providers["license_number"] if "license_number" in providers.columns else [None] * len(providers),
+        full_names(providers),
+        providers["medical_school"] if "medical_school" in providers.columns else None
+    )
+    keep = (matches["position"] >= 0) & (matches["confidence"] >= threshold)
+    matched = pd.concat([
+        providers[keep.to_numpy()].reset_index(drop=True),
+        license_gt.iloc[matches.loc[keep, "position"]].reset_index(drop=True)
+    ], axis=1)
+    matched["license_match"] = "fuzzy"
+    matched["license_match_confidence"] = matches.loc[keep, "confidence"].to_numpy()
+    return matched
+
+
+def _merge_state(providers, license_df, license_gt, name_keys, threshold):
+    # name_keys: (label, roster columns, license database columns) for the fallback exact join
+    name_label, left_keys, right_keys = name_keys
+    by_license = pd.merge(providers, license_gt, left_on="license_number", right_on="license_number_gt")
+    by_license["license_match"] = "license"
+    by_name = pd.merge(providers, license_gt, left_on=left_keys, right_on=right_keys)
+    by_name["license_match"] = name_label
+    exact = pd.concat([by_license, by_name]).drop_duplicates("provider_id")
+    exact["license_match_confidence"] = 100.0
+    if threshold is None:
+        return exact
+    unmatched = providers[~providers["provider_id"].isin(exact["provider_id"])]
+    return pd.concat([exact, fuzzy_license_matches(unmatched, license_df, license_gt, threshold)], ignore_index=True)
+
+
+def merge_licenses(canonical, ny_data, ca_data, fuzzy_threshold=LICENSE_MATCH_THRESHOLD):
+    """
+    Join canonical providers to their state license records; returns (final_ca_data, final_ny_data).
+    Exact license-number and name+education joins come first; providers left over get their
+    best approximate match if its confidence reaches fuzzy_threshold (None disables this).
+    """
+    ny_gt = _ground_truth_columns(ny_data)
+    ca_gt = _ground_truth_columns(ca_data)
+    if "house_no_p" in canonical.columns and "house_no_gt" in ny_gt.columns:
+        canonical["house_no_p"] = _house_number_key(canonical["house_no_p"])
+        ny_gt["house_no_gt"] = _house_number_key(ny_gt["house_no_gt"])
+    with span('pipeline.license_merge', len(canonical)):
+        # One pass over practice_state gives both partitions as row positions
+        by_state = canonical.groupby("practice_state", sort=False).indices
+        empty = np.zeros(0, dtype=np.int64)
+        final_ca_data = _merge_state(
+            canonical.take(by_state.get("CA", empty)), ca_data, ca_gt,
+            ("name_education",
+             ["first_name", "last_name", "medical_school", "residency_program"],
+             ["first_name_gt", "last_name_gt", "medical_school_gt", "residency_program_gt"]),
+            fuzzy_threshold
+        )
+        final_ny_data = _merge_state(
+            canonical.take(by_state.get("NY", empty)), ny_data, ny_gt,
+            ("name_address",
+             ["first_name", "last_name", "medical_school", "house_no_p"],
+             ["first_name_gt", "last_name_gt", "medical_school_gt", "house_no_gt"]),
+            fuzzy_threshold
+        )
+    return final_ca_data, final_ny_data
+
+
+# Scoring and run statistics
+
+def compute_quality_score(initial_rows, corrections_count, duplicates_count):
+    """Weighted score: 85% misspelling-free cells, 15% duplicate-free rows."""
+    total_corrections = sum(corrections_count.values())
+
+    # Calculate A: Misspelling ratio
+    total_possible_corrections = initial_rows * len(corrections_count.keys())
+    if total_possible_corrections > 0:
+        A = (total_corrections / total_possible_corrections) * 100
+    else:
+        A = 0
+
+    # Calculate B: Duplication ratio
+    if initial_rows > 0:
+        B = (duplicates_count / initial_rows) * 100
+    else:
+        B = 0
+
+    # Calculate final quality score
+    quality_score = 0.85 * (100 - A) + 0.15 * (100 - B)
+
+    return {
+        'quality_score': round(quality_score, 2),
+        'misspelling_ratio': round(A, 2),
+        'duplication_ratio': round(B, 2),
+        'total_corrections': total_corrections,
+        'duplicates_count': duplicates_count,
+        'initial_rows': initial_rows
+    }
+
+
+def build_pipeline_stats(initial_total_rows, final_total_rows, duplicates, final_ca_data, final_ny_data, quality_metrics):
+    """Dashboard statistics for one pipeline run (step counts, status/NPI distributions, quality)."""
+    duplicates_removed = initial_total_rows - final_total_rows
+    final_combined_rows = len(final_ca_data) + len(final_ny_data)
+
+    # Calculate status distribution for pie charts
+    ca_status_dist = {}
+    ny_status_dist = {}
+    
+    if 'status_gt' in final_ca_data.columns:
+        ca_status_counts = final_ca_data['status_gt'].value_counts()
+        ca_status_dist = ca_status_counts.to_dict()
+    
+    if 'status_gt' in final_ny_data.columns:
+        ny_status_counts = final_ny_data['status_gt'].value_counts()
+        ny_status_dist = ny_status_counts.to_dict()
+    
+    # Calculate NPI validation statistics
+    ca_valid_npi = 0
+    ca_invalid_npi = 0
+    ny_valid_npi = 0
+    ny_invalid_npi = 0
+    
+    if 'valid_npi' in final_ca_data.columns:
+        ca_valid_npi = int(final_ca_data['valid_npi'].sum())
+        ca_invalid_npi = len(final_ca_data) - ca_valid_npi
+    
+    if 'valid_npi' in final_ny_data.columns:
+        ny_valid_npi = int(final_ny_data['valid_npi'].sum())
+        ny_invalid_npi = len(final_ny_data) - ny_valid_npi
+    
+    # Combined NPI validation statistics
+    total_valid_npi = ca_valid_npi + ny_valid_npi
+    total_invalid_npi = ca_invalid_npi + ny_invalid_npi
+    total_records = total_valid_npi + total_invalid_npi
+    
+    # Prepare pipeline statistics with step-by-step data
+    pipeline_steps = []
+    
+    # Step 1: Initial Upload (raw data before any processing)
+    # Use the initial_total_rows which represents the data before deduplication
+    pipeline_steps.append({
+        'step': 'Initial Upload',
+        'records': int(initial_total_rows),
+        'description': 'Raw data uploaded to system'
+    })
+    
+    # Step 2: Standardization (data after name and address standardization)
+    # This should be the same count as initial since standardization doesn't remove rows
+    standardization_count = initial_total_rows
+    pipeline_steps.append({
+        'step': 'Standardization', 
+        'records': int(standardization_count),
+        'description': 'Name and address standardization'
+    })
+    
+    # Step 3: Misspelling Correction (data after fuzzy matching corrections)
+    # This should also be the same count as we're correcting, not removing
+    misspelling_corrected_count = initial_total_rows
+    pipeline_steps.append({
+        'step': 'Misspelling Correction',
+        'records': int(misspelling_corrected_count),
+        'description': 'Fuzzy matching and correction'
+    })
+    
+    # Step 4: Deduplication (after removing duplicates)
+    pipeline_steps.append({
+        'step': 'Deduplication', 
+        'records': int(final_total_rows),
+        'description': 'Duplicate record removal'
+    })
+    
+    # Step 5: Quality Check (final merged data with external sources)
+    quality_check_count = len(final_ca_data) + len(final_ny_data)
+    pipeline_steps.append({
+        'step': 'Quality Check',
+        'records': int(quality_check_count),
+        'description': 'Final quality validation and merging'
+    })
+
+    pipeline_stats = {
+        'initial': {
+            'total_count': int(initial_total_rows)
+        },
+        'after_merge': {
+            'ca_count': int(len(final_ca_data)), 
+            'ny_count': int(len(final_ny_data)),
+            'total_count': int(final_combined_rows)
+        },
+        'final': {
+            'ca_count': int(len(final_ca_data)),
+            'ny_count': int(len(final_ny_data)), 
+            'total_count': int(final_combined_rows)
+        },
+        'deduplication': {
+            'initial_rows': int(initial_total_rows),
+            'final_rows': int(final_total_rows),
+            'duplicates_removed': int(duplicates_removed),
+            'duplicates_count': int(len(duplicates)),
+            'removal_percentage': round((duplicates_removed / initial_total_rows * 100), 2) if initial_total_rows > 0 else 0
+        },
+        'pipeline_steps': pipeline_steps,
+        'status_distribution': {
+            'ca_status': ca_status_dist,
+            'ny_status': ny_status_dist
+        },
+        'provider_distribution': {
+            'ca_providers': int(len(final_ca_data)),
+            'ny_providers': int(len(final_ny_data)),
+            'total_providers': int(final_combined_rows)
+        },
+        'npi_validation': {
+            'valid_count': int(total_valid_npi),
+            'invalid_count': int(total_invalid_npi),
+            'total_count': int(total_records),
+            'valid_percentage': round((total_valid_npi / total_records * 100), 2) if total_records > 0 else 0,
+            'invalid_percentage': round((total_invalid_npi / total_records * 100), 2) if total_records > 0 else 0,
+            'ca_stats': {
+                'valid': int(ca_valid_npi),
+                'invalid': int(ca_invalid_npi),
+                'total': int(len(final_ca_data))
+            },
+            'ny_stats': {
+                'valid': int(ny_valid_npi),
+                'invalid': int(ny_invalid_npi),
+                'total': int(len(final_ny_data))
+            }
+        },
+        'quality_metrics': quality_metrics
+    }
+
+    return pipeline_stats
+
+
+# End-to-end runs on local files
+
+@lru_cache(maxsize=None)
+def _reference_data():
+    # Loaded once per process (and once per worker in run_batch)
+    reference = load_license_databases()
+    return reference['ny_data'], reference['ca_data'], load_npi_registry()
+
+
+def run_pipeline(input_path, output_dir, reps_json=None, write_intermediate=True, versions_folder=None,
+                 standardize_workers=None):
+    """
+    Run every stage on one roster CSV and write the results to output_dir as
+    <name>_ca_final_processed.csv, <name>_ny_final_processed.csv, <name>_duplicates_removed.csv
+    and <name>_summary.json (plus the standardized / misspelling-corrected intermediates).
+    With versions_folder, the outputs are also recorded as a version for change-data-capture diffs.
+    Returns the summary dict.
+    """
+    name = os.path.splitext(os.path.basename(input_path))[0]
+    os.makedirs(output_dir, exist_ok=True)
+    ny_data, ca_data, npi_registry = _reference_data()
+    if ny_data is None or ca_data is None:
+        raise FileNotFoundError(f"License databases not found under {DATA_FOLDER}")
+    # Each run extends its own copy so parallel runs never see each other's representatives;
+    # without explicit representatives, the shared set's growth is committed for later runs
+    shared_reps = reps_json is None
+    reps_json = representatives_service.snapshot() if shared_reps else copy.deepcopy(reps_json)
+
+    with span('pipeline.read_csv'):
+        df = pd.read_csv(input_path)
+    initial_total_rows = len(df)
+
+    df = standardize(df, workers=standardize_workers)
+    if write_intermediate:
+        df.to_csv(os.path.join(output_dir, f"{name}_standardized.csv"), index=False)
+    df, corrections_count = correct_misspellings(df, reps_json)
+    representatives_version = representatives_service.commit(reps_json) if shared_reps else None
+    if write_intermediate:
+        df.to_csv(os.path.join(output_dir, f"{name}_misspelling_corrected.csv"), index=False)
+
+    cluster_records = []
+    canonical, duplicates = deduplicate(df, npi_registry, cluster_records)
+    crosscheck = crosscheck_npi(canonical)
+    final_ca_data, final_ny_data = merge_licenses(canonical, ny_data, ca_data)
+    quality_metrics = compute_quality_score(initial_total_rows, corrections_count, len(duplicates))
+
+    outputs = {
+        'ca_final_file': os.path.join(output_dir, f"{name}_ca_final_processed.csv"),
+        'ny_final_file': os.path.join(output_dir, f"{name}_ny_final_processed.csv"),
+        'duplicates_file': os.path.join(output_dir, f"{name}_duplicates_removed.csv"),
+        'npi_crosscheck_file': os.path.join(output_dir, f"{name}_npi_crosscheck.csv"),
+        'clusters_file': os.path.join(output_dir, f"{name}_clusters.json")
+    }
+    with span('pipeline.write_outputs', len(final_ca_data) + len(final_ny_data) + len(duplicates)):
+        final_ca_data.to_csv(outputs['ca_final_file'], index=False)
+        final_ny_data.to_csv(outputs['ny_final_file'], index=False)
+        duplicates.to_csv(outputs['duplicates_file'], index=False)
+        crosscheck.to_csv(outputs['npi_crosscheck_file'], index=False)
+        save_clusters(cluster_records, outputs['clusters_file'])
+
+    version_id = None
+    if versions_folder:
+        version_id = record_version({
+            'ca_final_processed': final_ca_data,
+            'ny_final_processed': final_ny_data,
+            'duplicates_removed': duplicates
+        }, folder=versions_folder)
+
+    summary = {
+        'input_file': input_path,
+        'version_id': version_id,
+        'representatives_version': representatives_version,
+        'generated_files': outputs,
+        'corrections_count': corrections_count,
+        'npi_crosscheck': summarize_crosscheck(crosscheck),
+        'pipeline_stats': build_pipeline_stats(
+            initial_total_rows, len(canonical), duplicates, final_ca_data, final_ny_data, quality_metrics
+        )
+    }
+    with open(os.path.join(output_dir, f"{name}_summary.json"), 'w', encoding='utf-8') as f:
+        json.dump(summary, f, indent=2, default=str)
+    return summary
+
+
+def expand_inputs(inputs):
+    """Resolve files, directories (all *.csv inside) and glob patterns to a sorted list of CSV paths."""
+    paths = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            paths.update(glob.glob(os.path.join(item, '*.csv')))
+        elif glob.has_magic(item):
+            paths.update(p for p in glob.glob(item, recursive=True) if p.lower().endswith('.csv'))
+        else:
+            paths.add(item)
+    return sorted(paths)
+
+
+def _run_one(args):
+    input_path, output_dir, versions_folder, standardize_workers = args
+    try:
+        return run_pipeline(input_path, output_dir, versions_folder=versions_folder,
+                            standardize_workers=standardize_workers)
+    except Exception as e:
+        return {'input_file': input_path, 'error': str(e)}
+
+
+def run_batch(inputs, output_dir, workers=None, versions_folder=None):
+    """
+    Run the pipeline over every input roster, in parallel worker processes when there is
+    more than one file. Each roster writes to its own subdirectory of output_dir, named after
+    the file (with a _2, _3, ... suffix when file names repeat), and of versions_folder (if
+    given, so successive nightly runs of a roster can be diffed).
+    Returns one summary (or {'input_file', 'error'}) per roster, in input order.
+    """
+    paths = expand_inputs(inputs)
+    jobs = []
+    used = set()
+    for path in paths:
+        name = os.path.splitext(os.path.basename(path))[0]
+        # Rosters with the same file name in different directories (a/roster.csv, b/roster.csv)
+        # would share a directory; later ones get _2, _3, ... (paths are sorted, so this is stable)
+        base, suffix = name, 1
+        while name.lower() in used:
+            suffix += 1
+            name = f"{base}_{suffix}"
+        used.add(name.lower())
+        jobs.append((path, os.path.join(output_dir, name), os.path.join(versions_folder, name) if versions_folder else None))
+    if len(jobs) <= 1 or workers == 1:
+        # A single roster gets the cores through partition-parallel standardization instead
+        return [_run_one(job + (workers,)) for job in jobs]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(_run_one, [job + (1,) for job in jobs]))
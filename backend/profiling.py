@@ -0,0 +1,217 @@
+import io
+import os
+import sys
+import time
+import uuid
+import pstats
+import cProfile
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+PROFILE_FOLDER = 'profiles'
+MAX_RUNS = 100
+# Newest cProfile dumps kept in PROFILE_FOLDER (shared by the web process and pool workers)
+MAX_PROFILE_DUMPS = MAX_RUNS
+
+_runs = OrderedDict()
+_stage_totals = {}
+_lock = threading.Lock()
+_current_run = ContextVar('current_run', default=None)
+_span_stack = ContextVar('span_stack', default=())
+
+
+def peak_rss_bytes():
+    if resource is None:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is kilobytes on Linux and bytes on macOS
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def start_run(kind, profile=False):
+    """Start a run that collects every span opened in this context; returns the run id."""
+    run = {
+        'run_id': uuid.uuid4().hex[:12],
+        'kind': kind,
+        'started_at': datetime.now().isoformat(),
+        'status': 'running',
+        'wall_s': None,
+        'spans': [],
+        'profile': None,
+        '_t0': time.perf_counter(),
+        '_profiler': None,
+    }
+    if profile:
+        run['_profiler'] = cProfile.Profile()
+        run['_profiler'].enable()
+    with _lock:
+        _runs[run['run_id']] = run
+        while len(_runs) > MAX_RUNS:
+            _runs.popitem(last=False)
+    _current_run.set(run)
+    _span_stack.set(())
+    return run['run_id']
+
+
+def finish_run(status='success'):
+    run = _current_run.get()
+    if run is None:
+        return None
+    profiler = run.pop('_profiler', None)
+    if profiler is not None:
+        profiler.disable()
+        run['profile'] = _dump_profile(profiler, run['run_id'])
+    run['wall_s'] = round(time.perf_counter() - run.pop('_t0'), 6)
+    run['status'] = status
+    _current_run.set(None)
+    return run['run_id']
+
+
+def _dump_profile(profiler, run_id):
+    os.makedirs(PROFILE_FOLDER, exist_ok=True)
+    dump_path = os.path.join(PROFILE_FOLDER, f"{run_id}.prof")
+    profiler.dump_stats(dump_path)
+    _prune_profiles()
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(40)
+    return {'dump_path': dump_path, 'top_cumulative': out.getvalue()}
+
+
+def _prune_profiles():
+    """Delete all but the newest MAX_PROFILE_DUMPS dumps; evicted runs' dumps would otherwise pile up."""
+    try:
+        entries = [e for e in os.scandir(PROFILE_FOLDER) if e.name.endswith('.prof') and e.is_file()]
+    except OSError:
+        return
+    entries.sort(key=lambda e: e.stat().st_mtime, reverse=True)
+    for entry in entries[MAX_PROFILE_DUMPS:]:
+        try:
+            os.remove(entry.path)
+        except OSError:
+            pass  # already removed by another process
+
+
+@contextmanager
+def span(name, rows=None):
+    """
+    Time a pipeline stage: wall and CPU time, rows/s, allocated-block delta, how far the stage
+    raised the process's peak RSS, and that peak itself (a process-lifetime high-water mark).
+    Spans nest; each one is recorded on the current run (if any) and in the /metrics totals.
+    """
+    stack = _span_stack.get()
+    token = _span_stack.set(stack + (name,))
+    peak0 = peak_rss_bytes()
+    blocks0 = sys.getallocatedblocks()
+    cpu0 = time.process_time()
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        wall = time.perf_counter() - t0
+        cpu = time.process_time() - cpu0
+        _span_stack.reset(token)
+        peak1 = peak_rss_bytes()
+        record = {
+            'name': name,
+            'parent': stack[-1] if stack else None,
+            'depth': len(stack),
+            'wall_s': round(wall, 6),
+            'cpu_s': round(cpu, 6),
+            'rows': rows,
+            'rows_per_s': round(rows / wall, 1) if rows and wall > 0 else None,
+            'peak_rss_growth_mb': round((peak1 - peak0) / (1024 * 1024), 2),
+            'process_peak_rss_mb': round(peak1 / (1024 * 1024), 2),
+            'alloc_blocks': sys.getallocatedblocks() - blocks0,
+        }
+        run = _current_run.get()
+        with _lock:
+            if run is not None:
+                run['spans'].append(record)
+            totals = _stage_totals.setdefault(name, {'count': 0, 'wall_s': 0.0, 'cpu_s': 0.0, 'rows': 0})
+            totals['count'] += 1
+            totals['wall_s'] += wall
+            totals['cpu_s'] += cpu
+            totals['rows'] += rows or 0
+
+
+def current_run_profiled():
+    run = _current_run.get()
+    return run is not None and run.get('_profiler') is not None
+
+
+def record_worker_run(worker_run):
+    """Attach the spans (and cProfile dump) of work done in a pool worker to the current run."""
+    if not worker_run:
+        return
+    run = _current_run.get()
+    depth = len(_span_stack.get())
+    with _lock:
+        for record in worker_run['spans']:
+            totals = _stage_totals.setdefault(record['name'], {'count': 0, 'wall_s': 0.0, 'cpu_s': 0.0, 'rows': 0})
+            totals['count'] += 1
+            totals['wall_s'] += record['wall_s']
+            totals['cpu_s'] += record['cpu_s']
+            totals['rows'] += record['rows'] or 0
+            if run is not None:
+                run['spans'].append(dict(record, depth=record['depth'] + depth, worker=True))
+        if run is not None and worker_run.get('profile'):
+            run['worker_profile'] = worker_run['profile']
+
+
+def get_run(run_id):
+    with _lock:
+        run = _runs.get(run_id)
+        if run is None:
+            return None
+        return {k: v for k, v in run.items() if not k.startswith('_')}
+
+
+def list_runs():
+    with _lock:
+        return [
+            {k: run[k] for k in ('run_id', 'kind', 'started_at', 'status', 'wall_s')}
+            for run in reversed(_runs.values())
+        ]
+
+
+def prometheus_metrics():
+    """Render stage totals in the Prometheus text exposition format."""
+    with _lock:
+        totals = {name: dict(values) for name, values in _stage_totals.items()}
+        run_count = len(_runs)
+    lines = [
+        '# HELP clearcred_stage_wall_seconds Wall-clock time spent in a pipeline stage.',
+        '# TYPE clearcred_stage_wall_seconds summary',
+    ]
+    for name, t in sorted(totals.items()):
+        lines.append(f'clearcred_stage_wall_seconds_sum{{stage="{name}"}} {t["wall_s"]:.6f}')
+        lines.append(f'clearcred_stage_wall_seconds_count{{stage="{name}"}} {t["count"]}')
+    lines += [
+        '# HELP clearcred_stage_cpu_seconds_total CPU time spent in a pipeline stage.',
+        '# TYPE clearcred_stage_cpu_seconds_total counter',
+    ]
+    for name, t in sorted(totals.items()):
+        lines.append(f'clearcred_stage_cpu_seconds_total{{stage="{name}"}} {t["cpu_s"]:.6f}')
+    lines += [
+        '# HELP clearcred_stage_rows_total Rows processed by a pipeline stage.',
+        '# TYPE clearcred_stage_rows_total counter',
+    ]
+    for name, t in sorted(totals.items()):
+        lines.append(f'clearcred_stage_rows_total{{stage="{name}"}} {t["rows"]}')
+    lines += [
+        '# HELP clearcred_process_peak_rss_bytes Peak resident set size of this process.',
+        '# TYPE clearcred_process_peak_rss_bytes gauge',
+        f'clearcred_process_peak_rss_bytes {peak_rss_bytes()}',
+        '# HELP clearcred_runs_tracked Pipeline runs currently kept for /runs/<id>/profile.',
+        '# TYPE clearcred_runs_tracked gauge',
+        f'clearcred_runs_tracked {run_count}',
+    ]
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,202 @@
+import os
+import json
+import time
+import secrets
+import threading
+from datetime import datetime
+from utils import lazy_import
+
+np = lazy_import('numpy')
+rapidfuzz = lazy_import('rapidfuzz')
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+REPRESENTATIVES_PATH = os.path.join(BACKEND_DIR, 'representatives.json')
+# Values that matched no representative are kept as new representatives, one version per run
+REPRESENTATIVE_VERSIONS_FOLDER = os.path.join('cache', 'representatives')
+MAX_REPRESENTATIVE_VERSIONS = 20
+PERSIST_GROWTH = os.environ.get('CLEARCRED_PERSIST_REPRESENTATIVES', '1') != '0'
+# How often the service checks representatives.json and the version folder for changes
+RELOAD_CHECK_SECONDS = 2.0
+# Distinct values scored against the representatives per cdist call
+SCORE_CHUNK_SIZE = 2000
+
+
+class RepresentativeSet:
+    """
+    Representatives per key with an exact-match index. One run works on its own set and
+    extends it with values that matched nothing; `added` holds those additions.
+    """
+
+    def __init__(self, reps, version=0):
+        self.version = version
+        self.choices = {key: list(values) for key, values in reps.items()}
+        self.positions = {key: {value: i for i, value in reversed(list(enumerate(values)))}
+                          for key, values in self.choices.items()}
+        self.added = {}
+
+    def contains(self, key, value):
+        return value in self.positions.get(key, ())
+
+    def add(self, key, value):
+        choices = self.choices.setdefault(key, [])
+        self.positions.setdefault(key, {})[value] = len(choices)
+        choices.append(value)
+        self.added.setdefault(key, []).append(value)
+
+    def as_dict(self):
+        return self.choices
+
+
+def snap_values(values, key, reps, max_changes, threshold):
+    """
+    Map distinct values (in first-occurrence order) to their representative under `key`:
+    the best token_set_ratio match if it scores >= threshold within max_changes edits,
+    else the value itself, which then becomes a representative for the values after it.
+    Scores against the existing representatives are computed in batched cdist calls with
+    score_cutoff; only representatives added during this call are scored one value at a time.
+    """
+    fuzz = rapidfuzz.fuzz
+    choices = reps.choices.setdefault(key, [])
+    base_count = len(choices)
+    pending = [v for v in values if not reps.contains(key, v)]
+    mapping = {v: v for v in values if reps.contains(key, v)}
+
+    best_base = {}
+    if pending and base_count:
+        for i in range(0, len(pending), SCORE_CHUNK_SIZE):
+            chunk = pending[i:i + SCORE_CHUNK_SIZE]
+            scores = rapidfuzz.process.cdist(chunk, choices[:base_count], scorer=fuzz.token_set_ratio,
+                                             score_cutoff=threshold, dtype=np.float64, workers=-1)
+            best = scores.argmax(axis=1)
+            best_scores = scores[np.arange(len(chunk)), best]
+            for value, index, score in zip(chunk, best.tolist(), best_scores.tolist()):
+                if score >= threshold:
+                    best_base[value] = (score, index)
+
+    for value in pending:
+        if reps.contains(key, value):
+            mapping[value] = value
+            continue
+        best = best_base.get(value)
+        if len(choices) > base_count:
+            # Later representatives only win with a strictly higher score, as in a left-to-right scan
+            match = rapidfuzz.process.extractOne(value, choices[base_count:], scorer=fuzz.token_set_ratio,
+                                                 score_cutoff=best[0] if best else threshold)
+            if match and (best is None or match[1] > best[0]):
+                best = (match[1], base_count + match[2])
+        if best is not None:
+            choice = choices[best[1]]
+            if rapidfuzz.distance.Levenshtein.distance(value, choice) <= max_changes:
+                mapping[value] = choice
+                continue
+        reps.add(key, value)
+        mapping[value] = value
+    return mapping
+
+
+def _merge_added(*additions):
+    merged = {}
+    for added in additions:
+        for key, values in added.items():
+            merged.setdefault(key, [])
+            merged[key].extend(v for v in values if v not in merged[key])
+    return merged
+
+
+class RepresentativesService:
+    """
+    Loads representatives.json plus the newest growth version once and hands out working
+    copies. Changes to either are picked up on the next snapshot (checked at most every
+    RELOAD_CHECK_SECONDS); commit() records a run's new representatives as a new version.
+    """
+
+    def __init__(self, path=REPRESENTATIVES_PATH, versions_folder=REPRESENTATIVE_VERSIONS_FOLDER):
+        self.path = path
+        self.versions_folder = versions_folder
+        self._lock = threading.Lock()
+        self._signature = None
+        self._checked_at = 0.0
+        self._base = None
+        self._version = 0
+        self._added = {}
+
+    def _versions(self):
+        if not os.path.exists(self.versions_folder):
+            return []
+        return sorted(int(f[1:-5]) for f in os.listdir(self.versions_folder)
+                      if f.startswith('v') and f.endswith('.json') and f[1:-5].isdigit())
+
+    def _version_path(self, version):
+        return os.path.join(self.versions_folder, f"v{version:06d}.json")
+
+    def _read_version(self, version):
+        if not version:
+            return {}
+        with open(self._version_path(version), 'r', encoding='utf-8') as f:
+            return json.load(f)['added']
+
+    def _reload_if_changed(self):
+        now = time.monotonic()
+        if self._base is not None and now - self._checked_at < RELOAD_CHECK_SECONDS:
+            return
+        self._checked_at = now
+        versions = self._versions() if PERSIST_GROWTH else []
+        signature = (os.path.getmtime(self.path), versions[-1] if versions else 0)
+        if signature == self._signature:
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            self._base = json.load(f)
+        self._version = signature[1]
+        self._added = self._read_version(self._version)
+        self._signature = signature
+        print(f"Loaded representatives from {self.path} (growth version {self._version})")
+
+    def snapshot(self):
+        """A RepresentativeSet for one run: the base file plus the newest growth version."""
+        with self._lock:
+            self._reload_if_changed()
+            reps = {key: list(values) for key, values in self._base.items()}
+            for key, values in self._added.items():
+                existing = set(reps.setdefault(key, []))
+                reps[key].extend(v for v in values if v not in existing)
+            return RepresentativeSet(reps, self._version)
+
+    def commit(self, reps):
+        """
+        Persist the representatives a run added as a new version (merged with any version
+        committed meanwhile). Returns the version now current, or None when not persisting.
+        """
+        added = {key: values for key, values in reps.added.items() if values}
+        if not PERSIST_GROWTH:
+            return None
+        os.makedirs(self.versions_folder, exist_ok=True)
+        while True:
+            versions = self._versions()
+            latest = versions[-1] if versions else 0
+            current = self._read_version(latest)
+            merged = _merge_added(current, added)
+            if merged == current:
+                return latest
+            payload = {'version': latest + 1, 'created_at': datetime.now().isoformat(), 'added': merged}
+            # Unique per attempt: with in-process jobs, threads of one process commit concurrently
+            tmp_path = os.path.join(self.versions_folder, f".v{latest + 1}.{os.getpid()}.{secrets.token_hex(4)}.tmp")
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(payload, f)
+            try:
+                # link() fails if another run committed this version first; then merge again
+                os.link(tmp_path, self._version_path(latest + 1))
+            except FileExistsError:
+                continue
+            finally:
+                os.remove(tmp_path)
+            for old in versions[:max(len(versions) + 1 - MAX_REPRESENTATIVE_VERSIONS, 0)]:
+                try:
+                    os.remove(self._version_path(old))
+                except FileNotFoundError:
+                    pass
+            with self._lock:
+                self._checked_at = 0.0
+            return latest + 1
+
+
+representatives_service = RepresentativesService()
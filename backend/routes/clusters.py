@@ -0,0 +1,68 @@
+from flask import Blueprint, request, jsonify
+from cluster_index import cluster_index, INDEXED_FIELDS
+
+clusters_bp = Blueprint('clusters', __name__)
+
+MAX_PAGE_SIZE = 200
+
+
+def _summary(cluster):
+    reasons = sorted({r for edge in cluster['edges'] for r in edge['reasons']})
+    return {
+        'cluster_id': cluster['cluster_id'],
+        'size': cluster['size'],
+        'canonical': cluster['canonical'],
+        'reasons': reasons
+    }
+
+
+@clusters_bp.route('/dedup/clusters', methods=['GET'])
+def get_clusters():
+    """
+    Duplicate clusters of the latest complete-pipeline run.
+    Query: provider_id, npi, license_number or practice_phone (alias phone) to get the full clusters
+    of one provider; otherwise page / page_size over cluster summaries, largest clusters first
+    """
+    try:
+        args = request.args.to_dict()
+        if 'phone' in args:
+            args['practice_phone'] = args.pop('phone')
+        field = next((f for f in INDEXED_FIELDS if f in args), None)
+        if field:
+            clusters = cluster_index.lookup(field, args[field])
+            return jsonify({
+                'status': 'success',
+                'query': {field: args[field]},
+                'clusters': clusters,
+                'total_clusters': len(clusters),
+                'version_id': cluster_index.version_id
+            })
+
+        page = max(int(args.get('page', 1)), 1)
+        page_size = min(max(int(args.get('page_size', 50)), 1), MAX_PAGE_SIZE)
+        clusters, total = cluster_index.page(page, page_size)
+        return jsonify({
+            'status': 'success',
+            'clusters': [_summary(c) for c in clusters],
+            'page': page,
+            'page_size': page_size,
+            'total_clusters': total,
+            'version_id': cluster_index.version_id,
+            'created_at': cluster_index.created_at
+        })
+    except ValueError:
+        return jsonify({'error': 'page and page_size must be integers'}), 400
+    except Exception as e:
+        return jsonify({'error': f'Error reading duplicate clusters: {str(e)}'}), 500
+
+
+@clusters_bp.route('/dedup/clusters/<int:cluster_id>', methods=['GET'])
+def get_cluster(cluster_id):
+    """One cluster: members, pairwise edge reasons and why its canonical row was kept"""
+    try:
+        cluster = cluster_index.get(cluster_id)
+        if cluster is None:
+            return jsonify({'error': f'Cluster not found: {cluster_id}'}), 404
+        return jsonify({'status': 'success', 'cluster': cluster, 'version_id': cluster_index.version_id})
+    except Exception as e:
+        return jsonify({'error': f'Error reading duplicate clusters: {str(e)}'}), 500
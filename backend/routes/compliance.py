@@ -0,0 +1,76 @@
+from flask import Blueprint, request, jsonify
+from datetime import date, timedelta
+from compliance_index import compliance_index
+
+compliance_bp = Blueprint('compliance', __name__)
+
+MAX_PAGE_SIZE = 500
+NO_INDEX_ERROR = 'No compliance index yet. Please run the complete pipeline first.'
+
+
+def _date_arg(name, default=None):
+    value = request.args.get(name)
+    return date.fromisoformat(value) if value else default
+
+
+@compliance_bp.route('/compliance/expiring', methods=['GET'])
+def get_expiring():
+    """
+    Licenses expiring in a window, soonest first.
+    Query: days (default 90) from as_of (default today), or an explicit from / to (YYYY-MM-DD);
+    state (CA, NY), page, page_size
+    """
+    try:
+        as_of = _date_arg('as_of', date.today())
+        start = _date_arg('from', as_of)
+        end = _date_arg('to', start + timedelta(days=int(request.args.get('days', 90))))
+        page = max(int(request.args.get('page', 1)), 1)
+        page_size = min(max(int(request.args.get('page_size', 50)), 1), MAX_PAGE_SIZE)
+    except ValueError:
+        return jsonify({'error': 'Dates must be YYYY-MM-DD; days, page and page_size integers'}), 400
+    try:
+        state = request.args.get('state')
+        result = compliance_index.expiring(start, end, state, page, page_size, as_of=as_of)
+        if result is None:
+            return jsonify({'error': NO_INDEX_ERROR}), 404
+        if not result:
+            return jsonify({'error': f'No licenses for state: {state}'}), 404
+        return jsonify(dict(result, status='success', **{'from': start.isoformat(), 'to': end.isoformat()},
+                            as_of=as_of.isoformat(), state=state, page=page, page_size=page_size))
+    except Exception as e:
+        return jsonify({'error': f'Error querying license expirations: {str(e)}'}), 500
+
+
+@compliance_bp.route('/compliance/as-of', methods=['GET'])
+def get_as_of():
+    """License counts (expired, unexpired, issued) on a date, per state. Query: date (default today)"""
+    try:
+        as_of = _date_arg('date', date.today())
+    except ValueError:
+        return jsonify({'error': 'date must be YYYY-MM-DD'}), 400
+    try:
+        states = compliance_index.states()
+        if not states:
+            return jsonify({'error': NO_INDEX_ERROR}), 404
+        return jsonify({
+            'status': 'success',
+            'date': as_of.isoformat(),
+            'states': {state: compliance_index.as_of(as_of, state) for state in states}
+        })
+    except Exception as e:
+        return jsonify({'error': f'Error querying license status: {str(e)}'}), 500
+
+
+@compliance_bp.route('/compliance/histogram', methods=['GET'])
+def get_histogram():
+    """Expirations per month for the dashboard, per state"""
+    try:
+        states = compliance_index.states()
+        if not states:
+            return jsonify({'error': NO_INDEX_ERROR}), 404
+        return jsonify({
+            'status': 'success',
+            'months': {state: compliance_index.histogram(state) for state in states}
+        })
+    except Exception as e:
+        return jsonify({'error': f'Error reading expiration histogram: {str(e)}'}), 500
@@ -0,0 +1,73 @@
+from flask import Blueprint, request, jsonify, send_file, Response, g
+import os
+from profiling import start_run, finish_run, get_run, list_runs, prometheus_metrics
+
+metrics_bp = Blueprint('metrics', __name__)
+
+# Only pipeline work gets a run record; dashboard polling would just evict real runs
+RUN_PATH_PREFIXES = ('/process/', '/upload/')
+# cProfile slows a request down several times, so clients may only ask for it when enabled
+PROFILING_ENABLED = os.environ.get('CLEARCRED_ALLOW_PROFILING', '0') == '1'
+
+
+def _profile_requested():
+    return PROFILING_ENABLED and (request.args.get('profile') == '1' or request.headers.get('X-Profile') == '1')
+
+
+@metrics_bp.before_app_request
+def begin_run():
+    if request.path.startswith(RUN_PATH_PREFIXES):
+        g.run_id = start_run(request.path, profile=_profile_requested())
+
+
+@metrics_bp.after_app_request
+def tag_run(response):
+    if 'run_id' in g:
+        g.run_status = 'success' if response.status_code < 400 else 'error'
+        response.headers['X-Run-Id'] = g.run_id
+    return response
+
+
+@metrics_bp.teardown_app_request
+def end_run(exc):
+    # Teardown runs even when the view raised, so the run never stays "running" and its
+    # context variable doesn't leak into the next request served on this thread
+    if 'run_id' in g:
+        finish_run('error' if exc is not None else g.get('run_status', 'error'))
+
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def metrics():
+    """Per-stage timing totals in Prometheus text format"""
+    return Response(prometheus_metrics(), mimetype='text/plain; version=0.0.4')
+
+
+@metrics_bp.route('/runs', methods=['GET'])
+def runs():
+    """List recent pipeline runs, newest first"""
+    return jsonify({
+        'status': 'success',
+        'runs': list_runs()
+    })
+
+
+@metrics_bp.route('/runs/<run_id>/profile', methods=['GET'])
+def run_profile(run_id):
+    """Span timings for one run; ?download=1 returns the cProfile dump if one was captured"""
+    run = get_run(run_id)
+    if run is None:
+        return jsonify({'error': 'Run not found'}), 404
+    if request.args.get('download') == '1':
+        if not run['profile'] or not os.path.exists(run['profile']['dump_path']):
+            return jsonify({'error': 'No profiler dump for this run. Re-run the request with ?profile=1 '
+                                     '(needs CLEARCRED_ALLOW_PROFILING=1)'}), 404
+        return send_file(
+            os.path.abspath(run['profile']['dump_path']),
+            as_attachment=True,
+            download_name=f"{run_id}.prof",
+            mimetype='application/octet-stream'
+        )
+    return jsonify({
+        'status': 'success',
+        'run': run
+    })
@@ -1,20 +1,23 @@
 from flask import Blueprint, request, jsonify
-import pandas as pd
 import os
 import json
-from handlers import stored_data
+from utils import lazy_import, output_store
+from handlers import get_initial_dataset
+from pipeline import compute_quality_score
+
+pd = lazy_import('pandas')
 
 qualityScore_bp = Blueprint('qualityScore', __name__)
 
-def calculate_quality_score():
+def calculate_quality_score(duplicates_count=None, initial_rows=None):
     """Calculate quality score based on misspelling corrections and deduplication."""
     try:
-        # Get initial dataset row count
-        initial_dataset = stored_data.get('initial_dataset')
-        if initial_dataset is None:
-            return None, "Initial dataset not found"
-        
-        initial_rows = len(initial_dataset)
+        # Get initial dataset row count (passed in when running in a pool worker, whose copy may be stale)
+        if initial_rows is None:
+            initial_dataset = get_initial_dataset()
+            if initial_dataset is None:
+                return None, "Initial dataset not found"
+            initial_rows = len(initial_dataset)
         
         # Load corrections count from JSON file
         corrections_json_path = os.path.join('uploads', 'corrections_count.json')
@@ -24,42 +27,21 @@ def calculate_quality_score():
         with open(corrections_json_path, 'r', encoding='utf-8') as f:
             corrections_count = json.load(f)
         
-        # Calculate total corrections
-        total_corrections = sum(corrections_count.values())
-        
         # Load duplicates file to get duplicates count
-        duplicates_files = [f for f in os.listdir('outputs') if f.startswith('duplicates_removed_')]
-        if not duplicates_files:
-            return None, "Duplicates file not found"
-        
-        duplicates_path = os.path.join('outputs', duplicates_files[-1])  # Get latest
-        duplicates_df = pd.read_csv(duplicates_path)
-        duplicates_count = len(duplicates_df)
-        
-        # Calculate A: Misspelling ratio
-        total_possible_corrections = initial_rows * len(corrections_count.keys())
-        if total_possible_corrections > 0:
-            A = (total_corrections / total_possible_corrections) * 100
-        else:
-            A = 0
-        
-        # Calculate B: Duplication ratio
-        if initial_rows > 0:
-            B = (duplicates_count / initial_rows) * 100
-        else:
-            B = 0
-        
-        # Calculate final quality score
-        quality_score = 0.85 * (100 - A) + 0.15 * (100 - B)
-        
-        return {
-            'quality_score': round(quality_score, 2),
-            'misspelling_ratio': round(A, 2),
-            'duplication_ratio': round(B, 2),
-            'total_corrections': total_corrections,
-            'duplicates_count': duplicates_count,
-            'initial_rows': initial_rows
-        }, None
+        # Within a pipeline run the count is passed in; otherwise use the latest published run,
+        # whose manifest already records it (files are only listed once fully written)
+        if duplicates_count is None:
+            duplicates_file = output_store.latest_file('duplicates_removed')
+            if duplicates_file:
+                duplicates_count = duplicates_file['records']
+            else:
+                # Outputs written before run manifests existed
+                legacy_file = output_store.catalog.latest('duplicates_removed')
+                if not legacy_file:
+                    return None, "Duplicates file not found"
+                duplicates_count = len(pd.read_csv(output_store.catalog.path(legacy_file)))
+        
+        return compute_quality_score(initial_rows, corrections_count, duplicates_count), None
         
     except Exception as e:
         return None, f"Error calculating quality score: {str(e)}"
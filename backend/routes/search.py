@@ -0,0 +1,29 @@
+from flask import Blueprint, request, jsonify
+from search_index import search_index, FACETS
+
+search_bp = Blueprint('search', __name__)
+
+MAX_PAGE_SIZE = 200
+
+
+@search_bp.route('/search', methods=['GET'])
+def search_providers():
+    """
+    Search the processed providers of the latest complete-pipeline run.
+    Query: q (names, NPI, license number, city, specialty, school; prefix and typo tolerant),
+    facet filters state / status / specialty (repeatable), page, page_size
+    """
+    try:
+        page = max(int(request.args.get('page', 1)), 1)
+        page_size = min(max(int(request.args.get('page_size', 20)), 1), MAX_PAGE_SIZE)
+    except ValueError:
+        return jsonify({'error': 'page and page_size must be integers'}), 400
+    try:
+        filters = {facet: request.args.getlist(facet) for facet in FACETS if request.args.getlist(facet)}
+        result = search_index.search(request.args.get('q', ''), filters, page, page_size)
+        if result is None:
+            return jsonify({'error': 'No search index yet. Please run the complete pipeline first.'}), 404
+        return jsonify(dict(result, status='success', query=request.args.get('q', ''), filters=filters,
+                            page=page, page_size=page_size))
+    except Exception as e:
+        return jsonify({'error': f'Error searching providers: {str(e)}'}), 500
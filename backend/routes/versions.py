@@ -0,0 +1,65 @@
+from flask import Blueprint, request, jsonify, send_file
+import os
+from run_versions import list_versions, build_delta, latest_versions
+
+versions_bp = Blueprint('versions', __name__)
+
+@versions_bp.route('/versions', methods=['GET'])
+def get_versions():
+    """List recorded pipeline runs (newest last) with their dataset row counts"""
+    try:
+        versions = list_versions()
+        return jsonify({
+            'status': 'success',
+            'versions': versions,
+            'total_versions': len(versions)
+        })
+    except Exception as e:
+        return jsonify({'error': f'Error listing versions: {str(e)}'}), 500
+
+@versions_bp.route('/versions/diff', methods=['GET'])
+def get_version_diff():
+    """
+    Change data capture between two runs of a dataset.
+    Query: dataset (e.g. ca_final_processed), from / to version ids (default: the two latest runs),
+    format=summary (counts and keys, default) or csv (gzipped delta file)
+    """
+    try:
+        dataset = request.args.get('dataset')
+        if not dataset:
+            return jsonify({'error': 'dataset query parameter is required'}), 400
+        from_version = request.args.get('from')
+        to_version = request.args.get('to')
+        if from_version is None or to_version is None:
+            latest = latest_versions(2)
+            if len(latest) < 2:
+                return jsonify({'error': 'At least two recorded runs are needed for a diff'}), 400
+            from_version = from_version or latest[0]
+            to_version = to_version or latest[1]
+        known = {v['version_id']: v for v in list_versions()}
+        for version_id in (from_version, to_version):
+            if version_id not in known:
+                return jsonify({'error': f'Version not found: {version_id}'}), 404
+        if dataset not in known[to_version]['datasets'] and dataset not in known[from_version]['datasets']:
+            return jsonify({'error': f'Dataset not found in these versions: {dataset}'}), 404
+
+        delta_path, changes = build_delta(from_version, to_version, dataset)
+        if request.args.get('format') == 'csv':
+            return send_file(
+                os.path.abspath(delta_path),
+                as_attachment=True,
+                download_name=os.path.basename(delta_path),
+                mimetype='application/gzip'
+            )
+        return jsonify({
+            'status': 'success',
+            'dataset': dataset,
+            'from': from_version,
+            'to': to_version,
+            'summary': {name: len(keys) for name, keys in changes.items()},
+            'changes': changes,
+            'delta_file': delta_path,
+            'delta_size_bytes': os.path.getsize(delta_path)
+        })
+    except Exception as e:
+        return jsonify({'error': f'Error computing version diff: {str(e)}'}), 500
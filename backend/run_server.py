@@ -1,23 +1,95 @@
 #!/usr/bin/env python3
 """
 Simple script to run the Flask backend server
+
+    python run_server.py          # development server with reloader
+    python run_server.py --prod   # multi-worker gunicorn server
 """
 
 import os
 import sys
+import argparse
+import multiprocessing
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Run the Provider Credentialing Analytics API')
+    parser.add_argument('--prod', action='store_true',
+                        help='serve with gunicorn workers instead of the Flask development server')
+    parser.add_argument('--startup', choices=['eager', 'background', 'lazy'],
+                        default=os.environ.get('CLEARCRED_STARTUP_MODE', 'eager'),
+                        help='eager: load reference data before serving; background: warm up in a thread '
+                             'and report readiness on /readyz; lazy: load libraries and data on first use')
+    parser.add_argument('--host', default=os.environ.get('CLEARCRED_HOST', '0.0.0.0'))
+    parser.add_argument('--port', type=int, default=int(os.environ.get('CLEARCRED_PORT', 5000)))
+    parser.add_argument('--workers', type=int,
+                        default=int(os.environ.get('CLEARCRED_WORKERS', multiprocessing.cpu_count() * 2 + 1)),
+                        help='worker processes (--prod only)')
+    parser.add_argument('--threads', type=int, default=int(os.environ.get('CLEARCRED_THREADS', 4)),
+                        help='threads per worker (--prod only)')
+    parser.add_argument('--timeout', type=int, default=int(os.environ.get('CLEARCRED_TIMEOUT', 300)),
+                        help='seconds before a silent worker is killed and restarted (--prod only)')
+    parser.add_argument('--graceful-timeout', type=int,
+                        default=int(os.environ.get('CLEARCRED_GRACEFUL_TIMEOUT', 30)),
+                        help='seconds workers get to finish in-flight requests on shutdown (--prod only)')
+    parser.add_argument('--max-requests', type=int, default=int(os.environ.get('CLEARCRED_MAX_REQUESTS', 0)),
+                        help='recycle a worker after this many requests, 0 disables (--prod only)')
+    args = parser.parse_args()
+    if args.prod and args.startup == 'background':
+        # The warm-up thread would run in the gunicorn master and not survive the fork into workers
+        parser.error('--startup background cannot be combined with --prod; use eager (preload) or lazy')
+    return args
+
+def run_production(args):
+    from gunicorn.app.base import BaseApplication
+
+    class ClearCredApplication(BaseApplication):
+        def __init__(self, options):
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            # Imported in the master (preload_app) so reference data is loaded once and shared by fork
+            from app import app
+            return app
+
+    options = {
+        'bind': f"{args.host}:{args.port}",
+        'workers': args.workers,
+        'threads': args.threads,
+        'worker_class': 'gthread',
+        'timeout': args.timeout,
+        'graceful_timeout': args.graceful_timeout,
+        'max_requests': args.max_requests,
+        'max_requests_jitter': args.max_requests // 10,
+        'preload_app': True,
+        'accesslog': '-',
+    }
+    print(f"🏭 Production mode: {args.workers} workers x {args.threads} threads, "
+          f"timeout {args.timeout}s, graceful shutdown {args.graceful_timeout}s")
+    ClearCredApplication(options).run()
 
 def main():
+    args = parse_args()
+    os.environ['CLEARCRED_STARTUP_MODE'] = args.startup
     print("🚀 Starting Provider Credentialing Analytics API Server...")
-    print("📍 Server will be available at: http://localhost:5000")
-    print("📊 Health check endpoint: http://localhost:5000/")
+    print(f"📍 Server will be available at: http://localhost:{args.port}")
+    print(f"📊 Health check endpoint: http://localhost:{args.port}/")
+    print("🩺 Liveness/readiness probes: /healthz and /readyz")
     print("📋 Upload endpoints ready for CSV files")
     print("🔄 Processing pipeline endpoints available")
     print("\n" + "="*50)
-    
+
     try:
-        # Import and run the Flask app
-        from app import app
-        app.run(debug=True, host='0.0.0.0', port=5000)
+        if args.prod:
+            run_production(args)
+        else:
+            # Import and run the Flask app
+            from app import app
+            app.run(debug=True, host=args.host, port=args.port)
     except ImportError as e:
         print(f"❌ Error importing Flask app: {e}")
         print("Make sure you have installed all dependencies with:")
@@ -28,4 +100,4 @@ def main():
         sys.exit(1)
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
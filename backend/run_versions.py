@@ -0,0 +1,133 @@
+import os
+import json
+import shutil
+import secrets
+from datetime import datetime
+from utils import lazy_import
+
+pd = lazy_import('pandas')
+np = lazy_import('numpy')
+
+VERSIONS_FOLDER = 'versions'
+MAX_VERSIONS = 20
+KEY_COLUMN = 'provider_id'
+# Columns that change on every run without the provider changing
+VOLATILE_COLUMNS = {'moved_at'}
+CHANGE_COLUMN = '_change'
+
+
+def _as_text(series):
+    # A whole-number column read as float (because of a missing value) renders like its int
+    # form, so 10001 hashes the same whether or not another row left the column empty
+    if pd.api.types.is_float_dtype(series) and (series.dropna() % 1 == 0).all():
+        series = series.astype('Int64')
+    return series.astype('string')
+
+
+def row_hashes(df, key=KEY_COLUMN):
+    """
+    64-bit content hash per row, keyed by `key`. Values are hashed as strings with columns
+    in sorted order, so the hash doesn't depend on dtype inference or column order.
+    """
+    columns = sorted(c for c in df.columns if c != key and c not in VOLATILE_COLUMNS)
+    as_text = pd.DataFrame({c: _as_text(df[c]) for c in columns}, index=df.index).fillna('\0')
+    hashes = pd.util.hash_pandas_object(as_text, index=False)
+    return pd.DataFrame({key: _as_text(df[key]).astype(str).to_numpy(), 'row_hash': hashes.to_numpy()}) \
+        .drop_duplicates(key, keep='last')
+
+
+def _version_dir(version_id, folder):
+    return os.path.join(folder, version_id)
+
+
+def _read_manifest(version_id, folder=VERSIONS_FOLDER):
+    path = os.path.join(_version_dir(version_id, folder), 'manifest.json')
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def list_versions(folder=VERSIONS_FOLDER):
+    """Manifests of recorded runs, oldest first."""
+    if not os.path.exists(folder):
+        return []
+    manifests = [_read_manifest(v, folder) for v in sorted(os.listdir(folder))]
+    return [m for m in manifests if m is not None]
+
+
+def record_version(datasets, folder=VERSIONS_FOLDER, key=KEY_COLUMN, max_versions=MAX_VERSIONS):
+    """
+    Snapshot a run's output datasets ({name: DataFrame}) with per-row hashes and a manifest.
+    Returns the new version id. Only the newest max_versions snapshots are kept.
+    """
+    version_id = f"{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}_{secrets.token_hex(3)}"
+    version_dir = _version_dir(version_id, folder)
+    os.makedirs(version_dir, exist_ok=True)
+    manifest = {'version_id': version_id, 'created_at': datetime.now().isoformat(), 'datasets': {}}
+    for name, df in datasets.items():
+        if df is None or key not in df.columns:
+            continue
+        df.to_csv(os.path.join(version_dir, f"{name}.csv.gz"), index=False)
+        row_hashes(df, key).to_csv(os.path.join(version_dir, f"{name}_hashes.csv"), index=False)
+        manifest['datasets'][name] = {'records': len(df), 'columns': len(df.columns)}
+    # Written last: a version without a manifest is incomplete and is ignored
+    with open(os.path.join(version_dir, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+
+    versions = list_versions(folder)
+    for old in versions[:max(len(versions) - max_versions, 0)]:
+        shutil.rmtree(_version_dir(old['version_id'], folder), ignore_errors=True)
+    return version_id
+
+
+def _load_hashes(version_id, dataset, folder, key):
+    path = os.path.join(_version_dir(version_id, folder), f"{dataset}_hashes.csv")
+    if not os.path.exists(path):
+        return pd.DataFrame({key: pd.Series(dtype=str), 'row_hash': pd.Series(dtype=np.uint64)})
+    return pd.read_csv(path, dtype={key: str, 'row_hash': np.uint64})
+
+
+def diff_versions(from_version, to_version, dataset, folder=VERSIONS_FOLDER, key=KEY_COLUMN):
+    """
+    Change sets between two versions of a dataset via a hash join on `key`.
+    Returns {'inserted': [...], 'updated': [...], 'deleted': [...]} lists of keys.
+    """
+    old = _load_hashes(from_version, dataset, folder, key)
+    new = _load_hashes(to_version, dataset, folder, key)
+    joined = old.merge(new, on=key, how='outer', suffixes=('_old', '_new'), indicator=True)
+    both = joined['_merge'] == 'both'
+    return {
+        'inserted': joined.loc[joined['_merge'] == 'right_only', key].tolist(),
+        'updated': joined.loc[both & (joined['row_hash_old'] != joined['row_hash_new']), key].tolist(),
+        'deleted': joined.loc[joined['_merge'] == 'left_only', key].tolist(),
+    }
+
+
+def build_delta(from_version, to_version, dataset, folder=VERSIONS_FOLDER, key=KEY_COLUMN):
+    """
+    Write the delta between two versions as a gzipped CSV next to the newer snapshot:
+    full rows for inserted/updated keys and key-only rows for deletions, tagged in _change.
+    Returns (path, changes). The file is reused if it already exists.
+    """
+    changes = diff_versions(from_version, to_version, dataset, folder, key)
+    path = os.path.join(_version_dir(to_version, folder), f"{dataset}_delta_from_{from_version}.csv.gz")
+    if os.path.exists(path):
+        return path, changes
+
+    snapshot_path = os.path.join(_version_dir(to_version, folder), f"{dataset}.csv.gz")
+    if os.path.exists(snapshot_path) and (changes['inserted'] or changes['updated']):
+        snapshot = pd.read_csv(snapshot_path, dtype={key: str})
+        change_of = {k: 'inserted' for k in changes['inserted']}
+        change_of.update({k: 'updated' for k in changes['updated']})
+        rows = snapshot[snapshot[key].isin(change_of)].copy()
+        rows.insert(0, CHANGE_COLUMN, rows[key].map(change_of))
+    else:
+        rows = pd.DataFrame(columns=[CHANGE_COLUMN, key])
+    deleted = pd.DataFrame({CHANGE_COLUMN: 'deleted', key: changes['deleted']})
+    pd.concat([rows, deleted], ignore_index=True).to_csv(path, index=False)
+    return path, changes
+
+
+def latest_versions(count=2, folder=VERSIONS_FOLDER):
+    return [m['version_id'] for m in list_versions(folder)[-count:]]
@@ -0,0 +1,210 @@
+"""
+Search over the processed providers of the latest pipeline run.
+
+An inverted index (sorted vocabulary -> posting lists of row ids) is built when a run finishes
+and saved next to the rows. Query tokens match exactly, as prefixes of indexed tokens, or
+(from TYPO_MIN_LENGTH characters) within one or two edits, a transposition counting as one;
+every query token must match. NPIs are indexed as 10-digit strings with their leading zeros.
+Facet counts and filters use packed bitmaps per facet value.
+"""
+import os
+import re
+import pickle
+import threading
+from datetime import datetime
+from utils import lazy_import, NPI_LENGTH
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+rapidfuzz = lazy_import('rapidfuzz')
+
+SEARCH_INDEX_PATH = os.path.join('cache', 'search_index.pkl')
+SEARCH_FIELDS = ['first_name', 'last_name', 'full_name', 'npi', 'license_number', 'practice_city',
+                 'primary_specialty', 'medical_school']
+# facet name -> column
+FACETS = {'state': 'license_state', 'status': 'status_gt', 'specialty': 'primary_specialty'}
+TOKEN_PATTERN = r'[a-z0-9]+'
+TYPO_MIN_LENGTH = 4
+TWO_TYPOS_MIN_LENGTH = 8
+# Scores per matched query token: exact > prefix > typo
+EXACT_SCORE, PREFIX_SCORE, TYPO_SCORE = 3, 2, 1
+
+
+def _as_text(series):
+    # Whole-number float columns (NaN-holed ids) are indexed without the trailing ".0"
+    if pd.api.types.is_float_dtype(series) and (series.dropna() % 1 == 0).all():
+        series = series.astype('Int64')
+    return series.astype('string').str.lower()
+
+
+def tokenize(text):
+    return re.findall(TOKEN_PATTERN, (text or '').lower())
+
+
+def _bitcount(packed):
+    if hasattr(np, 'bitwise_count'):
+        return int(np.bitwise_count(packed).sum())
+    return int(np.unpackbits(packed).sum())
+
+
+def build_search_index(rows, path=SEARCH_INDEX_PATH, version_id=None):
+    """
+    Index `rows` (one DataFrame of processed providers) and save the index with the rows,
+    atomically replacing the previous one. Returns the number of indexed terms.
+    """
+    rows = rows.reset_index(drop=True)
+    n = len(rows)
+    pairs = []
+    for field in SEARCH_FIELDS:
+        if field not in rows.columns:
+            continue
+        text = _as_text(rows[field])
+        if field == 'npi':
+            # Same form as utils.normalize_npi: digits only, leading zeros restored
+            text = text.str.replace(r'\D', '', regex=True)
+            text = text.str.zfill(NPI_LENGTH).where(text.str.len() > 0)
+        tokens = text.str.findall(TOKEN_PATTERN).explode().dropna()
+        pairs.append(pd.DataFrame({'term': tokens.to_numpy(dtype=object), 'row': tokens.index.to_numpy()}))
+    postings_df = pd.concat(pairs, ignore_index=True) if pairs else pd.DataFrame({'term': [], 'row': []})
+    postings_df = postings_df.drop_duplicates().sort_values(['term', 'row'], kind='stable')
+    vocab, starts = np.unique(postings_df['term'].to_numpy(dtype=str), return_index=True)
+
+    facets = {}
+    for name, column in FACETS.items():
+        if column not in rows.columns:
+            continue
+        codes, values = pd.factorize(rows[column])
+        facets[name] = {
+            'values': [v.item() if hasattr(v, 'item') else v for v in values],
+            'bitmaps': np.stack([np.packbits(codes == i) for i in range(len(values))])
+            if len(values) else np.zeros((0, (n + 7) // 8), dtype=np.uint8)
+        }
+
+    index = {
+        'created_at': datetime.now().isoformat(),
+        'version_id': version_id,
+        'vocab': vocab,
+        'offsets': np.append(starts, len(postings_df)).astype(np.int64),
+        'postings': postings_df['row'].to_numpy(dtype=np.int32),
+        'lengths': np.char.str_len(vocab) if len(vocab) else np.zeros(0, dtype=np.int64),
+        # Only words get typo matching; ids (NPI, license numbers) would make the scan slow and noisy
+        'typo_terms': np.flatnonzero(np.char.isalpha(vocab)) if len(vocab) else np.zeros(0, dtype=np.int64),
+        'facets': facets,
+        'size': n,
+        # Rows as per-column object arrays (NaN -> None), so a page of records is cheap to assemble
+        'columns': list(rows.columns),
+        'values': [rows[c].astype(object).where(rows[c].notna(), None).to_numpy() for c in rows.columns]
+    }
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(index, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+    return len(vocab)
+
+
+class SearchIndex:
+    """The latest saved index, loaded once and again whenever a run replaces it."""
+
+    def __init__(self, path=SEARCH_INDEX_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._mtime = None
+        self.index = None
+
+    def _refresh(self):
+        mtime = os.path.getmtime(self.path) if os.path.exists(self.path) else None
+        if mtime == self._mtime:
+            return self.index
+        with self._lock:
+            if mtime != self._mtime:
+                index = None
+                if mtime is not None:
+                    with open(self.path, 'rb') as f:
+                        index = pickle.load(f)
+                self.index, self._mtime = index, mtime
+        return self.index
+
+    def _term_rows(self, index, lo, hi):
+        return index['postings'][index['offsets'][lo]:index['offsets'][hi]]
+
+    def _token_scores(self, index, token, n):
+        """Per-row best score for one query token (0 = no match)."""
+        vocab, offsets = index['vocab'], index['offsets']
+        scores = np.zeros(n, dtype=np.int8)
+        # Terms starting with token are contiguous in the sorted vocabulary; the first may be exact
+        lo = np.searchsorted(vocab, token, side='left')
+        hi = np.searchsorted(vocab, token + '\U0010ffff', side='left')
+        if hi > lo:
+            scores[self._term_rows(index, lo, hi)] = PREFIX_SCORE
+            if vocab[lo] == token:
+                scores[self._term_rows(index, lo, lo + 1)] = EXACT_SCORE
+        if len(token) >= TYPO_MIN_LENGTH and token.isalpha():
+            max_edits = 2 if len(token) >= TWO_TYPOS_MIN_LENGTH else 1
+            candidates = index['typo_terms']
+            near = candidates[np.abs(index['lengths'][candidates] - len(token)) <= max_edits]
+            # OSA counts a transposition ("davsi" -> "davis") as one edit
+            matches = rapidfuzz.process.extract(token, vocab[near].tolist(), scorer=rapidfuzz.distance.OSA.distance,
+                                                score_cutoff=max_edits, limit=None)
+            for _, _, position in matches:
+                term = near[position]
+                rows = index['postings'][offsets[term]:offsets[term + 1]]
+                scores[rows] = np.maximum(scores[rows], TYPO_SCORE)
+        return scores
+
+    def search(self, query='', filters=None, page=1, page_size=20):
+        """
+        Rows matching every token of `query` and the facet filters ({facet: [values]}; values of one
+        facet are OR-ed), best matches first. Returns None when no index has been built yet.
+        """
+        index = self._refresh()
+        if index is None:
+            return None
+        n = index['size']
+        mask = np.ones(n, dtype=bool)
+        for facet, values in (filters or {}).items():
+            facet_index = index['facets'].get(facet)
+            if facet_index is None or not values:
+                continue
+            selected = np.zeros((n + 7) // 8, dtype=np.uint8)
+            keys = [str(v) for v in facet_index['values']]
+            for value in values:
+                if str(value) in keys:
+                    selected |= facet_index['bitmaps'][keys.index(str(value))]
+            mask &= np.unpackbits(selected, count=n).astype(bool)
+
+        score = np.zeros(n, dtype=np.int32)
+        for token in tokenize(query):
+            token_scores = self._token_scores(index, token, n)
+            if token.isdigit() and len(token) < NPI_LENGTH:
+                # An NPI typed without its leading zeros
+                token_scores = np.maximum(token_scores, self._token_scores(index, token.zfill(NPI_LENGTH), n))
+            mask &= token_scores > 0
+            score += token_scores
+        matched = np.flatnonzero(mask)
+        order = matched[np.argsort(-score[matched], kind='stable')]
+
+        packed_mask = np.packbits(mask)
+        facet_counts = {}
+        for facet, facet_index in index['facets'].items():
+            counts = {}
+            for value, bitmap in zip(facet_index['values'], facet_index['bitmaps']):
+                count = _bitcount(bitmap & packed_mask)
+                if count:
+                    counts[value] = count
+            facet_counts[facet] = dict(sorted(counts.items(), key=lambda item: -item[1]))
+
+        start = (page - 1) * page_size
+        page_ids = order[start:start + page_size]
+        page_columns = [values[page_ids] for values in index['values']]
+        return {
+            'total_results': len(order),
+            'results': [dict(zip(index['columns'], record)) for record in zip(*page_columns)],
+            'scores': score[order[start:start + page_size]].tolist(),
+            'facets': facet_counts,
+            'version_id': index['version_id'],
+            'indexed_at': index['created_at']
+        }
+
+
+search_index = SearchIndex()
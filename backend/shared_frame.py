@@ -0,0 +1,121 @@
+"""
+Columnar packing of DataFrames into flat buffers, for handing row partitions to worker
+processes through multiprocessing.shared_memory instead of pickling them.
+
+Numeric/bool/datetime columns are stored as their raw numpy buffers. String columns are
+stored Arrow-style as one UTF-8 data buffer plus int64 offsets and a validity mask, so a
+worker can decode just its own row range. Any other object column is pickled as a whole.
+"""
+import pickle
+from multiprocessing import shared_memory
+from utils import lazy_import
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+ALIGNMENT = 8
+
+
+def _column_parts(series):
+    """(kind, buffers) for one column; buffers are numpy arrays or bytes written back to back."""
+    values = series.to_numpy()
+    if isinstance(series.dtype, np.dtype) and series.dtype.kind in 'biufcmM':
+        return 'raw', [np.ascontiguousarray(values)]
+    valid = series.notna().to_numpy()
+    present = values[valid]
+    if pd.api.types.infer_dtype(present, skipna=True) in ('string', 'empty'):
+        strings = np.where(valid, values, '').tolist()
+        text = ''.join(strings)
+        # ASCII text (the usual roster case) is encoded in one call: byte offsets equal character offsets
+        if text.isascii():
+            encoded, data = strings, text.encode('ascii')
+        else:
+            encoded = [v.encode('utf-8') for v in strings]
+            data = b''.join(encoded)
+        offsets = np.zeros(len(strings) + 1, dtype=np.int64)
+        np.cumsum(np.fromiter(map(len, encoded), dtype=np.int64, count=len(strings)), out=offsets[1:])
+        return 'utf8', [offsets, valid.astype(np.uint8), data]
+    return 'pickle', [pickle.dumps(values, protocol=pickle.HIGHEST_PROTOCOL)]
+
+
+def _plan(df):
+    columns, chunks, position = [], [], 0
+    for name in df.columns:
+        kind, buffers = _column_parts(df[name])
+        spans = []
+        for buffer in buffers:
+            size = buffer.nbytes if isinstance(buffer, np.ndarray) else len(buffer)
+            spans.append((position, size))
+            chunks.append((position, buffer))
+            position += size + (-size) % ALIGNMENT
+        columns.append({'name': name, 'kind': kind, 'dtype': df[name].dtype, 'spans': spans})
+    layout = {'rows': len(df), 'columns': columns}
+    return layout, chunks, max(position, 1)
+
+
+def _write(buf, chunks):
+    view = memoryview(buf).cast('B')
+    for position, buffer in chunks:
+        data = buffer.view(np.uint8).reshape(-1) if isinstance(buffer, np.ndarray) else buffer
+        view[position:position + len(data)] = data
+
+
+def pack_frame(df):
+    """Pack a frame into a single bytes object; returns (layout, payload)."""
+    layout, chunks, size = _plan(df)
+    payload = bytearray(size)
+    _write(payload, chunks)
+    return layout, bytes(payload)
+
+
+def share_frame(df):
+    """
+    Pack a frame into a new shared memory block. Returns (block, layout); the caller owns
+    the block and must close() and unlink() it once the workers are done.
+    """
+    layout, chunks, size = _plan(df)
+    block = shared_memory.SharedMemory(create=True, size=size)
+    try:
+        _write(block.buf, chunks)
+    except Exception:
+        block.close()
+        block.unlink()
+        raise
+    return block, layout
+
+
+def unpack_frame(buf, layout, start=0, stop=None):
+    """Rebuild rows [start, stop) of a packed frame as a DataFrame that owns its data."""
+    stop = layout['rows'] if stop is None else stop
+    view = memoryview(buf).cast('B')
+    data = {}
+    for column in layout['columns']:
+        spans = column['spans']
+        if column['kind'] == 'raw':
+            position, size = spans[0]
+            values = np.frombuffer(view[position:position + size], dtype=column['dtype'])[start:stop].copy()
+        elif column['kind'] == 'utf8':
+            (off_pos, off_size), (valid_pos, valid_size), (data_pos, _) = spans
+            offsets = np.frombuffer(view[off_pos:off_pos + off_size], dtype=np.int64)[start:stop + 1]
+            valid = np.frombuffer(view[valid_pos:valid_pos + valid_size], dtype=np.uint8)[start:stop]
+            raw = bytes(view[data_pos + offsets[0]:data_pos + offsets[-1]])
+            relative = (offsets - offsets[0]).tolist()
+            values = np.empty(stop - start, dtype=object)
+            if raw.isascii():
+                text = raw.decode('ascii')
+                values[:] = [text[a:b] for a, b in zip(relative[:-1], relative[1:])]
+            else:
+                values[:] = [raw[a:b].decode('utf-8') for a, b in zip(relative[:-1], relative[1:])]
+            values[valid == 0] = np.nan
+        else:
+            position, size = spans[0]
+            values = pickle.loads(view[position:position + size])[start:stop]
+        data[column['name']] = pd.Series(values, dtype=column['dtype'], copy=False)
+    frame = pd.DataFrame(data)
+    frame.index = pd.RangeIndex(start, stop)
+    return frame
+
+
+def attach(name):
+    """Open an existing shared memory block by name (in a worker); close() it when done."""
+    return shared_memory.SharedMemory(name=name)
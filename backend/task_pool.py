@@ -0,0 +1,67 @@
+import os
+import asyncio
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from profiling import start_run, finish_run, get_run, record_worker_run, current_run_profiled
+
+# Processes for the heavy pipeline stages; 0 runs them on a thread in the web process instead
+HEAVY_WORKERS = int(os.environ.get('CLEARCRED_HEAVY_WORKERS', 2))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """
+    The shared process pool, created on first use. forkserver (where available) starts workers
+    from a clean process rather than forking a threaded web server.
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                if 'forkserver' in multiprocessing.get_all_start_methods():
+                    context = multiprocessing.get_context('forkserver')
+                    # Workers fork from a server that has already imported the pipeline. As with
+                    # spawn, the entry script is re-imported in workers, so it needs a __main__ guard
+                    context.set_forkserver_preload(['pandas', 'pipeline'])
+                else:
+                    context = multiprocessing.get_context()
+                _pool = ProcessPoolExecutor(max_workers=HEAVY_WORKERS, mp_context=context)
+    return _pool
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def _run_job(fn, args, kind, profile):
+    # Runs in a pool worker: record the job's spans so the web process can attach them to its run
+    run_id = start_run(kind, profile=profile)
+    try:
+        result = fn(*args)
+    except Exception:
+        finish_run('error')
+        raise
+    finish_run('success')
+    return result, get_run(run_id)
+
+
+async def run_heavy(fn, *args):
+    """
+    Await fn(*args) in the process pool without blocking the server, so polling and downloads
+    keep being served. fn must be a module-level function; its spans (and cProfile dump, when
+    the request asked for one) are merged into the current run.
+    """
+    if HEAVY_WORKERS == 0:
+        return await asyncio.to_thread(fn, *args)
+    kind = getattr(fn, '__name__', 'job')
+    future = get_pool().submit(_run_job, fn, args, kind, current_run_profiled())
+    result, worker_run = await asyncio.wrap_future(future)
+    record_worker_run(worker_run)
+    return result
@@ -0,0 +1,69 @@
+"""
+Peak-memory checks for the copy-free paths: a SharedDataset view serializes without copying the
+base frame, and dedupe_simple takes its outputs once without copying the roster first.
+"""
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from datasets import SharedDataset
+from pipeline import dedupe_simple
+
+STATES = np.array(['CA', 'NY', 'TX', 'FL', 'WA', 'OR', 'NV', 'AZ', 'UT', 'CO'])
+
+
+def traced(fn):
+    """(result, bytes still allocated by the call afterwards, peak bytes allocated during it)."""
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        result = fn()
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, current - before, peak - before
+
+
+def frame_bytes(df):
+    return int(df.memory_usage(index=False).sum())
+
+
+def test_view_to_dict_does_not_copy_base_frame():
+    rng = np.random.default_rng(0)
+    n = 60000
+    frame = pd.DataFrame({'provider_id': [f'P{i}' for i in range(n)], 'license_state': STATES[np.arange(n) % 10]})
+    frame = pd.concat([frame, pd.DataFrame(rng.random((n, 8)), columns=[f'x{i}' for i in range(8)])], axis=1)
+    dataset = SharedDataset(frame)
+    dataset.partitions('license_state')
+
+    payload, retained, peak = traced(
+        lambda: dataset.where('license_state', 'CA', columns=['provider_id', 'x0']).to_dict())
+
+    assert payload['shape'] == (n // 10, 2)
+    # One copy of the base frame (or of its CA rows with every column) would exceed this
+    assert peak <= 1.25 * retained + 0.25 * frame_bytes(frame)
+
+
+def test_dedupe_simple_peak_memory_stays_near_output_size():
+    rng = np.random.default_rng(0)
+    n = 20000
+    roster = pd.DataFrame({
+        'provider_id': [f'P{i}' for i in range(n)],
+        'first_name': [f'F{i % 5000}' for i in range(n)],
+        'last_name': [f'L{i % 7000}' for i in range(n)],
+        'practice_phone': [f'555{i % 9000:07d}' for i in range(n)],
+        'license_number': [f'LIC{i % 15000}' for i in range(n)],
+        'license_state': STATES[np.arange(n) % 2],
+        'medical_school': ['School'] * n,
+        'residency_program': ['Program'] * n,
+        'status': ['Active'] * n,
+    })
+    roster = pd.concat([roster, pd.DataFrame(rng.random((n, 40)), columns=[f'x{i}' for i in range(40)])], axis=1)
+
+    (canonical, duplicates), retained, peak = traced(lambda: dedupe_simple(roster))
+
+    assert len(canonical) + len(duplicates) == n
+    assert len(duplicates) > 0
+    # Outputs plus working state; copying the roster before taking the outputs would exceed this
+    assert peak <= retained + 2 * frame_bytes(roster)
@@ -0,0 +1,286 @@
+"""
+Preview and profile of an uploaded roster without loading it.
+
+The file is read once as a stream of blocks, stopping at a time budget so large files answer as
+fast as small ones. The first block gives the encoding, delimiter, header and head rows; every
+block read then updates per-column null counts, format-violation counts, a HyperLogLog sketch
+(distinct-value estimate) and a uniform reservoir sample of rows, from which the column types
+and top values are inferred.
+"""
+import io
+import csv
+import time
+from utils import lazy_import
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+BLOCK_BYTES = 1 << 20
+TIME_BUDGET_SECONDS = 0.8
+HEAD_ROWS = 10
+SAMPLE_ROWS = 2000
+TOP_VALUES = 5
+HLL_PRECISION = 12
+DELIMITERS = ',;\t|'
+# Columns the pipeline cannot run without
+REQUIRED_COLUMNS = ['provider_id', 'npi', 'first_name', 'last_name', 'license_number', 'license_state',
+                    'practice_state', 'practice_phone']
+# Column-name keyword -> (rule, pattern the value must fully match after normalization)
+FORMAT_RULES = {
+    'phone': ('10-digit phone number', r'1?\d{10}'),
+    'zip': ('5-digit or ZIP+4 code', r'\d{5}(?:-\d{4})?'),
+    'npi': ('10-digit NPI', r'\d{10}'),
+}
+TYPE_PATTERNS = [
+    ('integer', r'[-+]?\d+'),
+    ('float', r'[-+]?(?:\d+\.\d*|\.\d+|\d+)(?:[eE][-+]?\d+)?'),
+    ('boolean', r'(?i:true|false)'),
+    ('date', r'\d{4}-\d{2}-\d{2}(?:[ T]\d{2}:\d{2}(?::\d{2})?)?'),
+]
+
+
+class HyperLogLog:
+    """Distinct-count sketch over 64-bit hashes: 2**precision one-byte registers."""
+
+    def __init__(self, precision=HLL_PRECISION):
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    def add(self, hashes):
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        if not len(hashes):
+            return
+        index = (hashes >> np.uint64(64 - self.precision)).astype(np.int64)
+        remaining = hashes & np.uint64((1 << (64 - self.precision)) - 1)
+        # Leading zeros of the remaining bits, from the float exponent (exact below 2**53)
+        bit_length = np.frexp(remaining.astype(np.float64))[1]
+        rank = (64 - self.precision - bit_length + 1).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+    def count(self):
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.exp2(-self.registers.astype(np.float64)))
+        zeros = int((self.registers == 0).sum())
+        if estimate <= 2.5 * m and zeros:
+            # Small cardinalities: linear counting is more accurate
+            estimate = m * np.log(m / zeros)
+        return int(round(estimate))
+
+
+def _detect_encoding(head):
+    """(encoding, text) of the first block; a trailing partial character is not an error."""
+    if head.startswith(b'\xef\xbb\xbf'):
+        return 'utf-8-sig', head[3:].decode('utf-8', errors='ignore')
+    try:
+        return 'utf-8', head.decode('utf-8')
+    except UnicodeDecodeError as e:
+        if e.start >= len(head) - 3:
+            return 'utf-8', head[:e.start].decode('utf-8')
+        return 'latin-1', head.decode('latin-1')
+
+
+def _count_replaced(block):
+    """Byte sequences of block that aren't valid UTF-8 (a literal U+FFFD in the file isn't counted)."""
+    return block.decode('utf-8', errors='replace').count('\ufffd') - block.count(b'\xef\xbf\xbd')
+
+
+def _detect_delimiter(text):
+    lines = text.splitlines()[:50]
+    try:
+        return csv.Sniffer().sniff('\n'.join(lines), delimiters=DELIMITERS).delimiter
+    except csv.Error:
+        return ','
+
+
+def _format_rule(column):
+    for keyword, rule in FORMAT_RULES.items():
+        if keyword in column.lower():
+            return rule
+    return None
+
+
+def _infer_type(values):
+    """Narrowest type every sampled (non-null) value fits, else 'string'."""
+    values = pd.Series(values, dtype=object).dropna().astype(str).str.strip()
+    if values.empty:
+        return 'empty'
+    for name, pattern in TYPE_PATTERNS:
+        if values.str.fullmatch(pattern).all():
+            return name
+    return 'string'
+
+
+class _ColumnStats:
+    def __init__(self, column):
+        self.column = column
+        self.nulls = 0
+        self.checked = 0
+        self.violations = 0
+        self.rule = _format_rule(column)
+        self.sketch = HyperLogLog()
+
+    def update(self, values):
+        missing = values.isna()
+        self.nulls += int(missing.sum())
+        present = values[~missing]
+        if present.empty:
+            return
+        # Sketch and format checks work on the block's distinct values
+        codes, uniques = pd.factorize(present.to_numpy(dtype=object))
+        self.sketch.add(pd.util.hash_array(np.asarray(uniques, dtype=object)))
+        if self.rule is not None:
+            text = pd.Series(uniques, dtype=object).astype(str).str.strip()
+            if 'phone' in self.rule[0]:
+                text = text.str.replace(r'\D', '', regex=True)
+            invalid = ~text.str.fullmatch(self.rule[1]).to_numpy(dtype=bool)
+            self.checked += len(codes)
+            self.violations += int(invalid[codes].sum())
+
+
+class _Reservoir:
+    """Uniform sample of SAMPLE_ROWS rows over everything offered (Algorithm R, one block at a time)."""
+
+    def __init__(self, columns, size, seed=0):
+        self.size = size
+        self.seen = 0
+        self.filled = 0
+        self.values = {c: np.empty(size, dtype=object) for c in columns}
+        self.rng = np.random.default_rng(seed)
+
+    def offer(self, block):
+        n = len(block)
+        positions = self.seen + np.arange(n)
+        # Row i replaces slot j ~ U[0, i] when j < size; the first `size` rows fill the slots in order
+        slots = np.where(positions < self.size, positions, self.rng.integers(0, positions + 1))
+        keep = slots < self.size
+        for column in self.values:
+            self.values[column][slots[keep]] = block[column].to_numpy(dtype=object)[keep]
+        self.seen += n
+        self.filled = min(self.size, self.seen)
+
+    def column(self, column):
+        return self.values[column][:self.filled]
+
+
+def _read_blocks(stream, block_bytes):
+    """Blocks of whole lines (the last block may end without a newline)."""
+    pending = b''
+    while True:
+        chunk = stream.read(block_bytes)
+        if not chunk:
+            if pending:
+                yield pending
+            return
+        chunk = pending + chunk
+        cut = chunk.rfind(b'\n')
+        if cut < 0:
+            pending = chunk
+            continue
+        pending = chunk[cut + 1:]
+        yield chunk[:cut + 1]
+
+
+def preview_csv(stream, total_bytes=None, time_budget=TIME_BUDGET_SECONDS, sample_rows=SAMPLE_ROWS,
+                block_bytes=BLOCK_BYTES):
+    """
+    Profile a CSV from a binary stream in one pass, reading until the stream ends or time_budget
+    seconds have passed. Returns a JSON-ready dict: detected format, head rows, inferred schema,
+    per-column profile (null rate, distinct estimate, top values, format violations) and warnings.
+    """
+    started = time.perf_counter()
+    blocks = _read_blocks(stream, block_bytes)
+    first = next(blocks, b'')
+    if not first.strip():
+        raise ValueError('The file is empty')
+    encoding, text = _detect_encoding(first[:64 * 1024])
+    delimiter = _detect_delimiter(text)
+    # Bytes the sniffed encoding can't decode (e.g. one Latin-1 "é" far into a UTF-8 file) become
+    # U+FFFD and are counted and reported instead of failing the preview
+    read_options = dict(sep=delimiter, dtype=str, encoding=encoding, encoding_errors='replace', on_bad_lines='skip')
+
+    frame = pd.read_csv(io.BytesIO(first), **read_options)
+    columns = list(frame.columns)
+    read_options.update(header=None, names=columns, encoding='latin-1' if encoding == 'latin-1' else 'utf-8')
+    head = frame.head(HEAD_ROWS)
+    stats = {c: _ColumnStats(c) for c in columns}
+    reservoir = _Reservoir(columns, sample_rows)
+    bytes_scanned, replaced, complete = 0, 0, False
+    block = first
+    while True:
+        if encoding != 'latin-1':
+            replaced += _count_replaced(block)
+        for column in columns:
+            stats[column].update(frame[column])
+        reservoir.offer(frame)
+        bytes_scanned += len(block)
+        if time.perf_counter() - started > time_budget:
+            break
+        block = next(blocks, None)
+        if block is None:
+            complete = True
+            break
+        frame = pd.read_csv(io.BytesIO(block), **read_options)
+
+    rows_scanned = reservoir.seen
+    profile = {}
+    for column in columns:
+        column_stats = stats[column]
+        sample = pd.Series(reservoir.column(column), dtype=object)
+        top = sample.dropna().value_counts().head(TOP_VALUES)
+        profile[column] = {
+            'type': _infer_type(sample),
+            'null_rate': round(column_stats.nulls / rows_scanned, 4) if rows_scanned else None,
+            'distinct_estimate': column_stats.sketch.count(),
+            'top_values': [{'value': value, 'count': int(count), 'share': round(count / len(sample), 4)}
+                           for value, count in top.items()]
+        }
+        if column_stats.rule is not None:
+            profile[column]['format'] = {
+                'rule': column_stats.rule[0],
+                'checked': column_stats.checked,
+                'violation_rate': round(column_stats.violations / column_stats.checked, 4) if column_stats.checked else None
+            }
+
+    missing_columns = [c for c in REQUIRED_COLUMNS if c not in columns]
+    warnings = []
+    if delimiter != ',':
+        warnings.append(f"Delimiter looks like {delimiter!r}; the pipeline reads comma-separated files")
+    if encoding == 'latin-1':
+        warnings.append('File is not valid UTF-8; it was read as Latin-1')
+    if replaced:
+        warnings.append(f"{replaced} invalid UTF-8 byte sequence(s) were replaced with U+FFFD; "
+                        f"the file may mix encodings (e.g. Latin-1 accents)")
+    if len(columns) == 1:
+        warnings.append('Only one column was found; check the delimiter')
+    if missing_columns:
+        warnings.append(f"Missing required columns: {', '.join(missing_columns)}")
+    for column, column_profile in profile.items():
+        violation_rate = column_profile.get('format', {}).get('violation_rate')
+        if violation_rate:
+            warnings.append(f"{column}: {violation_rate:.1%} of values are not a {column_profile['format']['rule']}")
+
+    estimated_rows = rows_scanned
+    if not complete and total_bytes and bytes_scanned:
+        estimated_rows = int(round(rows_scanned * total_bytes / bytes_scanned))
+    head = head.astype(object).where(head.notna(), None)
+    return {
+        'file': {
+            'encoding': encoding,
+            'replaced_characters': replaced,
+            'delimiter': delimiter,
+            'bytes_total': total_bytes,
+            'bytes_scanned': bytes_scanned,
+            'rows_scanned': rows_scanned,
+            'estimated_rows': estimated_rows,
+            'complete': complete,
+            'elapsed_ms': round((time.perf_counter() - started) * 1000, 1)
+        },
+        'columns': columns,
+        'head': head.to_dict('records'),
+        'sample_rows': reservoir.filled,
+        'schema': {column: profile[column]['type'] for column in columns},
+        'profile': profile,
+        'missing_columns': missing_columns,
+        'warnings': warnings
+    }
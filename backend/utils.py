@@ -1,21 +1,71 @@
 import os
-import pandas as pd
-from datetime import datetime
+import re
+import sys
+import threading
+import importlib
+import importlib.util
 from typing import Dict, Any
+from output_store import OutputStore
+
+# Held while a lazily imported module is first loaded, so no thread can see it half-built
+_lazy_import_lock = threading.Lock()
+
+class _LazyModule:
+    """Stands in for a module until an attribute is first used, then imports it under the lock."""
+
+    def __init__(self, name):
+        self._lazy_name = name
+        self._lazy_module = None
+
+    def _lazy_load(self):
+        if self._lazy_module is None:
+            with _lazy_import_lock:
+                if self._lazy_module is None:
+                    self._lazy_module = importlib.import_module(self._lazy_name)
+        return self._lazy_module
+
+    def __getattr__(self, attr):
+        return getattr(self._lazy_load(), attr)
+
+    def __dir__(self):
+        return dir(self._lazy_load())
+
+    def __repr__(self):
+        return f"<lazy module '{self._lazy_name}'>"
+
+def lazy_import(name):
+    """
+    Return module `name`, deferring its execution until an attribute is first used.
+    Keeps pandas/rapidfuzz/nameparser out of the server's import-time startup cost.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    if importlib.util.find_spec(name) is None:
+        raise ImportError(f"No module named '{name}'")
+    return _LazyModule(name)
+
+pd = lazy_import('pandas')
 
 UPLOAD_FOLDER = 'uploads'
 OUTPUT_FOLDER = 'outputs'
 ALLOWED_EXTENSIONS = {'csv'}
+NPI_LENGTH = 10
 
 generated_files = []
+output_store = OutputStore(OUTPUT_FOLDER)
+output_catalog = output_store.catalog
 
 def load_existing_files():
     files = []
+    # Published runs already record their row/column counts, so only older files are read
+    known = {f['filename']: f for run in output_store.runs() for f in run['files']}
     if os.path.exists(OUTPUT_FOLDER):
         for filename in os.listdir(OUTPUT_FOLDER):
             if filename.endswith('.csv'):
                 filepath = os.path.join(OUTPUT_FOLDER, filename)
-                if os.path.isfile(filepath):
+                if filename in known:
+                    files.append(known[filename])
+                elif os.path.isfile(filepath):
                     try:
                         df = pd.read_csv(filepath)
                         timestamp = "unknown"
@@ -44,50 +94,62 @@ def load_existing_files():
                         print(f"Warning: Could not process existing file {filename}: {e}")
     return files
 
-def generate_csv_file(df, filename_prefix, step_description=""):
+def generate_csv_file(df, filename_prefix, step_description="", run=None):
+    """
+    Write df as <prefix>_<timestamp>.csv (plus compressed sidecars). Inside an output run the
+    file is published when the run commits; otherwise it is published immediately as its own run.
+    Older outputs are removed by the store's retention, not here.
+    """
     if df is None or df.empty:
         return None
-    os.makedirs(OUTPUT_FOLDER, exist_ok=True)
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"{filename_prefix}_{timestamp}.csv"
-    filepath = os.path.join(OUTPUT_FOLDER, filename)
-    # Remove previous output files for the same state (prefix) before saving new output
-    for f in os.listdir(OUTPUT_FOLDER):
-        if f.startswith(filename_prefix) and f.endswith('.csv'):
-            file_path_to_remove = os.path.join(OUTPUT_FOLDER, f)
-            # Don't try to remove the file we're about to write
-            if file_path_to_remove != filepath and os.path.isfile(file_path_to_remove):
-                try:
-                    os.remove(file_path_to_remove)
-                except PermissionError:
-                    print(f"Warning: Could not remove {file_path_to_remove} (file in use)")
-    df.to_csv(filepath, index=False)
-    file_info = {
-        'filename': filename,
-        'filepath': filepath,
-        'step': step_description,
-        'timestamp': timestamp,
-        'records': len(df),
-        'columns': len(df.columns),
-        'size_mb': round(os.path.getsize(filepath) / (1024 * 1024), 2)
-    }
+    if run is None:
+        with output_store.run(filename_prefix) as single_run:
+            file_info = single_run.write_csv(df, filename_prefix, step_description)
+    else:
+        file_info = run.write_csv(df, filename_prefix, step_description)
     generated_files.append(file_info)
     return file_info
 
+def normalize_npi(value):
+    """
+    An NPI as its 10-digit string, or None if it has no digits. Rosters often parse NPIs as
+    numbers, which drops leading zeros, so they are restored here (0133890832, not 133890832).
+    """
+    if value is None or (isinstance(value, float) and value != value):
+        return None
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    digits = re.sub(r'\D', '', str(value))
+    return digits.zfill(NPI_LENGTH) if digits else None
+
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def dataframe_to_dict(df):
+def dataframe_to_dict(df, positions=None, columns=None):
+    """
+    JSON-ready records of df (NaN -> None), optionally only the rows at `positions` and the given
+    columns. Built column by column, so the frame itself is never copied.
+    """
     if df is None:
         return None
-    df_clean = df.copy()
-    df_clean = df_clean.where(pd.notnull(df_clean), None)
+    columns = list(df.columns) if columns is None else list(columns)
+    column_positions = range(len(df.columns)) if columns == list(df.columns) else df.columns.get_indexer(columns)
+    n_rows = len(df) if positions is None else len(positions)
+    values = []
+    for i in column_positions:
+        series = df.iloc[:, i]
+        if positions is not None:
+            series = series.take(positions)
+        column = series.to_numpy(dtype=object, copy=True)
+        column[pd.isna(column)] = None
+        values.append(column)
+    records = [dict(zip(columns, row)) for row in zip(*values)] if values else [{} for _ in range(n_rows)]
     return {
-        'data': df_clean.to_dict('records'),
-        'columns': df_clean.columns.tolist(),
-        'shape': df_clean.shape,
+        'data': records,
+        'columns': columns,
+        'shape': (n_rows, len(columns)),
         'summary': {
-            'total_records': len(df_clean),
-            'total_columns': len(df_clean.columns)
+            'total_records': n_rows,
+            'total_columns': len(columns)
         }
     }